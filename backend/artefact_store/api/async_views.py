@@ -0,0 +1,93 @@
+"""
+async versions of the read views, served under asgi (`artefact_store.asgi`).
+
+Django runs synchronous views on a single thread under asgi, one slow query then holds back every other request of
+the process. The async views run the same DRF views (projections, pagination, wire formats are unchanged) in a thread
+pool instead, each request on its own thread with its own database connection, so a process serves many clients
+concurrently. Django 3.2's ORM has no async api, which is why the database work itself still runs on threads. Only
+the read requests are moved to the pool, writes to the same routes are served as they are without the async views.
+"""
+import asyncio
+import functools
+from typing import Callable, Sequence, List
+
+from asgiref.sync import sync_to_async
+from django import db
+from django.urls import URLPattern
+from rest_framework import exceptions
+
+from . import changes
+
+# methods of the requests read views serve in the thread pool
+READ_METHODS = ("GET", "HEAD")
+
+
+def in_thread_pool(function: Callable) -> Callable:
+    """coroutine function running the synchronous `function`, which may query the database, in the thread pool"""
+
+    def run_function(*args, **kwargs):
+        db.close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            # the connections of the pool's threads are not closed by django's request signals
+            db.close_old_connections()
+
+    return sync_to_async(run_function, thread_sensitive=False)
+
+
+def async_view(view: Callable, read_methods: Sequence[str] = READ_METHODS) -> Callable:
+    """
+    async view running the synchronous `view` (rendered response included) in the thread pool for the requests of
+    `read_methods`. The other requests (writes) run on the single thread django runs synchronous views on, as they
+    would without the async view.
+    """
+
+    def render_view(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    run_read = in_thread_pool(render_view)
+    run_write = sync_to_async(render_view, thread_sensitive=True)
+
+    @functools.wraps(view)
+    async def wrapped_view(request, *args, **kwargs):
+        run_view = run_read if request.method in read_methods else run_write
+        return await run_view(request, *args, **kwargs)
+
+    return wrapped_view
+
+
+def long_poll_view(view: Callable) -> Callable:
+    """
+    async version of the change feed `view`, the wait for changes happens on the event loop (the feed is checked in
+    the thread pool every `changes.POLL_INTERVAL`) so that waiting clients do not hold threads
+    """
+    run_view = async_view(view)
+    has_changes = in_thread_pool(changes.ChangeFeed.has_changes)
+
+    @functools.wraps(view)
+    async def wrapped_view(request, *args, **kwargs):
+        try:
+            feed = changes.ChangeFeed.from_request(request)
+        except exceptions.ValidationError:
+            # the error response is rendered by the view
+            return await run_view(request, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + feed.timeout
+        while not await has_changes(feed) and loop.time() < deadline:
+            await asyncio.sleep(min(changes.POLL_INTERVAL, max(deadline - loop.time(), 0)))
+        return await run_view(request, *args, feed=feed, **kwargs)
+
+    return wrapped_view
+
+
+def serve_async(url_patterns: Sequence, route_names: Sequence[str], wrap_view: Callable = async_view) -> List:
+    """url patterns with the views of the routes named `route_names` replaced by their async versions"""
+    return [
+        URLPattern(url_pattern.pattern, wrap_view(url_pattern.callback), url_pattern.default_args, url_pattern.name)
+        if isinstance(url_pattern, URLPattern) and url_pattern.name in route_names else url_pattern
+        for url_pattern in url_patterns
+    ]
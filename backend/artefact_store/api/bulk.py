@@ -0,0 +1,177 @@
+"""
+bulk ingestion of artefacts and relationships, used to backfill the history of dataset batches and model checkpoints.
+
+Rows are validated as a set before anything is written: the artefact types, their cached validators (see
+`validation`) and the already saved relationship ends are loaded with one query each rather than once per row. Rows are
+then inserted with `bulk_create` in transactions of `CHUNK_SIZE` rows, the artefacts first and their relationships
+after. A chunk that fails leaves the previous ones committed, the ids of the committed rows are not returned then.
+"""
+from typing import Dict, List, Sequence
+
+from django.db import connection, transaction
+from rest_framework import exceptions
+
+from . import models, validation, timing, response_cache, changes
+
+# rows inserted per transaction
+CHUNK_SIZE = 1000
+# validation errors reported per rejected request
+MAX_REPORTED_ERRORS = 100
+
+
+def ingest(bulk_json: dict) -> Dict[str, List[int]]:
+    """
+    saves the `artefacts` and `relationships` of `bulk_json` and returns their ids, in order. Artefacts may have a
+    `ref` that the relationships of the same request reference with `parent_ref`/`child_ref`, the other relationship
+    ends (`parent`/`child`) must already be saved.
+    """
+    artefact_jsons = _get_rows(bulk_json, "artefacts")
+    relationship_jsons = _get_rows(bulk_json, "relationships")
+    artefacts, refs = _build_artefacts(artefact_jsons)
+    relationships = _build_relationships(relationship_jsons, refs)
+    artefact_ids = _bulk_insert(models.Artefact, artefacts)
+    for relationship, relationship_json in zip(relationships, relationship_jsons):
+        for end in ("parent", "child"):
+            if f"{end}_ref" in relationship_json:
+                setattr(relationship, f"{end}_id", artefact_ids[refs[relationship_json[f"{end}_ref"]]])
+    return {"artefacts": artefact_ids, "relationships": _bulk_insert(models.RelationShip, relationships)}
+
+
+def _get_rows(bulk_json: dict, name: str) -> List:
+    rows = bulk_json.get(name, [])
+    if not isinstance(rows, list):
+        raise exceptions.ValidationError({name: "expected a list of objects"})
+    # rows that are not objects are reported with the other row errors
+    _raise_for_errors(
+        name, {index: "expected an object" for index, row in enumerate(rows) if not isinstance(row, dict)}
+    )
+    return rows
+
+
+def _build_artefacts(artefact_jsons: Sequence[dict]):
+    """unsaved artefacts of the rows, along with the row index of each ref"""
+    type_names = {
+        artefact_json.get("artefact_type_reference") for artefact_json in artefact_jsons
+        if isinstance(artefact_json.get("artefact_type_reference"), str)
+    }
+    artefact_types = models.ArtefactType.objects.in_bulk(list(type_names), field_name="type_name")
+    validators = {
+        type_name: validation.get_validator(artefact_type) for type_name, artefact_type in artefact_types.items()
+    }
+    artefacts = []
+    refs = {}
+    errors = {}
+    with timing.timed("validation"):
+        for index, artefact_json in enumerate(artefact_jsons):
+            type_name = artefact_json.get("artefact_type_reference")
+            ref = artefact_json.get("ref")
+            if not isinstance(type_name, str) or type_name not in artefact_types:
+                errors[index] = f"unknown artefact type {type_name}"
+            elif "artefact_data" not in artefact_json:
+                errors[index] = "artefact_data is required"
+            elif ref is not None and not isinstance(ref, str):
+                errors[index] = "`ref` must be a string"
+            elif ref is not None and ref in refs:
+                errors[index] = f"duplicated artefact ref {ref}"
+            else:
+                error = validation.get_validation_error(validators[type_name], artefact_json["artefact_data"])
+                if error is not None:
+                    errors[index] = error.message
+            if isinstance(ref, str):
+                refs.setdefault(ref, index)
+            artefacts.append(models.Artefact(
+                artefact_type_reference=artefact_types.get(type_name) if isinstance(type_name, str) else None,
+                artefact_data=artefact_json.get("artefact_data")
+            ))
+    _raise_for_errors("artefacts", errors)
+    return artefacts, refs
+
+
+def _build_relationships(relationship_jsons: Sequence[dict], refs: Dict[str, int]) -> List[models.RelationShip]:
+    """unsaved relationships of the rows, the ends given by ref are set once the artefacts are inserted"""
+    saved_ids = {
+        relationship_json[end] for relationship_json in relationship_jsons for end in ("parent", "child")
+        if _is_artefact_id(relationship_json.get(end))
+    }
+    existing_ids = set(models.Artefact.objects.filter(id__in=saved_ids).values_list("id", flat=True))
+    relationships = []
+    errors = {}
+    for index, relationship_json in enumerate(relationship_jsons):
+        relationship_type = relationship_json.get("relationship_type")
+        if not isinstance(relationship_type, str) or not relationship_type:
+            errors[index] = "relationship_type is required"
+        for end in ("parent", "child"):
+            ref_key = f"{end}_ref"
+            if (end in relationship_json) == (ref_key in relationship_json):
+                errors[index] = f"exactly one of `{end}` and `{ref_key}` must be provided"
+            elif end in relationship_json and not _is_artefact_id(relationship_json[end]):
+                errors[index] = f"`{end}` must be an artefact id"
+            elif end in relationship_json and relationship_json[end] not in existing_ids:
+                errors[index] = f"no artefact with id {relationship_json[end]}"
+            elif ref_key in relationship_json and not isinstance(relationship_json[ref_key], str):
+                errors[index] = f"`{ref_key}` must be a string"
+            elif ref_key in relationship_json and relationship_json[ref_key] not in refs:
+                errors[index] = f"unknown artefact ref {relationship_json[ref_key]}"
+        relationships.append(models.RelationShip(
+            parent_id=relationship_json.get("parent") if _is_artefact_id(relationship_json.get("parent")) else None,
+            child_id=relationship_json.get("child") if _is_artefact_id(relationship_json.get("child")) else None,
+            relationship_type=relationship_type,
+        ))
+    _raise_for_errors("relationships", errors)
+    return relationships
+
+
+def _is_artefact_id(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _raise_for_errors(name: str, errors: Dict[int, str]):
+    if errors:
+        raise exceptions.ValidationError({
+            name: {str(index): message for index, message in list(errors.items())[:MAX_REPORTED_ERRORS]}
+        })
+
+
+def _bulk_insert(model, instances: List) -> List[int]:
+    """
+    inserts the instances in chunked transactions and returns their ids, in order. `bulk_create` sends no signals,
+    the cached responses the rows affect are invalidated and their changes recorded here.
+    """
+    ids = []
+    for start in range(0, len(instances), CHUNK_SIZE):
+        chunk = instances[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            if not _can_bulk_insert():
+                # the saved rows send the signals that invalidate the cache and record the changes
+                for instance in chunk:
+                    instance.save(force_insert=True)
+                ids.extend(instance.pk for instance in chunk)
+                continue
+            model.objects.bulk_create(chunk)
+            chunk_ids = _get_inserted_ids(model, chunk)
+            for instance, instance_id in zip(chunk, chunk_ids):
+                instance.pk = instance_id
+            if model is models.RelationShip:
+                response_cache.invalidate_relationships(chunk)
+                changes.record_relationships(chunk)
+            else:
+                response_cache.invalidate_artefacts(chunk)
+                changes.record_artefacts(chunk)
+            ids.extend(chunk_ids)
+    return ids
+
+
+def _can_bulk_insert() -> bool:
+    """
+    whether the ids of bulk inserted rows can be known: returned by the database, or the last inserted ones on sqlite.
+    Other databases (MySQL) interleave the rows of concurrent transactions, their rows are inserted one by one.
+    """
+    return connection.features.can_return_rows_from_bulk_insert or connection.vendor == "sqlite"
+
+
+def _get_inserted_ids(model, chunk: List) -> List[int]:
+    if connection.features.can_return_rows_from_bulk_insert:
+        return [instance.pk for instance in chunk]
+    # sqlite does not return the ids of bulk inserts, the transaction holds the database's write lock until it ends
+    # so the chunk's rows are the last inserted ones, with increasing ids
+    return sorted(model.objects.order_by("-id").values_list("id", flat=True)[:len(chunk)])
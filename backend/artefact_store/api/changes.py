@@ -0,0 +1,126 @@
+"""
+change feed: the inserts of artefacts and relationships numbered by a monotonically increasing sequence, so that
+services waiting for new checkpoints or batches are told about them instead of polling for the latest ones.
+
+Every insert writes a `models.Change` in its transaction (through the save signals, bulk inserts record theirs with
+`record_artefacts`/`record_relationships`), the ids of the changes are the sequence. Consumers ask for the changes after
+the last sequence number they saw, filtered by `kind`, `artefact_type`, `relationship_type` or `parent`. A request
+waits up to `timeout` seconds for a matching change (long-poll) and its response gives the sequence to resume from:
+
+>>> GET /api/changes/?after=120&relationship_type=checkpoint_use_case&parent=12&timeout=30
+{"changes": [{"sequence": 125, "kind": "relationship", "artefact": 40, ...}], "last_sequence": 125}
+
+Clients sending `Accept: text/event-stream` get the changes as server-sent events, see `renderers.EventStreamRenderer`.
+
+The wait does not hold a thread under asgi, where the change feed is served by the long-poll view. The synchronous view
+(wsgi, runserver) waits at most `SYNC_WAIT_TIMEOUT` seconds, clients then poll the feed again.
+
+Sequence numbers are assigned on insert. Sqlite serializes writes so changes are committed in sequence order, with
+databases running concurrent write transactions a change could be committed after a later one was read.
+"""
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from django.db.models import Max, signals
+from django.dispatch import receiver
+
+from . import models, serializers
+
+# interval (in seconds) at which waiting requests check for new changes
+POLL_INTERVAL = 0.25
+# longest wait (in seconds) of the requests served by the synchronous view, which holds a worker thread while it waits.
+# Only the long-poll view (`async_views.long_poll_view`) waits up to the requested `timeout`
+SYNC_WAIT_TIMEOUT = 1.0
+
+
+class ChangeFeed:
+    """changes after the sequence number `after` (the end of the feed when the feed is first read if `None`)"""
+
+    def __init__(
+            self,
+            after: Optional[int] = None,
+            filters: Optional[Dict[str, Any]] = None,
+            limit: int = 100,
+            timeout: float = 0.0
+    ):
+        self.after = after
+        self.filters = filters or {}
+        self.limit = limit
+        self.timeout = timeout
+
+    @classmethod
+    def from_request(cls, client_request) -> "ChangeFeed":
+        """feed of the query parameters, the `Last-Event-ID` of reconnecting event stream clients overrides `after`"""
+        params = client_request.GET.dict()
+        if client_request.headers.get("Last-Event-ID"):
+            params["after"] = client_request.headers["Last-Event-ID"]
+        serializer = serializers.ChangeFeedSerializer(data=params)
+        serializer.is_valid(raise_exception=True)
+        filters = dict(serializer.validated_data)
+        after = filters.pop("after", None)
+        return cls(after=after, limit=filters.pop("limit"), timeout=filters.pop("timeout"), filters=filters)
+
+    def get_queryset(self):
+        if self.after is None:
+            self.after = models.Change.objects.aggregate(sequence=Max("id"))["sequence"] or 0
+        filters = dict(self.filters)
+        changes = models.Change.objects.filter(id__gt=self.after).order_by("id")
+        if "kind" in filters:
+            changes = changes.filter(relationship__isnull=filters.pop("kind") == "artefact")
+        return changes.filter(**filters)
+
+    def has_changes(self) -> bool:
+        return self.get_queryset().exists()
+
+    def wait(self):
+        """waits up to `timeout` seconds for a matching change"""
+        deadline = time.monotonic() + self.timeout
+        while not self.has_changes() and time.monotonic() < deadline:
+            time.sleep(min(POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+    def get_page(self) -> Dict[str, Any]:
+        """the next `limit` changes, along with the sequence number to resume from"""
+        changes = list(self.get_queryset()[:self.limit])
+        return {
+            "changes": serializers.ChangeSerializer(changes, many=True).data,
+            "last_sequence": changes[-1].id if changes else self.after,
+        }
+
+
+def record_artefacts(artefacts: Iterable[models.Artefact]):
+    """records the inserts of saved artefacts"""
+    models.Change.objects.bulk_create([
+        models.Change(artefact_id=artefact.pk, artefact_type=artefact.artefact_type_reference_id)
+        for artefact in artefacts
+    ])
+
+
+def record_relationships(relationships: Iterable[models.RelationShip]):
+    """records the inserts of saved relationships, their child artefact types are loaded with one query"""
+    relationships = list(relationships)
+    child_types = dict(
+        models.Artefact.objects.filter(id__in={relationship.child_id for relationship in relationships})
+        .values_list("id", "artefact_type_reference_id")
+    )
+    models.Change.objects.bulk_create([
+        models.Change(
+            artefact_id=relationship.child_id,
+            artefact_type=child_types[relationship.child_id],
+            relationship_id=relationship.pk,
+            relationship_type=relationship.relationship_type,
+            parent_id=relationship.parent_id,
+        )
+        for relationship in relationships
+    ])
+
+
+@receiver(signals.post_save, sender=models.Artefact)
+def _record_artefact(sender, instance: models.Artefact, created: bool, **kwargs):
+    if created:
+        record_artefacts([instance])
+
+
+@receiver(signals.post_save, sender=models.RelationShip)
+def _record_relationship(sender, instance: models.RelationShip, created: bool, **kwargs):
+    if created:
+        record_relationships([instance])
@@ -0,0 +1,33 @@
+from django.db import models
+from django.db.models.fields.json import KeyTransform, KeyTransformFactory, compile_json_path
+
+
+class IndexableKeyTransform(KeyTransform):
+    """
+    json key transform whose path is written in the sql instead of being a query parameter on sqlite, the query
+    planner can only use an expression index (see `indexes`) when the path is a literal.
+    """
+
+    def as_sqlite(self, compiler, connection):
+        lhs, params, key_transforms = self.preprocess_lhs(compiler, connection)
+        json_path = compile_json_path(key_transforms).replace("'", "''").replace("%", "%%")
+        return f"JSON_EXTRACT({lhs}, '{json_path}')", tuple(params)
+
+
+class IndexableKeyTransformFactory:
+
+    def __init__(self, key_name):
+        self.key_name = key_name
+
+    def __call__(self, *args, **kwargs):
+        return IndexableKeyTransform(self.key_name, *args, **kwargs)
+
+
+class ArtefactDataField(models.JSONField):
+    """json field whose `field__key` lookups can use expression indexes"""
+
+    def get_transform(self, name):
+        transform = super().get_transform(name)
+        if isinstance(transform, KeyTransformFactory):
+            return IndexableKeyTransformFactory(name)
+        return transform
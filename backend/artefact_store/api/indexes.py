@@ -0,0 +1,75 @@
+"""
+expression indexes on the json paths of the artefact data that artefact types declare as queried
+(`ArtefactType.indexed_paths`). They are built from the same expressions as `artefact_data__<path>` filters so that
+the database uses them for name or version lookups instead of scanning every artefact.
+
+Queries are scoped to an artefact type, the indexes are composite `(artefact_type_reference, <path>)` indexes so that
+a lookup only touches the rows of the queried type.
+"""
+import hashlib
+from typing import Iterable, List, Set
+
+from django.db import DatabaseError, connection, transaction, models as django_models
+from django.db.models import F
+
+from . import models, projections
+
+
+def get_path_index(data_path: str) -> django_models.Index:
+    return django_models.Index(
+        F("artefact_type_reference"), projections.get_path_transform(data_path),
+        name=f"artefact_type_path_{_get_path_hash(data_path)}"
+    )
+
+
+def _get_unscoped_path_index_name(data_path: str) -> str:
+    """name of the index of the path created before queries were scoped to a type, it is replaced"""
+    return f"artefact_path_{_get_path_hash(data_path)}"
+
+
+def _get_path_hash(data_path: str) -> str:
+    return hashlib.md5(data_path.encode("utf-8")).hexdigest()[:12]
+
+
+def ensure_path_indexes(data_paths: Iterable[str]) -> List[str]:
+    """
+    creates the indexes of the json paths that are not indexed yet and returns their names. This must run outside of
+    transactions, sqlite's schema editor cannot be used in one. The indexes another process creates concurrently are
+    skipped.
+    """
+    existing_indexes = _get_index_names()
+    missing_paths = [
+        data_path for data_path in sorted(set(data_paths)) if get_path_index(data_path).name not in existing_indexes
+    ]
+    if not missing_paths:
+        return []
+    created_indexes = []
+    with connection.schema_editor() as schema_editor:
+        for data_path in missing_paths:
+            index = get_path_index(data_path)
+            unscoped_index_name = _get_unscoped_path_index_name(data_path)
+            try:
+                # a savepoint, so that the schema changes continue after a concurrent creation on any database
+                with transaction.atomic():
+                    schema_editor.add_index(models.Artefact, index)
+                    if unscoped_index_name in existing_indexes:
+                        schema_editor.remove_index(
+                            models.Artefact, django_models.Index(fields=["id"], name=unscoped_index_name)
+                        )
+            except DatabaseError:
+                if index.name not in _get_index_names():
+                    raise
+                continue
+            created_indexes.append(index.name)
+    return created_indexes
+
+
+def _get_index_names() -> Set[str]:
+    with connection.cursor() as cursor:
+        return set(connection.introspection.get_constraints(cursor, models.Artefact._meta.db_table))
+
+
+def ensure_artefact_type_indexes(artefact_types: Iterable[models.ArtefactType]) -> List[str]:
+    return ensure_path_indexes(
+        data_path for artefact_type in artefact_types for data_path in artefact_type.indexed_paths
+    )
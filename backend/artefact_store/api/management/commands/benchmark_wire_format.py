@@ -0,0 +1,82 @@
+import gzip
+import json
+import statistics
+import timeit
+
+import msgpack
+from django.core.management.base import BaseCommand
+from django.utils.text import compress_string
+from rest_framework import renderers as drf_renderers
+
+from api import renderers
+
+
+class Command(BaseCommand):
+    help = (
+        "compares the size and the encoding/decoding times of a query page of formula artefacts (each carrying an "
+        "output catalog) in json and MessagePack, with and without gzip"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--artefacts", type=int, default=100, help="artefacts per page")
+        parser.add_argument("--features", type=int, default=50, help="features per catalog")
+        parser.add_argument("--repeat", type=int, default=20, help="timing repetitions")
+
+    def handle(self, *args, artefacts, features, repeat, **options):
+        page = _build_page(artefacts, features)
+        wire_formats = {
+            "json": (drf_renderers.JSONRenderer().render, json.loads),
+            "msgpack": (renderers.MessagePackRenderer().render, lambda content: msgpack.unpackb(content, raw=False)),
+        }
+        self.stdout.write(f"{'format':<16}{'bytes':>12}{'encode (ms)':>14}{'decode (ms)':>14}")
+        for format_name, (encode, decode) in wire_formats.items():
+            content = encode(page)
+            self._write_row(
+                format_name, content, encode=lambda: encode(page), decode=lambda: decode(content), repeat=repeat
+            )
+            compressed_content = compress_string(content)
+            self._write_row(
+                f"{format_name}+gzip",
+                compressed_content,
+                encode=lambda: compress_string(encode(page)),
+                decode=lambda: decode(gzip.decompress(compressed_content)),
+                repeat=repeat
+            )
+
+    def _write_row(self, format_name, content, encode, decode, repeat):
+        encode_time = _median_ms(encode, repeat)
+        decode_time = _median_ms(decode, repeat)
+        self.stdout.write(f"{format_name:<16}{len(content):>12}{encode_time:>14.3f}{decode_time:>14.3f}")
+
+
+def _build_page(artefacts, features):
+    return {
+        "next": "http://127.0.0.1:8000/api/artefact/query/?cursor=cD0xMDA%3D&page_size=100",
+        "previous": None,
+        "results": [
+            {
+                "id": artefact_id,
+                "artefact_type_reference": "dataset_formula",
+                "artefact_data": {
+                    "formula_name": "user_sessions",
+                    "version": {"major": 1, "minor": artefact_id, "patch": 0},
+                    "output_catalog": {
+                        "features": [
+                            {"dtype": "float64", "shape": [1, 128], "name": f"feature_{feature_index}"}
+                            for feature_index in range(features)
+                        ]
+                    }
+                },
+                "children": [
+                    {"id": artefact_id, "child": artefact_id + 1, "relationship_type": "batch_formula",
+                     "creation_time": "2022-01-01T00:00:00.000000Z"}
+                ],
+                "parents": []
+            }
+            for artefact_id in range(artefacts)
+        ]
+    }
+
+
+def _median_ms(function, repeat):
+    return statistics.median(timeit.repeat(function, number=1, repeat=repeat)) * 1000
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import indexes, models
+
+
+class Command(BaseCommand):
+    help = "creates the missing indexes of the json paths declared by the artefact types"
+
+    def handle(self, *args, **options):
+        created_indexes = indexes.ensure_artefact_type_indexes(models.ArtefactType.objects.all())
+        self.stdout.write(f"created {len(created_indexes)} indexes")
@@ -0,0 +1,203 @@
+import base64
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent import futures
+from urllib import parse
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import models, response_cache
+
+LOAD_TEST_TYPE_NAME = "load_test_artefact"
+# modes compared by the load test, with the value of `ARTEFACT_STORE_ASYNC_READ_VIEWS` they are served with
+SERVING_MODES = {"sync": "0", "async": "1"}
+
+
+class Command(BaseCommand):
+    help = (
+        "load tests the read endpoints (artefact queries, artefact details and relationship listings) with many "
+        "concurrent clients. Without `--url` the store is served by uvicorn (which must be installed) once with the "
+        "synchronous views and once with the async ones, and their throughputs are compared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=128, help="concurrent clients")
+        parser.add_argument("--duration", type=float, default=10.0, help="duration (in seconds) of each run")
+        parser.add_argument("--artefacts", type=int, default=5000, help="artefacts created for the load test")
+        parser.add_argument("--url", help="root url of an already running artefact store to load test instead")
+
+    def handle(self, *args, clients, duration, artefacts, url, **options):
+        artefact_ids, parent_ids = _seed_artefacts(artefacts)
+        workload = _Workload(artefact_ids, parent_ids)
+        self.stdout.write(
+            f"{'mode':<8}{'requests':>10}{'req/s':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'errors':>8}"
+        )
+        if url is not None:
+            self._write_row("server", _run_load(url.rstrip("/"), workload, clients, duration))
+            return
+        for mode, async_read_views in SERVING_MODES.items():
+            with _serve(async_read_views) as server_url:
+                self._write_row(mode, _run_load(server_url, workload, clients, duration))
+
+    def _write_row(self, mode, load_results):
+        latencies, errors, duration = load_results
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+        self.stdout.write(
+            f"{mode:<8}{len(latencies):>10}{len(latencies) / duration:>10.1f}{quantiles[49] * 1000:>10.1f}"
+            f"{quantiles[94] * 1000:>10.1f}{quantiles[98] * 1000:>10.1f}{errors:>8}"
+        )
+
+
+class _Workload:
+    """mix of read requests an sdk client sends"""
+
+    def __init__(self, artefact_ids, parent_ids):
+        self.artefact_ids = artefact_ids
+        self.parent_ids = parent_ids
+
+    def next_request(self):
+        request_kind = random.choice(["query", "detail", "relationships"])
+        if request_kind == "query":
+            # the unindexed json filter scans the artefacts, as slow queries do
+            query = {"artefact_data__group": random.randrange(100)}
+            return "/api/artefact/query/", {
+                "artefact_type": LOAD_TEST_TYPE_NAME,
+                "q": base64.b64encode(json.dumps(query).encode("utf-8")).decode("utf-8"),
+                "page_size": 20
+            }
+        if request_kind == "detail":
+            return f"/api/artefact/{random.choice(self.artefact_ids)}/", {}
+        return "/api/artefact-relationship/", {"parent": random.choice(self.parent_ids), "page_size": 20}
+
+
+def _seed_artefacts(artefact_count):
+    """ids of the load test artefacts and of the ones having children, they are created on the first run"""
+    artefact_type, created = models.ArtefactType.objects.get_or_create(
+        type_name=LOAD_TEST_TYPE_NAME, defaults={"schema": {"type": "object"}}
+    )
+    artefact_ids = list(
+        models.Artefact.objects.filter(artefact_type_reference=artefact_type).values_list("id", flat=True)
+    )
+    missing_count = artefact_count - len(artefact_ids)
+    if missing_count > 0:
+        with transaction.atomic():
+            models.Artefact.objects.bulk_create([
+                models.Artefact(
+                    artefact_type_reference=artefact_type,
+                    artefact_data={"index": index, "group": index % 100, "payload": "x" * 200}
+                )
+                for index in range(len(artefact_ids), artefact_count)
+            ])
+            # bulk_create does not set the primary keys on every database backend
+            new_ids = list(
+                models.Artefact.objects.filter(artefact_type_reference=artefact_type)
+                .exclude(id__in=artefact_ids).order_by("id").values_list("id", flat=True)
+            )
+            models.RelationShip.objects.bulk_create([
+                models.RelationShip(parent_id=parent_id, child_id=child_id, relationship_type="load_test")
+                for parent_id, child_id in zip(new_ids[::10], new_ids[1::10])
+            ])
+        artefact_ids.extend(new_ids)
+        # the rows are bulk inserted, without the signals invalidating the cached responses
+        response_cache.invalidate_artefact_types([LOAD_TEST_TYPE_NAME])
+        response_cache.invalidate([
+            response_cache.RELATIONSHIPS, *(("artefact", artefact_id) for artefact_id in new_ids)
+        ])
+    parent_ids = list(
+        models.RelationShip.objects.filter(relationship_type="load_test").values_list("parent_id", flat=True)
+    )
+    return artefact_ids, parent_ids
+
+
+def _run_load(server_url, workload, clients, duration):
+    """latencies of the successful requests sent by `clients` concurrent clients during `duration` seconds"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    server_address = parse.urlparse(server_url)
+
+    def run_client():
+        # keep-alive connection, as the sdk's pooled session
+        connection = http.client.HTTPConnection(server_address.hostname, server_address.port, timeout=60)
+        client_latencies = []
+        client_errors = 0
+        while time.perf_counter() < deadline:
+            route, params = workload.next_request()
+            start_time = time.perf_counter()
+            try:
+                connection.request("GET", f"{server_address.path}{route}?{parse.urlencode(params)}")
+                response = connection.getresponse()
+                response.read()
+                if response.status == 200:
+                    client_latencies.append(time.perf_counter() - start_time)
+                else:
+                    client_errors += 1
+            except (OSError, http.client.HTTPException):
+                client_errors += 1
+                connection.close()
+        connection.close()
+        with lock:
+            latencies.extend(client_latencies)
+            errors.append(client_errors)
+
+    start_time = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=clients) as executor:
+        for client_future in [executor.submit(run_client) for _ in range(clients)]:
+            client_future.result()
+    return latencies, sum(errors), time.perf_counter() - start_time
+
+
+class _serve:
+    """serves the artefact store with uvicorn in a subprocess, with the async read views or without"""
+
+    def __init__(self, async_read_views):
+        self.async_read_views = async_read_views
+        self.process = None
+
+    def __enter__(self):
+        with socket.socket() as free_socket:
+            free_socket.bind(("127.0.0.1", 0))
+            port = free_socket.getsockname()[1]
+        environment = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "artefact_store.settings"),
+            "ARTEFACT_STORE_ASYNC_READ_VIEWS": self.async_read_views,
+        }
+        try:
+            self.process = subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "artefact_store.asgi:application", "--port", str(port),
+                    "--log-level", "warning", "--no-access-log"
+                ],
+                cwd=settings.BASE_DIR,
+                env=environment,
+            )
+        except OSError as error:
+            raise CommandError(f"could not start uvicorn: {error}")
+        server_url = f"http://127.0.0.1:{port}"
+        for _ in range(100):
+            if self.process.poll() is not None:
+                raise CommandError("uvicorn exited, is it installed? (pip install uvicorn)")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    return server_url
+            except OSError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise CommandError("uvicorn did not start")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait()
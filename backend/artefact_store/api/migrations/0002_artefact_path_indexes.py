@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:24
+
+import api.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artefacttype',
+            name='indexed_paths',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AlterField(
+            model_name='artefact',
+            name='artefact_data',
+            field=api.fields.ArtefactDataField(),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_artefact_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='relationship',
+            index=models.Index(fields=['parent', 'relationship_type', 'creation_time'], name='relationship_parent_type_time'),
+        ),
+    ]
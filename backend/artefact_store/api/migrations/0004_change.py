@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_relationship_parent_type_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('artefact_type', models.CharField(max_length=120)),
+                ('relationship_type', models.CharField(max_length=120, null=True)),
+                ('artefact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.artefact')),
+                ('parent', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.artefact')),
+                ('relationship', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.relationship')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['artefact_type', 'id'], name='change_type_sequence'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['parent', 'relationship_type', 'id'], name='change_parent_type_sequence'),
+        ),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
-from jsonschema import validate
+from typing import Sequence, Optional
+
+from django.db import models, transaction
+from django.db.models.expressions import RawSQL
+
+from . import validation
+from .fields import ArtefactDataField
 
 # Create your models here.
 
@@ -7,16 +12,77 @@ from jsonschema import validate
 class ArtefactType(models.Model):
     schema = models.JSONField()
     type_name = models.CharField(max_length=120, primary_key=True)
+    # json paths of the artefact data that artefacts of this type are queried by, they are indexed (see `indexes`)
+    indexed_paths = models.JSONField(default=list)
+
+
+class ArtefactQuerySet(models.QuerySet):
+
+    def ancestors(
+            self, artefact_ids: Sequence[int], max_depth: int, relationship_types: Optional[Sequence[str]] = None
+    ) -> "ArtefactQuerySet":
+        """
+        artefacts that are parents of any of `artefact_ids` up to `max_depth` relationships away, the whole lineage
+        is computed by the database in a single recursive query. Only relationships of `relationship_types` are
+        followed if given.
+        """
+        return self._lineage(artefact_ids, "child_id", "parent_id", max_depth, relationship_types)
+
+    def descendants(
+            self, artefact_ids: Sequence[int], max_depth: int, relationship_types: Optional[Sequence[str]] = None
+    ) -> "ArtefactQuerySet":
+        """artefacts that are children of any of `artefact_ids` up to `max_depth` relationships away"""
+        return self._lineage(artefact_ids, "parent_id", "child_id", max_depth, relationship_types)
+
+    def _lineage(
+            self,
+            artefact_ids: Sequence[int],
+            from_column: str,
+            to_column: str,
+            max_depth: int,
+            relationship_types: Optional[Sequence[str]]
+    ) -> "ArtefactQuerySet":
+        """artefacts reached from `artefact_ids` by following relationships from `from_column` to `to_column`"""
+        if len(artefact_ids) == 0 or relationship_types is not None and len(relationship_types) == 0:
+            return self.none()
+        relationship_table = RelationShip._meta.db_table
+        type_condition = ""
+        type_parameters = []
+        if relationship_types is not None:
+            type_condition = f"AND relationship_type IN ({', '.join(['%s'] * len(relationship_types))})"
+            type_parameters = list(relationship_types)
+        lineage_ids = RawSQL(
+            f"""
+            WITH RECURSIVE lineage(artefact_id, depth) AS (
+                SELECT {to_column}, 1 FROM {relationship_table}
+                WHERE {from_column} IN ({", ".join(["%s"] * len(artefact_ids))}) {type_condition}
+                UNION
+                SELECT relationship.{to_column}, lineage.depth + 1
+                FROM {relationship_table} AS relationship
+                JOIN lineage ON relationship.{from_column} = lineage.artefact_id
+                WHERE lineage.depth < %s {type_condition}
+            )
+            SELECT artefact_id FROM lineage
+            """,
+            [*artefact_ids, *type_parameters, max_depth, *type_parameters]
+        )
+        return self.filter(id__in=lineage_ids)
 
 
 class Artefact(models.Model):
+    objects = ArtefactQuerySet.as_manager()
+
     artefact_type_reference = models.ForeignKey(ArtefactType, on_delete=models.CASCADE, related_name="artefacts")
-    artefact_data = models.JSONField()
+    artefact_data = ArtefactDataField()
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
-        validate(self.artefact_data, self.artefact_type_reference.schema)
-        return super().save(force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields)
+        validation.validate_artefact_data(self.artefact_data, self.artefact_type_reference)
+        # the change of the insert (see `changes`) is recorded by the save signal, in the same transaction
+        with transaction.atomic(using=using):
+            return super().save(
+                force_insert=force_insert, force_update=force_update, using=using, update_fields=update_fields
+            )
 
 
 class RelationShip(models.Model):
@@ -24,3 +90,33 @@ class RelationShip(models.Model):
     child = models.ForeignKey(Artefact, on_delete=models.CASCADE, related_name="parents")
     relationship_type = models.CharField(max_length=120)
     creation_time = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        # the change of the insert (see `changes`) is recorded by the save signal, in the same transaction
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # relationships of a given type of an artefact in a time range (the recent checkpoints of a use case)
+            models.Index(fields=["parent", "relationship_type", "creation_time"], name="relationship_parent_type_time"),
+        ]
+
+
+class Change(models.Model):
+    """
+    insert of an artefact or of a relationship, the ids of the changes are the sequence of the change feed (see
+    `changes`). Relationship changes are about their child artefact and carry its type.
+    """
+    artefact = models.ForeignKey(Artefact, on_delete=models.CASCADE, related_name="+")
+    artefact_type = models.CharField(max_length=120)
+    relationship = models.ForeignKey(RelationShip, null=True, on_delete=models.CASCADE, related_name="+")
+    relationship_type = models.CharField(max_length=120, null=True)
+    parent = models.ForeignKey(Artefact, null=True, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        indexes = [
+            # the new artefacts of a type, and the new children of an artefact (the checkpoints of a use case)
+            models.Index(fields=["artefact_type", "id"], name="change_type_sequence"),
+            models.Index(fields=["parent", "relationship_type", "id"], name="change_parent_type_sequence"),
+        ]
@@ -0,0 +1,71 @@
+from typing import Collection, Optional, Sequence
+
+from django.db.models import F, QuerySet
+from django.db.models.expressions import OrderBy
+from rest_framework import request, exceptions
+
+from . import projections
+
+RELATIONSHIP_FIELDS = ("parents", "children")
+RELATIONSHIP_COLUMNS = ("id", "parent", "child", "relationship_type", "creation_time")
+MAX_LIMIT = 1000
+
+
+class ArtefactOrdering:
+    """
+    order of the query results asked for with the `order_by` (comma separated, `-` prefix for descending order) query
+    parameter, and number of results kept with `limit`. Artefacts can be ordered by `id`, by json paths inside their
+    data (`artefact_data.version.major`, numbers are compared as numbers so versions are ordered on their numeric
+    parts) and by columns of the relationships they are filtered on (`parents.creation_time` along with a
+    `parents__parent` filter), the relationships are joined once per filter so that ordering by an unfiltered one,
+    which would return the artefacts once per relationship, is rejected. Artefacts missing an ordering value come last, ties are broken by id.
+
+    >>> GET /api/artefact/query/?q=...&order_by=-artefact_data.version.major,-artefact_data.version.minor&limit=1
+    >>> GET /api/artefact/query/?q=...&order_by=-parents.creation_time&limit=1
+    """
+
+    def __init__(self, order_by: Sequence[str] = (), limit: Optional[int] = None, filters: Collection[str] = ()):
+        filtered_fields = {key.split("__")[0] for key in filters}
+        self.order_by = [self._get_order_expression(field, filtered_fields) for field in order_by]
+        if limit is not None and limit < 1:
+            raise exceptions.ValidationError({"limit": "limit must be a positive integer"})
+        self.limit = min(limit, MAX_LIMIT) if limit is not None else None
+
+    @classmethod
+    def from_request(cls, client_request: request.Request, filters: Collection[str] = ()) -> "ArtefactOrdering":
+        order_by = client_request.query_params.get("order_by")
+        limit = client_request.query_params.get("limit")
+        try:
+            limit = int(limit) if limit is not None else None
+        except ValueError:
+            raise exceptions.ValidationError({"limit": "limit must be an integer"})
+        return cls(order_by=order_by.split(",") if order_by else (), limit=limit, filters=filters)
+
+    @property
+    def is_default(self) -> bool:
+        """whether results keep the default id order, without limit"""
+        return not self.order_by and self.limit is None
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        """orders and limits the queryset, this must be the last step as the queryset is sliced"""
+        queryset = queryset.order_by(*self.order_by, "id")
+        return queryset[:self.limit] if self.limit is not None else queryset
+
+    @staticmethod
+    def _get_order_expression(field: str, filtered_fields: Collection[str]) -> OrderBy:
+        descending = field.startswith("-")
+        field = field.lstrip("-")
+        relationship_field, _, relationship_column = field.partition(".")
+        if field == "id":
+            expression = F("id")
+        elif field.startswith(projections.DATA_PATH_PREFIX):
+            expression = projections.get_path_transform(field[len(projections.DATA_PATH_PREFIX):])
+        elif relationship_field in RELATIONSHIP_FIELDS and relationship_column in RELATIONSHIP_COLUMNS:
+            if relationship_field not in filtered_fields:
+                raise exceptions.ValidationError({
+                    "order_by": f"cannot order artefacts by {field} without a filter on {relationship_field}"
+                })
+            expression = F(f"{relationship_field}__{relationship_column}")
+        else:
+            raise exceptions.ValidationError({"order_by": f"cannot order artefacts by {field}"})
+        return expression.desc(nulls_last=True) if descending else expression.asc(nulls_last=True)
@@ -0,0 +1,13 @@
+from rest_framework import pagination
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    keyset pagination on ids: pages are selected with `id > last seen id` so every page costs the same whatever its
+    position. Pagination is only applied when the client asks for it with `page_size`, clients that do not keep
+    getting plain lists.
+    """
+    ordering = "id"
+    page_size = None
+    page_size_query_param = "page_size"
+    max_page_size = 1000
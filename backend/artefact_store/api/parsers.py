@@ -0,0 +1,39 @@
+import json
+
+import msgpack
+from rest_framework import parsers, exceptions
+
+
+class MessagePackParser(parsers.BaseParser):
+    """parses MessagePack request bodies (`Content-Type: application/msgpack`)"""
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as error:
+            raise exceptions.ParseError(f"MessagePack parse error - {error}")
+
+
+class BulkNDJSONParser(parsers.BaseParser):
+    """
+    parses bulk ingestion bodies streamed as newline delimited json (`Content-Type: application/x-ndjson`), one artefact
+    or relationship (the rows with a `relationship_type`) per line, into the `artefacts` and `relationships` lists.
+    """
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        bulk_json = {"artefacts": [], "relationships": []}
+        if stream is None:
+            return bulk_json
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                raise exceptions.ParseError(f"NDJSON parse error on line {line_number} - {error}")
+            if not isinstance(row, dict):
+                raise exceptions.ParseError(f"NDJSON parse error on line {line_number} - expected an object")
+            bulk_json["relationships" if "relationship_type" in row else "artefacts"].append(row)
+        return bulk_json
@@ -0,0 +1,96 @@
+from typing import Optional, Sequence, List
+
+from django.db.models import QuerySet
+from rest_framework import request, exceptions
+
+from . import fields
+
+ARTEFACT_FIELDS = ("id", "artefact_type_reference", "artefact_data", "children", "parents")
+RELATIONSHIP_FIELDS = ("children", "parents")
+DATA_PATH_PREFIX = "artefact_data."
+
+
+class ArtefactProjection:
+    """
+    fields of the artefacts a client asked for with the `fields` and `omit` (comma separated) query parameters.
+    `fields` accepts top level fields as well as json paths inside the artefact data (`artefact_data.version.major`),
+    only the selected paths are then extracted by the database. Relationships are only loaded when requested.
+
+    >>> GET /api/artefact/query/?artefact_type=...&q=...&fields=id,artefact_data.version
+    >>> GET /api/artefact/12/?omit=children,parents
+    """
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, omit: Sequence[str] = ()):
+        fields = list(ARTEFACT_FIELDS) if fields is None else list(fields)
+        unknown_fields = [
+            field for field in [*fields, *omit]
+            if field not in ARTEFACT_FIELDS and not field.startswith(DATA_PATH_PREFIX)
+        ]
+        if unknown_fields:
+            raise exceptions.ValidationError({"fields": f"unknown artefact fields {', '.join(unknown_fields)}"})
+        self.data_paths = list(dict.fromkeys(
+            field[len(DATA_PATH_PREFIX):] for field in fields
+            if field.startswith(DATA_PATH_PREFIX) and field not in omit
+        ))
+        overlapping_paths = _get_overlapping_paths(self.data_paths)
+        if overlapping_paths:
+            raise exceptions.ValidationError({
+                "fields": f"artefact data paths {', '.join(overlapping_paths)} are inside other requested paths"
+            })
+        self.fields = [field for field in ARTEFACT_FIELDS if field in fields and field not in omit]
+        if "artefact_data" in self.fields:
+            # the whole artefact data is requested, no need to extract paths
+            self.data_paths = []
+        elif self.data_paths:
+            self.fields.append("artefact_data")
+
+    @classmethod
+    def from_request(cls, client_request: request.Request) -> "ArtefactProjection":
+        fields = client_request.query_params.get("fields")
+        omit = client_request.query_params.get("omit")
+        return cls(
+            fields=fields.split(",") if fields is not None else None,
+            omit=omit.split(",") if omit is not None else ()
+        )
+
+    @property
+    def relationship_fields(self) -> List[str]:
+        return [field for field in RELATIONSHIP_FIELDS if field in self.fields]
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        """
+        restricts the columns and json paths loaded by the queryset to the requested ones, requested relationships
+        are prefetched so that serializing any number of artefacts costs a constant number of queries.
+        """
+        if "artefact_data" not in self.fields or self.data_paths:
+            queryset = queryset.defer("artefact_data")
+        return queryset.prefetch_related(*self.relationship_fields).annotate(**{
+            self._get_path_annotation(path_index): get_path_transform(data_path)
+            for path_index, data_path in enumerate(self.data_paths)
+        })
+
+    def serializer_kwargs(self):
+        return {
+            "fields": self.fields,
+            "data_paths": {self._get_path_annotation(path_index): path for path_index, path in enumerate(self.data_paths)}
+        }
+
+    @staticmethod
+    def _get_path_annotation(path_index: int) -> str:
+        return f"projected_data_path_{path_index}"
+
+
+def _get_overlapping_paths(data_paths: Sequence[str]) -> List[str]:
+    """paths of `data_paths` inside another one (`version.major` and `version`), they cannot be projected together"""
+    return [
+        data_path for data_path in data_paths
+        if any(data_path.startswith(f"{other_path}.") for other_path in data_paths)
+    ]
+
+
+def get_path_transform(data_path: str) -> fields.IndexableKeyTransform:
+    """the `artefact_data` json path `data_path` (`version.major`) as an expression"""
+    transform = "artefact_data"
+    for key in data_path.split("."):
+        transform = fields.IndexableKeyTransform(key, transform)
+    return transform
@@ -0,0 +1,219 @@
+"""
+cache of the serialized responses of the read endpoints (artefact details, artefact types and queries). Reads
+outnumber writes by far and artefacts are immutable, so responses are kept in the `responses` django cache (in memory
+or in files, see the `CACHES` setting) and rendered from it, in any wire format.
+
+Entries are keyed by the endpoint, the normalized query parameters and the generation of each piece of data the
+response depends on (an artefact and its relationships, the artefacts of a type, a type, the relationships). Writes
+replace the generations they affect (write-through invalidation), the stale entries are then never read again and
+expire. Generations are replaced when the write happens and once more when its transaction commits, so that a response
+read between the two is not kept. Queries, relationship listings and expanded artefacts depend on all the
+relationships (`RELATIONSHIPS`): every relationship insert invalidates all of them.
+
+Invalidations only reach the processes sharing the cache, so responses are only cached when the cache is shared by
+all the processes of the store (`RESPONSE_CACHE_SHARED` setting). Otherwise responses are built for every request
+(`X-Response-Cache: bypass`), they still carry their entity tag.
+
+Cached responses carry a strong `ETag`, the digest of their data and wire format. Artefacts are immutable so clients
+revalidate the responses they already hold rather than download them again: a request whose `If-None-Match` matches
+the current entity tag gets an empty 304 response, answered from the cache without querying the database.
+
+Hits, misses and 304 responses are counted per endpoint by each process, see `get_stats`.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import re
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import signals
+from django.dispatch import receiver
+from django.utils import http
+from rest_framework import request, response, status
+from rest_framework.utils import encoders
+
+from . import models
+
+CACHE_ALIAS = "responses"
+# dependency of the responses that include relationships not reachable from a single artefact (lineages, queries)
+RELATIONSHIPS = ("relationships", "all")
+
+Dependency = Tuple[str, str]
+
+_stats: Dict[str, Dict[str, int]] = {}
+_stats_lock = threading.Lock()
+
+
+def cached_response(
+        client_request: request.Request,
+        endpoint: str,
+        dependencies: Iterable[Dependency],
+        build_data: Callable[[], Any]
+) -> response.Response:
+    """
+    response of the endpoint from the cache, or built by `build_data` (serialized data of a successful response) and
+    cached. Errors raised by `build_data` are not cached. The response is a 304 when the client already holds it.
+    """
+    cache = caches[CACHE_ALIAS]
+    key = entry = None
+    if settings.RESPONSE_CACHE_SHARED:
+        key = _get_key(cache, endpoint, dependencies, client_request)
+        entry = cache.get(key)
+    is_hit = entry is not None
+    if not is_hit:
+        data = build_data()
+        entry = (_get_digest(data), data)
+        if key is not None:
+            cache.set(key, entry)
+    digest, data = entry
+    etag = f'"{digest}-{client_request.accepted_renderer.format}"'
+    is_not_modified = _matches(client_request, etag)
+    _record(endpoint, is_hit, is_not_modified)
+    if is_not_modified:
+        cache_response = response.Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        cache_response = response.Response(data)
+    cache_response["ETag"] = etag
+    cache_response["X-Response-Cache"] = "hit" if is_hit else "miss" if key is not None else "bypass"
+    return cache_response
+
+
+def invalidate(dependencies: Iterable[Dependency]):
+    """replaces the generations of the dependencies, now and once the current transaction commits"""
+    dependencies = [(kind, str(name)) for kind, name in dependencies]
+    if not dependencies:
+        return
+    _replace_generations(dependencies)
+    transaction.on_commit(lambda: _replace_generations(dependencies))
+
+
+def invalidate_artefacts(artefacts: Iterable[models.Artefact]):
+    invalidate(dependency for artefact in artefacts for dependency in _get_artefact_dependencies(artefact))
+
+
+def invalidate_relationships(relationships: Iterable[models.RelationShip]):
+    invalidate({
+        dependency for relationship in relationships for dependency in _get_relationship_dependencies(relationship)
+    })
+
+
+def invalidate_artefact_types(type_names: Iterable[str]):
+    invalidate(
+        dependency for type_name in type_names
+        for dependency in (("artefact_type", type_name), ("type_artefacts", type_name))
+    )
+
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    """hits, misses, hit rate and 304 responses of each cached endpoint since the process started"""
+    with _stats_lock:
+        return {
+            endpoint: {**counts, "hit_rate": counts["hits"] / (counts["hits"] + counts["misses"])}
+            for endpoint, counts in _stats.items()
+        }
+
+
+def clear():
+    caches[CACHE_ALIAS].clear()
+    with _stats_lock:
+        _stats.clear()
+
+
+def _get_key(cache, endpoint: str, dependencies: Iterable[Dependency], client_request: request.Request) -> str:
+    dependencies = [(kind, str(name)) for kind, name in dependencies]
+    generations = _get_generations(cache, dependencies)
+    key_json = json.dumps(
+        [endpoint, [[*dependency, generations[dependency]] for dependency in dependencies],
+         _normalize_params(client_request)]
+    )
+    return f"response:{endpoint}:{hashlib.sha256(key_json.encode('utf-8')).hexdigest()}"
+
+
+def _get_artefact_dependencies(artefact: models.Artefact) -> List[Dependency]:
+    return [("artefact", artefact.pk), ("type_artefacts", artefact.artefact_type_reference_id)]
+
+
+def _get_relationship_dependencies(relationship: models.RelationShip) -> List[Dependency]:
+    return [("artefact", relationship.parent_id), ("artefact", relationship.child_id), RELATIONSHIPS]
+
+
+def _get_generations(cache, dependencies: List[Dependency]) -> Dict[Dependency, str]:
+    generation_keys = {dependency: _get_generation_key(dependency) for dependency in dependencies}
+    cached_generations = cache.get_many(generation_keys.values())
+    generations = {}
+    for dependency, generation_key in generation_keys.items():
+        generation = cached_generations.get(generation_key)
+        if generation is None:
+            # a generation that expired is replaced, the entries of the previous one are not read again
+            generation = uuid.uuid4().hex
+            if not cache.add(generation_key, generation, timeout=None):
+                generation = cache.get(generation_key, generation)
+        generations[dependency] = generation
+    return generations
+
+
+def _replace_generations(dependencies: List[Dependency]):
+    caches[CACHE_ALIAS].set_many(
+        {_get_generation_key(dependency): uuid.uuid4().hex for dependency in dependencies}, timeout=None
+    )
+
+
+def _get_generation_key(dependency: Dependency) -> str:
+    kind, name = dependency
+    return f"generation:{kind}:{hashlib.sha256(name.encode('utf-8')).hexdigest()}"
+
+
+def _get_digest(data: Any) -> str:
+    data_json = json.dumps(data, cls=encoders.JSONEncoder, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data_json.encode("utf-8")).hexdigest()[:32]
+
+
+def _matches(client_request: request.Request, etag: str) -> bool:
+    """whether the `If-None-Match` header lists the entity tag (compared weakly, compression makes tags weak)"""
+    client_etags = http.parse_etags(client_request.headers.get("If-None-Match", ""))
+    return "*" in client_etags or etag in (re.sub(r"^W/", "", client_etag) for client_etag in client_etags)
+
+
+def _normalize_params(client_request: request.Request) -> List[Tuple[str, List[str]]]:
+    """query parameters in a canonical order, the filters of queries (`q`) with sorted keys"""
+    params = []
+    for name, values in sorted(client_request.query_params.lists()):
+        if name == "q":
+            values = [_normalize_query(value) for value in values]
+        params.append((name, values))
+    return params
+
+
+def _normalize_query(encoded_query: str) -> str:
+    try:
+        return json.dumps(json.loads(base64.b64decode(encoded_query)), sort_keys=True)
+    except (ValueError, binascii.Error):
+        return encoded_query
+
+
+def _record(endpoint: str, is_hit: bool, is_not_modified: bool):
+    with _stats_lock:
+        counts = _stats.setdefault(endpoint, {"hits": 0, "misses": 0, "not_modified": 0})
+        counts["hits" if is_hit else "misses"] += 1
+        counts["not_modified"] += is_not_modified
+
+
+@receiver([signals.post_save, signals.post_delete], sender=models.Artefact)
+def _invalidate_artefact(sender, instance: models.Artefact, **kwargs):
+    invalidate_artefacts([instance])
+
+
+@receiver([signals.post_save, signals.post_delete], sender=models.RelationShip)
+def _invalidate_relationship(sender, instance: models.RelationShip, **kwargs):
+    invalidate_relationships([instance])
+
+
+@receiver([signals.post_save, signals.post_delete], sender=models.ArtefactType)
+def _invalidate_artefact_type(sender, instance: models.ArtefactType, **kwargs):
+    invalidate_artefact_types([instance.type_name])
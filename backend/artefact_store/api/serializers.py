@@ -1,21 +1,51 @@
+import jsonschema
+from django.db import transaction
 from rest_framework import serializers
 
 from . import models
 
+# maximum number of artefacts fetched at once by id
+MAX_MANY_IDS = 1000
+# maximum number of queries run in a single batch
+MAX_BATCH_QUERIES = 50
+# maximum number of changes returned by a request to the change feed, and maximum wait (in seconds) for one
+MAX_CHANGES = 1000
+MAX_CHANGES_TIMEOUT = 60
+
 
 class ArtefactTypeSerializer(serializers.ModelSerializer):
+    indexed_paths = serializers.ListField(child=serializers.CharField(max_length=200), required=False)
+
     class Meta:
         model = models.ArtefactType
-        fields = ["type_name", "schema"]
+        fields = ["type_name", "schema", "indexed_paths"]
+
+
+class EnsureArtefactTypeSerializer(ArtefactTypeSerializer):
+    """artefact type that may already exist"""
+
+    class Meta(ArtefactTypeSerializer.Meta):
+        extra_kwargs = {"type_name": {"validators": []}}
 
 
 class RelationShipSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.RelationShip
-        fields = ("id", "parent", "child", "relationship_type")
+        fields = ("id", "parent", "child", "relationship_type", "creation_time")
         read_only_fields = ("creation_time",)
 
 
+class RelationshipFiltersSerializer(serializers.Serializer):
+    """filters of the relationship listing, given as query parameters"""
+    parent = serializers.IntegerField(required=False)
+    child = serializers.IntegerField(required=False)
+    relationship_type = serializers.CharField(max_length=120, required=False)
+    creation_time__gt = serializers.DateTimeField(required=False)
+    creation_time__gte = serializers.DateTimeField(required=False)
+    creation_time__lt = serializers.DateTimeField(required=False)
+    creation_time__lte = serializers.DateTimeField(required=False)
+
+
 class ParentRelationShipSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.RelationShip
@@ -32,10 +62,43 @@ class ChildRelationShipSerializer(serializers.ModelSerializer):
         ]
 
 
+class ArtefactDataPathsField(serializers.Field):
+    """
+    artefact data restricted to some json paths, the values of the paths are read from the queryset annotations
+    (see `projections.ArtefactProjection`).
+    """
+
+    def __init__(self, data_paths, **kwargs):
+        self.data_paths = data_paths
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, value):
+        artefact_data = {}
+        for annotation_name, data_path in self.data_paths.items():
+            *parent_keys, last_key = data_path.split(".")
+            nested_data = artefact_data
+            for key in parent_keys:
+                nested_data = nested_data.setdefault(key, {})
+            nested_data[last_key] = getattr(value, annotation_name)
+        return artefact_data
+
+
 class ArtefactSerializer(serializers.ModelSerializer):
+    """
+    artefact with its relationships, `fields` restricts the serialized fields and `data_paths` (mapping of queryset
+    annotations to json paths) restricts the artefact data to some paths.
+    """
     children = ParentRelationShipSerializer(many=True, read_only=True)
     parents = ChildRelationShipSerializer(many=True, read_only=True)
 
+    def __init__(self, *args, fields=None, data_paths=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+        if data_paths:
+            self.fields["artefact_data"] = ArtefactDataPathsField(data_paths)
+
     class Meta:
         model = models.Artefact
         fields = [
@@ -45,3 +108,128 @@ class ArtefactSerializer(serializers.ModelSerializer):
             "children",
             "parents"
         ]
+
+
+class ArtefactIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), max_length=MAX_MANY_IDS)
+
+
+class ArtefactQuerySerializer(serializers.Serializer):
+    """
+    query of a batch, with the parameters of the query endpoint: django style `filters` on the artefacts of
+    `artefact_type`, `order_by` and `limit` (see `ordering.ArtefactOrdering`) and the `fields`/`omit` projection.
+    With `"expand": "parents"` the ancestors of the artefacts, up to `depth` relationships away, are returned as well
+    """
+    artefact_type = serializers.CharField(max_length=120)
+    filters = serializers.DictField(required=False, default=dict)
+    order_by = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    limit = serializers.IntegerField(min_value=1, required=False)
+    fields = serializers.ListField(child=serializers.CharField(), required=False)
+    omit = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    expand = serializers.ChoiceField(choices=["parents"], required=False)
+    depth = serializers.IntegerField(min_value=1, required=False)
+
+
+class ArtefactQueryBatchSerializer(serializers.Serializer):
+    queries = serializers.DictField(child=ArtefactQuerySerializer())
+
+    def validate_queries(self, queries):
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise serializers.ValidationError(f"at most {MAX_BATCH_QUERIES} queries can be batched")
+        return queries
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    sequence = serializers.IntegerField(source="id")
+    kind = serializers.SerializerMethodField()
+
+    class Meta:
+        model = models.Change
+        fields = ["sequence", "kind", "artefact", "artefact_type", "relationship", "relationship_type", "parent"]
+
+    def get_kind(self, change: models.Change) -> str:
+        return "artefact" if change.relationship_id is None else "relationship"
+
+
+class ChangeFeedSerializer(serializers.Serializer):
+    """
+    parameters of the change feed, given as query parameters: the changes after the sequence number `after` (the
+    current end of the feed by default) matching the filters, waiting up to `timeout` seconds for one
+    """
+    after = serializers.IntegerField(min_value=0, required=False)
+    kind = serializers.ChoiceField(choices=["artefact", "relationship"], required=False)
+    artefact_type = serializers.CharField(max_length=120, required=False)
+    relationship_type = serializers.CharField(max_length=120, required=False)
+    parent = serializers.IntegerField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_CHANGES, default=100)
+    timeout = serializers.FloatField(min_value=0, max_value=MAX_CHANGES_TIMEOUT, default=0)
+
+
+class GraphArtefactSerializer(serializers.ModelSerializer):
+    ref = serializers.CharField(max_length=120, write_only=True)
+
+    class Meta:
+        model = models.Artefact
+        fields = ["ref", "artefact_type_reference", "artefact_data"]
+
+
+class GraphRelationShipSerializer(serializers.Serializer):
+    """
+    relationship of a graph, each end is either an already saved artefact (`parent`/`child`) or an artefact of the
+    graph (`parent_ref`/`child_ref`).
+    """
+    parent = serializers.PrimaryKeyRelatedField(queryset=models.Artefact.objects.all(), required=False)
+    parent_ref = serializers.CharField(max_length=120, required=False)
+    child = serializers.PrimaryKeyRelatedField(queryset=models.Artefact.objects.all(), required=False)
+    child_ref = serializers.CharField(max_length=120, required=False)
+    relationship_type = serializers.CharField(max_length=120)
+
+    def validate(self, attrs):
+        for end in ("parent", "child"):
+            if (end in attrs) == (f"{end}_ref" in attrs):
+                raise serializers.ValidationError(f"exactly one of `{end}` and `{end}_ref` must be provided")
+        return attrs
+
+
+class ArtefactGraphSerializer(serializers.Serializer):
+    """
+    a set of artefacts and their relationships that are saved together in one transaction.
+    """
+    artefacts = GraphArtefactSerializer(many=True)
+    relationships = GraphRelationShipSerializer(many=True, required=False, default=list)
+
+    def validate(self, attrs):
+        refs = [artefact["ref"] for artefact in attrs["artefacts"]]
+        if len(set(refs)) != len(refs):
+            raise serializers.ValidationError("artefact refs must be unique within a graph")
+        for relationship in attrs["relationships"]:
+            for end in ("parent_ref", "child_ref"):
+                if end in relationship and relationship[end] not in refs:
+                    raise serializers.ValidationError(f"unknown artefact ref {relationship[end]}")
+        return attrs
+
+    def create(self, validated_data):
+        artefacts_by_ref = {}
+        relationships = []
+        with transaction.atomic():
+            for artefact_data in validated_data["artefacts"]:
+                ref = artefact_data.pop("ref")
+                artefact = models.Artefact(**artefact_data)
+                try:
+                    artefact.save()
+                except jsonschema.ValidationError as error:
+                    raise serializers.ValidationError({"artefacts": {ref: error.message}})
+                artefacts_by_ref[ref] = artefact
+            for relationship_data in validated_data["relationships"]:
+                relationships.append(models.RelationShip.objects.create(
+                    parent=relationship_data.get("parent") or artefacts_by_ref[relationship_data.get("parent_ref")],
+                    child=relationship_data.get("child") or artefacts_by_ref[relationship_data.get("child_ref")],
+                    relationship_type=relationship_data["relationship_type"]
+                ))
+        return {"artefacts": artefacts_by_ref, "relationships": relationships}
+
+    def to_representation(self, instance):
+        return {
+            "artefacts": [{"ref": ref, "id": artefact.id} for ref, artefact in instance["artefacts"].items()],
+            "relationships": RelationShipSerializer(instance["relationships"], many=True).data
+        }
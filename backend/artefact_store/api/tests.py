@@ -1,10 +1,23 @@
+import asyncio
+import gzip
+import datetime
 import json
 import base64
+import threading
+import time
 from typing import Dict, Any
+from unittest import mock
 
-from django.test import TestCase, Client
+import jsonschema
+import msgpack
+from asgiref.sync import async_to_sync
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
 
-from . import models
+from . import models, indexes, validation, views, async_views, urls, middleware, bulk, response_cache, changes
 
 # Create your tests here.
 
@@ -58,6 +71,7 @@ class TestArtefactQuery(TestCase):
         response = test_client.get(
             "/api/artefact/query/",
             {
+                "artefact_type": "lor_characters",
                 "q": self._format_query({"artefact_data__character_name": "bilbo"})
             })
         assert response.status_code == 200
@@ -96,7 +110,7 @@ class TestArtefactQuery(TestCase):
         test_client = Client()
         response = test_client.get(
             "/api/artefact/query/",
-            {"q": self._format_query(
+            {"artefact_type": "lor_characters", "q": self._format_query(
                 {
                     "artefact_data__character_armement__weapon_type": "dagger",
                     "artefact_data__character_armement__n_kills": 2
@@ -137,7 +151,7 @@ class TestArtefactQuery(TestCase):
         test_client = Client()
         response = test_client.get(
             "/api/artefact/query/",
-            {"q": self._format_query(
+            {"artefact_type": "lor_characters", "q": self._format_query(
                 {"artefact_data__charater_race": "hobbit", "artefact_data__character_name": "bilbo"}
             )}
         )
@@ -148,10 +162,1278 @@ class TestArtefactQuery(TestCase):
 
         response = test_client.get(
             "/api/artefact/query/",
-            {"q": self._format_query(
+            {"artefact_type": "lor_characters", "q": self._format_query(
             {"artefact_data__charater_race": "elf", "artefact_data__character_name": "bilbo"}
             )}
         )
         assert response.status_code == 200
         response_json = response.json()
-        assert len(response_json) == 0
\ No newline at end of file
+        assert len(response_json) == 0
+
+
+class TestArtefactGraph(TestCase):
+
+    def setUp(self):
+        models.ArtefactType.objects.create(
+            type_name="lor_characters",
+            schema={
+                "type": "object",
+                "properties": {
+                    "character_name": {"type": "string"},
+                },
+                "required": ["character_name"]
+            }
+        )
+        artefact_type = models.ArtefactType.objects.get(type_name="lor_characters")
+        self.bilbo = models.Artefact(artefact_type_reference=artefact_type, artefact_data={"character_name": "bilbo"})
+        self.bilbo.save()
+
+    def test_graph_save(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact/graph/",
+            {
+                "artefacts": [
+                    {"ref": "frodo", "artefact_type_reference": "lor_characters",
+                     "artefact_data": {"character_name": "frodo"}},
+                    {"ref": "sam", "artefact_type_reference": "lor_characters",
+                     "artefact_data": {"character_name": "sam"}},
+                ],
+                "relationships": [
+                    {"parent": self.bilbo.id, "child_ref": "frodo", "relationship_type": "nephew"},
+                    {"parent_ref": "frodo", "child_ref": "sam", "relationship_type": "gardener"},
+                ]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 201
+        response_json = response.json()
+        frodo_id, sam_id = [artefact["id"] for artefact in response_json["artefacts"]]
+        assert [artefact["ref"] for artefact in response_json["artefacts"]] == ["frodo", "sam"]
+        assert models.Artefact.objects.get(id=frodo_id).artefact_data == {"character_name": "frodo"}
+        assert [
+            (relationship["parent"], relationship["child"]) for relationship in response_json["relationships"]
+        ] == [(self.bilbo.id, frodo_id), (frodo_id, sam_id)]
+        assert models.RelationShip.objects.filter(child_id=sam_id, relationship_type="gardener").count() == 1
+
+    def test_graph_save_is_atomic(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact/graph/",
+            {
+                "artefacts": [
+                    {"ref": "frodo", "artefact_type_reference": "lor_characters",
+                     "artefact_data": {"character_name": "frodo"}},
+                    {"ref": "orc", "artefact_type_reference": "lor_characters", "artefact_data": {}},
+                ],
+                "relationships": [
+                    {"parent": self.bilbo.id, "child_ref": "frodo", "relationship_type": "nephew"},
+                ]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert models.Artefact.objects.count() == 1
+        assert models.RelationShip.objects.count() == 0
+
+    def test_graph_unknown_ref(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact/graph/",
+            {
+                "artefacts": [
+                    {"ref": "frodo", "artefact_type_reference": "lor_characters",
+                     "artefact_data": {"character_name": "frodo"}},
+                ],
+                "relationships": [
+                    {"parent_ref": "gandalf", "child_ref": "frodo", "relationship_type": "friend"},
+                ]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert models.Artefact.objects.count() == 1
+
+
+class TestArtefactTypeEnsure(TestCase):
+
+    def test_ensure_creates_missing_types(self):
+        models.ArtefactType.objects.create(type_name="hobbit", schema={"type": "object"})
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact-type/ensure/",
+            [
+                {"type_name": "elf", "schema": {"type": "object", "required": ["name"]}},
+                {"type_name": "hobbit", "schema": {"type": "object", "required": ["name"]}},
+            ],
+            content_type="application/json"
+        )
+        assert response.status_code == 200
+        assert response.json() == [
+            {"type_name": "elf", "schema": {"type": "object", "required": ["name"]}, "indexed_paths": []},
+            {"type_name": "hobbit", "schema": {"type": "object"}, "indexed_paths": []},
+        ]
+        assert models.ArtefactType.objects.count() == 2
+
+
+class TestArtefactPathIndexes(TransactionTestCase):
+    """indexes are created outside of transactions, they are dropped after each test as the test data is"""
+
+    def tearDown(self):
+        path_indexes = [indexes.get_path_index(data_path) for data_path in ("name", "age.years", "shire")]
+        with connection.schema_editor() as schema_editor:
+            for index in path_indexes:
+                if index.name in indexes._get_index_names():
+                    schema_editor.remove_index(models.Artefact, index)
+
+    def test_declared_paths_are_indexed(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact-type/ensure/",
+            [{"type_name": "hobbit", "schema": {"type": "object"}, "indexed_paths": ["name", "age.years"]}],
+            content_type="application/json"
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["indexed_paths"] == ["name", "age.years"]
+        hobbits = models.Artefact.objects.filter(artefact_type_reference="hobbit")
+        name_index = indexes.get_path_index("name").name
+        assert name_index in hobbits.filter(artefact_data__name="frodo").explain()
+        age_index = indexes.get_path_index("age.years").name
+        assert age_index in hobbits.filter(artefact_data__age__years=33).explain()
+
+    def test_queries_are_scoped_to_a_type(self):
+        models.ArtefactType.objects.create(type_name="hobbit", schema={"type": "object"}, indexed_paths=["name"])
+        models.ArtefactType.objects.create(type_name="pony", schema={"type": "object"})
+        indexes.ensure_path_indexes(["name"])
+        frodo = models.Artefact.objects.create(artefact_type_reference_id="hobbit", artefact_data={"name": "frodo"})
+        models.Artefact.objects.create(artefact_type_reference_id="pony", artefact_data={"name": "frodo"})
+        query = base64.b64encode(json.dumps({"artefact_data__name": "frodo"}).encode("utf-8"))
+        test_client = Client()
+        response = test_client.get("/api/artefact/query/", {"artefact_type": "hobbit", "q": query, "fields": "id"})
+        assert response.json() == [{"id": frodo.id}]
+        assert test_client.get("/api/artefact/query/", {"q": query}).status_code == 400
+
+    def test_ensure_extends_indexed_paths(self):
+        models.ArtefactType.objects.create(type_name="hobbit", schema={"type": "object"}, indexed_paths=["name"])
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact-type/ensure/",
+            [{"type_name": "hobbit", "schema": {"type": "object"}, "indexed_paths": ["name", "shire"]}],
+            content_type="application/json"
+        )
+        assert response.json()[0]["indexed_paths"] == ["name", "shire"]
+        assert indexes.ensure_path_indexes(["name", "shire"]) == []
+
+    def test_concurrently_created_indexes_are_skipped(self):
+        indexes.ensure_path_indexes(["name"])
+        with mock.patch.object(indexes, "_get_index_names", side_effect=[set(), indexes._get_index_names()]):
+            assert indexes.ensure_path_indexes(["name"]) == []
+        with mock.patch.object(indexes, "_get_index_names", return_value=set()):
+            with self.assertRaises(DatabaseError):
+                indexes.ensure_path_indexes(["name"])
+
+
+class TestArtefactLineageExpansion(TestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.lineage = []
+        for character_name in ["bungo", "bilbo", "frodo", "sam"]:
+            character = models.Artefact(
+                artefact_type_reference=artefact_type, artefact_data={"character_name": character_name}
+            )
+            character.save()
+            if self.lineage:
+                models.RelationShip.objects.create(
+                    parent=self.lineage[-1], child=character, relationship_type="heir"
+                )
+            self.lineage.append(character)
+
+    def test_expand_parents(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.lineage[-1].id}/", {"expand": "parents"})
+        assert response.status_code == 200
+        response_json = response.json()
+        assert response_json["artefact_data"] == {"character_name": "sam"}
+        assert sorted(ancestor["artefact_data"]["character_name"] for ancestor in response_json["ancestors"]) == [
+            "bilbo", "bungo", "frodo"
+        ]
+        frodo_json = next(
+            ancestor for ancestor in response_json["ancestors"]
+            if ancestor["artefact_data"]["character_name"] == "frodo"
+        )
+        assert frodo_json["parents"][0]["parent"] == self.lineage[1].id
+
+    def test_expand_parents_depth(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.lineage[-1].id}/", {"expand": "parents", "depth": 2})
+        assert response.status_code == 200
+        assert sorted(ancestor["artefact_data"]["character_name"] for ancestor in response.json()["ancestors"]) == [
+            "bilbo", "frodo"
+        ]
+
+    def test_expand_parents_depth_must_be_at_least_one(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.lineage[-1].id}/", {"expand": "parents", "depth": 0})
+        assert response.status_code == 400
+        response = test_client.get(f"/api/artefact/{self.lineage[-1].id}/ancestors/", {"depth": 0})
+        assert response.status_code == 400
+
+    def test_no_expansion(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.lineage[-1].id}/")
+        assert response.status_code == 200
+        assert "ancestors" not in response.json()
+        response = test_client.get(f"/api/artefact/{self.lineage[-1].id}/", {"expand": "children"})
+        assert response.status_code == 400
+
+
+class TestArtefactMany(TestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.lineage = []
+        for character_name in ["bilbo", "frodo", "sam"]:
+            character = models.Artefact(
+                artefact_type_reference=artefact_type, artefact_data={"character_name": character_name}
+            )
+            character.save()
+            if self.lineage:
+                models.RelationShip.objects.create(
+                    parent=self.lineage[-1], child=character, relationship_type="heir"
+                )
+            self.lineage.append(character)
+
+    def test_many_preserves_order_and_reports_missing(self):
+        test_client = Client()
+        missing_id = self.lineage[-1].id + 100
+        response = test_client.post(
+            "/api/artefact/many/",
+            {"ids": [self.lineage[2].id, missing_id, self.lineage[0].id]},
+            content_type="application/json"
+        )
+        assert response.status_code == 200
+        response_json = response.json()
+        assert [artefact["artefact_data"]["character_name"] for artefact in response_json["results"]] == [
+            "sam", "bilbo"
+        ]
+        assert response_json["missing"] == [missing_id]
+        assert response_json["results"][0]["parents"][0]["parent"] == self.lineage[1].id
+
+    def test_many_with_projection_and_ancestors(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact/many/?expand=parents&depth=1&fields=id,artefact_data.character_name",
+            {"ids": [self.lineage[2].id]},
+            content_type="application/json"
+        )
+        assert response.status_code == 200
+        response_json = response.json()
+        assert response_json["results"] == [
+            {"id": self.lineage[2].id, "artefact_data": {"character_name": "sam"}}
+        ]
+        assert response_json["ancestors"] == [
+            {"id": self.lineage[1].id, "artefact_data": {"character_name": "frodo"}}
+        ]
+
+    def test_many_is_a_single_query(self):
+        test_client = Client()
+        with self.assertNumQueries(3):
+            # artefacts then their children and parents
+            response = test_client.post(
+                "/api/artefact/many/", {"ids": [artefact.id for artefact in self.lineage]},
+                content_type="application/json"
+            )
+        assert len(response.json()["results"]) == 3
+
+    def test_invalid_ids(self):
+        test_client = Client()
+        response = test_client.post("/api/artefact/many/", {"ids": ["frodo"]}, content_type="application/json")
+        assert response.status_code == 400
+
+
+class TestRelationshipQueryCount(TestCase):
+
+    def setUp(self):
+        self.artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.shire = models.Artefact(artefact_type_reference=self.artefact_type, artefact_data={"place": "shire"})
+        self.shire.save()
+
+    def _add_hobbits(self, count: int):
+        for _ in range(count):
+            hobbit = models.Artefact(artefact_type_reference=self.artefact_type, artefact_data={"race": "hobbit"})
+            hobbit.save()
+            models.RelationShip.objects.create(parent=self.shire, child=hobbit, relationship_type="lives_in")
+            models.RelationShip.objects.create(parent=hobbit, child=self.shire, relationship_type="owns")
+
+    def _count_queries(self, path: str, params: Dict[str, Any]) -> int:
+        test_client = Client()
+        with CaptureQueriesContext(connection) as queries:
+            response = test_client.get(path, params)
+        assert response.status_code == 200
+        return len(queries)
+
+    def test_query_count_is_flat(self):
+        query_params = {
+            "artefact_type": "lor_characters",
+            "q": base64.b64encode(json.dumps({"artefact_data__race": "hobbit"}).encode("utf-8"))
+        }
+        self._add_hobbits(2)
+        small_query_counts = [
+            self._count_queries("/api/artefact/query/", query_params),
+            self._count_queries("/api/artefact/query/", {**query_params, "page_size": 50}),
+            self._count_queries("/api/artefact/", {}),
+        ]
+        self._add_hobbits(20)
+        large_query_counts = [
+            self._count_queries("/api/artefact/query/", query_params),
+            self._count_queries("/api/artefact/query/", {**query_params, "page_size": 50}),
+            self._count_queries("/api/artefact/", {}),
+        ]
+        assert large_query_counts == small_query_counts
+        # artefacts, their children and their parents
+        assert small_query_counts[0] == 3
+
+
+class TestKeysetPagination(TestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.characters = []
+        for character_index in range(5):
+            character = models.Artefact(
+                artefact_type_reference=artefact_type,
+                artefact_data={"character_name": f"dwarf_{character_index}", "charater_race": "dwarf"}
+            )
+            character.save()
+            self.characters.append(character)
+        for parent, child in zip(self.characters, self.characters[1:]):
+            models.RelationShip.objects.create(parent=parent, child=child, relationship_type="heir")
+
+    @staticmethod
+    def _format_query(query_args: Dict[str, Any]) -> bytes:
+        return base64.b64encode(json.dumps(query_args).encode("utf-8"))
+
+    def _collect_pages(self, route: str, params: Dict[str, Any]):
+        test_client = Client()
+        pages = []
+        response = test_client.get(route, params)
+        while True:
+            assert response.status_code == 200
+            pages.append(response.json()["results"])
+            if response.json()["next"] is None:
+                return pages
+            response = test_client.get(response.json()["next"])
+
+    def test_query_pagination(self):
+        pages = self._collect_pages(
+            "/api/artefact/query/",
+            {
+                "artefact_type": "lor_characters",
+                "q": self._format_query({"artefact_data__charater_race": "dwarf"}),
+                "page_size": 2
+            }
+        )
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [artefact["id"] for page in pages for artefact in page] == [
+            character.id for character in self.characters
+        ]
+
+    def test_relationship_pagination(self):
+        pages = self._collect_pages("/api/artefact-relationship/", {"page_size": 3})
+        assert [len(page) for page in pages] == [3, 1]
+
+    def test_unpaginated_query(self):
+        test_client = Client()
+        response = test_client.get(
+            "/api/artefact/query/",
+            {"artefact_type": "lor_characters", "q": self._format_query({"artefact_data__charater_race": "dwarf"})}
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 5
+
+
+class TestArtefactProjection(TestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.bilbo = models.Artefact(
+            artefact_type_reference=artefact_type,
+            artefact_data={
+                "character_name": "bilbo",
+                "charater_race": "hobbit",
+                "character_armement": {"weapon_type": "dagger", "weapon_name": "sting"}
+            }
+        )
+        self.bilbo.save()
+        self.frodo = models.Artefact(
+            artefact_type_reference=artefact_type,
+            artefact_data={"character_name": "frodo", "charater_race": "hobbit"}
+        )
+        self.frodo.save()
+        models.RelationShip.objects.create(parent=self.bilbo, child=self.frodo, relationship_type="heir")
+
+    @staticmethod
+    def _format_query(query_args: Dict[str, Any]) -> bytes:
+        return base64.b64encode(json.dumps(query_args).encode("utf-8"))
+
+    def test_query_json_paths(self):
+        test_client = Client()
+        response = test_client.get(
+            "/api/artefact/query/",
+            {
+                "artefact_type": "lor_characters",
+                "q": self._format_query({"artefact_data__charater_race": "hobbit"}),
+                "fields": "id,artefact_data.character_name,artefact_data.character_armement.weapon_name"
+            }
+        )
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "id": self.bilbo.id,
+                "artefact_data": {"character_name": "bilbo", "character_armement": {"weapon_name": "sting"}}
+            },
+            {
+                "id": self.frodo.id,
+                "artefact_data": {"character_name": "frodo", "character_armement": {"weapon_name": None}}
+            },
+        ]
+
+    def test_detail_omit_relationships(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.frodo.id}/", {"omit": "children,parents"})
+        assert response.status_code == 200
+        assert response.json() == {
+            "id": self.frodo.id,
+            "artefact_type_reference": "lor_characters",
+            "artefact_data": {"character_name": "frodo", "charater_race": "hobbit"}
+        }
+
+    def test_detail_only_children(self):
+        test_client = Client()
+        with self.assertNumQueries(2):
+            response = test_client.get(f"/api/artefact/{self.bilbo.id}/", {"fields": "children"})
+        assert response.status_code == 200
+        assert [child["child"] for child in response.json()["children"]] == [self.frodo.id]
+        assert list(response.json()) == ["children"]
+
+    def test_unknown_field(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.bilbo.id}/", {"fields": "id,weapon"})
+        assert response.status_code == 400
+
+    def test_overlapping_paths(self):
+        test_client = Client()
+        response = test_client.get(
+            f"/api/artefact/{self.bilbo.id}/",
+            {"fields": "artefact_data.character_armement,artefact_data.character_armement.weapon_name"}
+        )
+        assert response.status_code == 400
+        assert "character_armement.weapon_name" in response.json()["fields"]
+        response = test_client.get(
+            f"/api/artefact/{self.bilbo.id}/",
+            {"fields": "artefact_data.character_armement,artefact_data.character_armement,artefact_data.character_name"}
+        )
+        assert response.status_code == 200
+        assert response.json()["artefact_data"] == {
+            "character_name": "bilbo", "character_armement": {"weapon_type": "dagger", "weapon_name": "sting"}
+        }
+
+
+class TestWireFormat(TestCase):
+
+    def setUp(self):
+        self.artefact_type = models.ArtefactType.objects.create(
+            type_name="lor_characters", schema={"type": "object"}
+        )
+        self.artefact = models.Artefact(
+            artefact_type_reference=self.artefact_type,
+            artefact_data={"character_name": "frodo", "items": [f"item_{index}" for index in range(100)]}
+        )
+        self.artefact.save()
+
+    def test_msgpack_response(self):
+        test_client = Client()
+        json_response = test_client.get(f"/api/artefact/{self.artefact.id}/")
+        msgpack_response = test_client.get(f"/api/artefact/{self.artefact.id}/", HTTP_ACCEPT="application/msgpack")
+        assert msgpack_response.status_code == 200
+        assert msgpack_response["Content-Type"] == "application/msgpack"
+        assert msgpack.unpackb(msgpack_response.content) == json_response.json()
+        assert len(msgpack_response.content) < len(json_response.content)
+
+    def test_msgpack_request(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact/graph/",
+            msgpack.packb({"artefacts": [
+                {"ref": "sam", "artefact_type_reference": "lor_characters", "artefact_data": {"character_name": "sam"}}
+            ]}),
+            content_type="application/msgpack",
+            HTTP_ACCEPT="application/msgpack"
+        )
+        assert response.status_code == 201
+        assert msgpack.unpackb(response.content)["artefacts"][0]["ref"] == "sam"
+
+    def test_gzip_response(self):
+        test_client = Client()
+        response = test_client.get(f"/api/artefact/{self.artefact.id}/", HTTP_ACCEPT_ENCODING="gzip")
+        assert response["Content-Encoding"] == "gzip"
+        assert json.loads(gzip.decompress(response.content))["artefact_data"]["character_name"] == "frodo"
+
+
+class TestSchemaValidation(TestCase):
+
+    def setUp(self):
+        validation.clear_validators()
+        self.artefact_type = models.ArtefactType.objects.create(
+            type_name="lor_characters",
+            schema={"type": "object", "properties": {"character_name": {"type": "string"}}}
+        )
+
+    def test_validator_is_built_once(self):
+        validator = validation.get_validator(self.artefact_type)
+        reloaded_type = models.ArtefactType.objects.get(type_name="lor_characters")
+        assert validation.get_validator(reloaded_type) is validator
+
+    def test_validator_is_rebuilt_when_schema_changes(self):
+        models.Artefact(artefact_type_reference=self.artefact_type, artefact_data={}).save()
+        self.artefact_type.schema = {**self.artefact_type.schema, "required": ["character_name"]}
+        self.artefact_type.save()
+        with self.assertRaises(jsonschema.ValidationError):
+            models.Artefact(artefact_type_reference=self.artefact_type, artefact_data={}).save()
+
+    def test_invalid_artefact(self):
+        with self.assertRaises(jsonschema.ValidationError):
+            models.Artefact(artefact_type_reference=self.artefact_type, artefact_data={"character_name": 1}).save()
+
+    def test_validation_is_timed(self):
+        test_client = Client()
+        response = test_client.post(
+            "/api/artefact/graph/",
+            {"artefacts": [
+                {"ref": "sam", "artefact_type_reference": "lor_characters", "artefact_data": {"character_name": "sam"}}
+            ]},
+            content_type="application/json"
+        )
+        assert response.status_code == 201
+        metrics = [metric.split(";")[0] for metric in response["Server-Timing"].split(", ")]
+        assert metrics == ["validator_build", "validation", "total"]
+
+
+class TestArtefactOrdering(TestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="rings", schema={"type": "object"})
+        self.forge = models.Artefact(artefact_type_reference=artefact_type, artefact_data={"ring_name": "forge"})
+        self.forge.save()
+        self.rings = []
+        for ring_index, (major, minor) in enumerate([(2, 0), (10, 1), (10, 0), (1, 5)]):
+            ring = models.Artefact(
+                artefact_type_reference=artefact_type,
+                artefact_data={"ring_name": "ring", "version": {"major": major, "minor": minor}}
+            )
+            ring.save()
+            relationship = models.RelationShip.objects.create(parent=self.forge, child=ring, relationship_type="forged")
+            # creation times are set explicitly as auto_now times of quickly created rows may be equal
+            models.RelationShip.objects.filter(id=relationship.id).update(
+                creation_time=timezone.now() - datetime.timedelta(days=ring_index)
+            )
+            self.rings.append(ring)
+
+    @staticmethod
+    def _query(query_args: Dict[str, Any], **params):
+        return Client().get(
+            "/api/artefact/query/",
+            {
+                "artefact_type": "rings",
+                "q": base64.b64encode(json.dumps(query_args).encode("utf-8")),
+                "fields": "id",
+                **params
+            }
+        )
+
+    def test_order_by_numeric_json_paths(self):
+        response = self._query(
+            {"artefact_data__ring_name": "ring"},
+            order_by="-artefact_data.version.major,-artefact_data.version.minor"
+        )
+        assert response.status_code == 200
+        assert [artefact["id"] for artefact in response.json()] == [
+            self.rings[1].id, self.rings[2].id, self.rings[0].id, self.rings[3].id
+        ]
+
+    def test_latest_child(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._query(
+                {"parents__parent": self.forge.id, "parents__relationship_type": "forged"},
+                order_by="-parents.creation_time",
+                limit=1
+            )
+        assert response.status_code == 200
+        assert response.json() == [{"id": self.rings[0].id}]
+        assert len(queries) == 1
+
+    def test_missing_values_come_last(self):
+        response = self._query({}, order_by="artefact_data.version.major", limit=2)
+        assert [artefact["id"] for artefact in response.json()] == [self.rings[3].id, self.rings[0].id]
+        response = self._query({}, order_by="-artefact_data.version.major")
+        assert response.json()[-1] == {"id": self.forge.id}
+
+    def test_invalid_ordering(self):
+        assert self._query({}, order_by="artefact_type_reference").status_code == 400
+        assert self._query({}, limit="one").status_code == 400
+        assert self._query({}, order_by="id", page_size=2).status_code == 400
+
+    def test_relationship_ordering_needs_a_relationship_filter(self):
+        response = self._query({}, order_by="-parents.creation_time")
+        assert response.status_code == 400
+        assert "parents" in response.json()["order_by"]
+        assert self._query({"parents__parent": self.forge.id}, order_by="-children.id").status_code == 400
+        response = self._query({"parents__parent": self.forge.id}, order_by="-parents.creation_time")
+        assert [artefact["id"] for artefact in response.json()] == [artefact.id for artefact in self.rings]
+
+
+class TestRelationshipFilters(TestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.characters = []
+        for character_name in ["elrond", "arwen", "elladan", "elrohir"]:
+            character = models.Artefact(artefact_type_reference=artefact_type, artefact_data={"name": character_name})
+            character.save()
+            self.characters.append(character)
+        elrond, *children = self.characters
+        self.now = timezone.now()
+        self.relationships = []
+        for child_index, child in enumerate(children):
+            relationship = models.RelationShip.objects.create(parent=elrond, child=child, relationship_type="child")
+            models.RelationShip.objects.filter(id=relationship.id).update(
+                creation_time=self.now - datetime.timedelta(days=child_index)
+            )
+            self.relationships.append(relationship)
+        models.RelationShip.objects.create(parent=children[0], child=children[1], relationship_type="sibling")
+
+    def _list(self, **params):
+        response = Client().get("/api/artefact-relationship/", params)
+        assert response.status_code == 200
+        return [relationship["id"] for relationship in response.json()]
+
+    def test_filter_by_parent_and_type(self):
+        assert self._list(parent=self.characters[0].id, relationship_type="child") == [
+            relationship.id for relationship in self.relationships
+        ]
+        assert self._list(child=self.characters[2].id, relationship_type="child") == [self.relationships[1].id]
+        assert len(self._list(relationship_type="sibling")) == 1
+
+    def test_filter_by_creation_time(self):
+        assert self._list(
+            parent=self.characters[0].id, creation_time__gt=(self.now - datetime.timedelta(hours=36)).isoformat()
+        ) == [self.relationships[0].id, self.relationships[1].id]
+        assert self._list(creation_time__lte=(self.now - datetime.timedelta(days=2)).isoformat()) == [
+            self.relationships[2].id
+        ]
+
+    def test_invalid_filter(self):
+        response = Client().get("/api/artefact-relationship/", {"creation_time__gte": "yesterday"})
+        assert response.status_code == 400
+
+    def test_filters_use_the_composite_index(self):
+        queryset = models.RelationShip.objects.filter(
+            parent=self.characters[0].id, relationship_type="child", creation_time__gte=self.now
+        )
+        assert "relationship_parent_type_time" in queryset.explain()
+
+
+class TestArtefactLineage(TestCase):
+
+    def setUp(self):
+        for type_name in ["formula", "batch", "checkpoint"]:
+            models.ArtefactType.objects.create(type_name=type_name, schema={"type": "object"})
+        self.formula = self._create("formula", "formula")
+        self.batches = [self._create("batch", f"batch_{index}", self.formula, "batch_formula") for index in range(2)]
+        self.checkpoints = [
+            self._create("checkpoint", "checkpoint_0", self.batches[0], "checkpoint_dataset_batch"),
+            self._create("checkpoint", "checkpoint_1", self.batches[1], "checkpoint_dataset_batch"),
+        ]
+        self.fine_tuned = self._create("checkpoint", "fine_tuned", self.checkpoints[0], "fine_tuned_from")
+
+    @staticmethod
+    def _create(type_name, name, parent=None, relationship_type=None):
+        artefact = models.Artefact(artefact_type_reference_id=type_name, artefact_data={"name": name})
+        artefact.save()
+        if parent is not None:
+            models.RelationShip.objects.create(parent=parent, child=artefact, relationship_type=relationship_type)
+        return artefact
+
+    @staticmethod
+    def _lineage_ids(route, **params):
+        response = Client().get(route, {"fields": "id", **params})
+        assert response.status_code == 200
+        return [artefact["id"] for artefact in response.json()]
+
+    def test_descendants(self):
+        route = f"/api/artefact/{self.formula.id}/descendants/"
+        assert self._lineage_ids(route) == [
+            artefact.id for artefact in [*self.batches, *self.checkpoints, self.fine_tuned]
+        ]
+        assert self._lineage_ids(route, artefact_types="checkpoint", depth=2) == [
+            checkpoint.id for checkpoint in self.checkpoints
+        ]
+        assert self._lineage_ids(route, relationship_types="batch_formula,checkpoint_dataset_batch") == [
+            artefact.id for artefact in [*self.batches, *self.checkpoints]
+        ]
+
+    def test_ancestors(self):
+        route = f"/api/artefact/{self.fine_tuned.id}/ancestors/"
+        assert self._lineage_ids(route, artefact_types="formula,batch") == [self.formula.id, self.batches[0].id]
+        assert self._lineage_ids(route, relationship_types="fine_tuned_from") == [self.checkpoints[0].id]
+
+    def test_lineage_is_paginated_and_projected(self):
+        response = Client().get(
+            f"/api/artefact/{self.formula.id}/descendants/", {"page_size": 2, "fields": "artefact_data.name"}
+        )
+        assert response.status_code == 200
+        assert response.json()["results"] == [
+            {"artefact_data": {"name": "batch_0"}}, {"artefact_data": {"name": "batch_1"}}
+        ]
+        assert response.json()["next"] is not None
+
+    def test_lineage_is_a_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._lineage_ids(f"/api/artefact/{self.formula.id}/descendants/", artefact_types="checkpoint")
+        # the artefact lookup and the recursive lineage query
+        assert len(queries) == 2
+
+    def test_unknown_artefact(self):
+        assert Client().get("/api/artefact/4242/descendants/").status_code == 404
+
+
+class TestArtefactBulk(TestCase):
+
+    def setUp(self):
+        validation.clear_validators()
+        models.ArtefactType.objects.create(
+            type_name="lor_characters",
+            schema={
+                "type": "object", "properties": {"character_name": {"type": "string"}}, "required": ["character_name"]
+            }
+        )
+        self.bilbo = models.Artefact.objects.create(
+            artefact_type_reference_id="lor_characters", artefact_data={"character_name": "bilbo"}
+        )
+
+    @staticmethod
+    def _character_json(character_name, ref=None):
+        return {
+            "ref": ref, "artefact_type_reference": "lor_characters", "artefact_data": {"character_name": character_name}
+        }
+
+    def test_bulk_ingest(self):
+        response = Client().post(
+            "/api/artefact/bulk/",
+            {
+                "artefacts": [self._character_json(f"hobbit_{index}", ref=f"h{index}") for index in range(5)],
+                "relationships": [
+                    {"parent": self.bilbo.id, "child_ref": "h0", "relationship_type": "nephew"},
+                    {"parent_ref": "h0", "child_ref": "h4", "relationship_type": "gardener"},
+                ]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 201
+        artefact_ids = response.json()["artefacts"]
+        assert [
+            models.Artefact.objects.get(id=artefact_id).artefact_data["character_name"] for artefact_id in artefact_ids
+        ] == [f"hobbit_{index}" for index in range(5)]
+        assert [
+            (relationship.parent_id, relationship.child_id, relationship.relationship_type)
+            for relationship in models.RelationShip.objects.filter(id__in=response.json()["relationships"])
+        ] == [(self.bilbo.id, artefact_ids[0], "nephew"), (artefact_ids[0], artefact_ids[4], "gardener")]
+
+    def test_bulk_ingest_is_chunked(self):
+        artefact_jsons = [self._character_json(f"hobbit_{index}") for index in range(bulk.CHUNK_SIZE + 10)]
+        with CaptureQueriesContext(connection) as queries:
+            artefact_ids = bulk.ingest({"artefacts": artefact_jsons})["artefacts"]
+        assert len(artefact_ids) == bulk.CHUNK_SIZE + 10
+        assert models.Artefact.objects.get(id=artefact_ids[-1]).artefact_data["character_name"] == (
+            f"hobbit_{bulk.CHUNK_SIZE + 9}"
+        )
+        # the queries do not grow with the rows: types, inserts and ids of each chunk
+        assert len(queries) < 20
+
+    def test_invalid_rows_are_not_saved(self):
+        response = Client().post(
+            "/api/artefact/bulk/",
+            {
+                "artefacts": [
+                    self._character_json("frodo", ref="frodo"),
+                    {"artefact_type_reference": "lor_characters", "artefact_data": {}},
+                    {"artefact_type_reference": "elves", "artefact_data": {}},
+                ],
+                "relationships": [{"parent": 4242, "child_ref": "frodo", "relationship_type": "nephew"}]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert set(response.json()["artefacts"]) == {"1", "2"}
+        assert models.Artefact.objects.count() == 1
+
+    def test_rows_of_invalid_types_are_rejected(self):
+        response = Client().post(
+            "/api/artefact/bulk/",
+            {"artefacts": [self._character_json("frodo"), ["frodo"], 42]},
+            content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert response.json()["artefacts"] == {"1": "expected an object", "2": "expected an object"}
+        response = Client().post(
+            "/api/artefact/bulk/",
+            {
+                "artefacts": [
+                    self._character_json("frodo", ref=["frodo"]),
+                    {"artefact_type_reference": {"type": "lor_characters"}, "artefact_data": {}},
+                ]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert set(response.json()["artefacts"]) == {"0", "1"}
+        response = Client().post(
+            "/api/artefact/bulk/",
+            {
+                "artefacts": [self._character_json("frodo", ref="frodo")],
+                "relationships": [
+                    {"parent": [self.bilbo.id], "child_ref": "frodo", "relationship_type": "nephew"},
+                    {"parent": True, "child_ref": "frodo", "relationship_type": "nephew"},
+                    {"parent": self.bilbo.id, "child_ref": {"ref": "frodo"}, "relationship_type": "nephew"},
+                ]
+            },
+            content_type="application/json"
+        )
+        assert response.status_code == 400
+        assert response.json()["relationships"] == {
+            "0": "`parent` must be an artefact id",
+            "1": "`parent` must be an artefact id",
+            "2": "`child_ref` must be a string",
+        }
+        assert models.Artefact.objects.count() == 1
+
+    def test_rows_are_inserted_one_by_one_without_inserted_ids(self):
+        with mock.patch.object(connection.features, "can_return_rows_from_bulk_insert", False), \
+                mock.patch.object(connection, "vendor", "mysql"):
+            ids = bulk.ingest({
+                "artefacts": [self._character_json(f"hobbit_{index}", ref=f"h{index}") for index in range(3)],
+                "relationships": [{"parent": self.bilbo.id, "child_ref": "h2", "relationship_type": "nephew"}],
+            })
+        assert [
+            models.Artefact.objects.get(id=artefact_id).artefact_data["character_name"] for artefact_id in ids["artefacts"]
+        ] == [f"hobbit_{index}" for index in range(3)]
+        assert models.RelationShip.objects.get(id=ids["relationships"][0]).child_id == ids["artefacts"][2]
+
+    def test_ndjson_stream(self):
+        rows = [
+            self._character_json("frodo", ref="frodo"),
+            {"parent": self.bilbo.id, "child_ref": "frodo", "relationship_type": "nephew"},
+        ]
+        response = Client().post(
+            "/api/artefact/bulk/", "\n".join(json.dumps(row) for row in rows), content_type="application/x-ndjson"
+        )
+        assert response.status_code == 201
+        frodo_id, = response.json()["artefacts"]
+        assert models.RelationShip.objects.get(id=response.json()["relationships"][0]).child_id == frodo_id
+
+
+class TestArtefactQueryBatch(TestCase):
+
+    def setUp(self):
+        models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        models.ArtefactType.objects.create(type_name="rings", schema={"type": "object"})
+        self.hobbits = [
+            models.Artefact.objects.create(
+                artefact_type_reference_id="lor_characters", artefact_data={"race": "hobbit", "age": age}
+            )
+            for age in (50, 33, 111)
+        ]
+        self.ring = models.Artefact.objects.create(artefact_type_reference_id="rings", artefact_data={"name": "one"})
+
+    @staticmethod
+    def _post(queries):
+        return Client().post("/api/artefact/query/batch/", {"queries": queries}, content_type="application/json")
+
+    def test_batched_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._post({
+                "oldest_hobbit": {
+                    "artefact_type": "lor_characters",
+                    "filters": {"artefact_data__race": "hobbit"},
+                    "order_by": ["-artefact_data.age"],
+                    "limit": 1,
+                    "fields": ["id"],
+                },
+                "ring": {"artefact_type": "rings", "filters": {"artefact_data__name": "one"}, "omit": ["children"]},
+                "no_ring": {"artefact_type": "lor_characters", "filters": {"artefact_data__name": "one"}},
+            })
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert results["oldest_hobbit"] == [{"id": self.hobbits[2].id}]
+        assert [artefact["artefact_data"] for artefact in results["ring"]] == [{"name": "one"}]
+        assert "children" not in results["ring"][0]
+        assert results["no_ring"] == []
+        # one query per batched query, and the prefetch of the ring's parents
+        assert len(queries) == 4
+
+    def test_invalid_query(self):
+        response = self._post({"ring": {"artefact_type": "rings", "order_by": ["name"]}})
+        assert response.status_code == 400
+        assert "order_by" in response.json()["queries"]["ring"]
+        assert self._post({"ring": {"filters": {}}}).status_code == 400
+
+    def test_invalid_filters(self):
+        response = self._post({
+            "hobbits": {"artefact_type": "lor_characters"},
+            "ring": {"artefact_type": "rings", "filters": {"nope": 1}},
+        })
+        assert response.status_code == 400
+        assert "filters" in response.json()["queries"]["ring"]
+        response = self._post({"ring": {"artefact_type": "rings", "filters": {"id": "one"}}})
+        assert response.status_code == 400
+        assert "filters" in response.json()["queries"]["ring"]
+
+    def test_expanded_queries_return_ancestors(self):
+        models.RelationShip.objects.create(parent=self.hobbits[2], child=self.ring, relationship_type="owned_by")
+        models.RelationShip.objects.create(parent=self.hobbits[1], child=self.hobbits[2], relationship_type="heir")
+        response = self._post({
+            "ring": {"artefact_type": "rings", "fields": ["id"], "expand": "parents", "depth": 1},
+            "ring_lineage": {"artefact_type": "rings", "fields": ["id"], "expand": "parents"},
+            "hobbits": {"artefact_type": "lor_characters", "fields": ["id"]},
+        })
+        assert response.status_code == 200
+        assert response.json()["results"]["ring"] == [{"id": self.ring.id}]
+        assert sorted(ancestor["id"] for ancestor in response.json()["ancestors"]) == [
+            self.hobbits[1].id, self.hobbits[2].id
+        ]
+        assert "ancestors" not in self._post({"hobbits": {"artefact_type": "lor_characters"}}).json()
+        assert self._post({"ring": {"artefact_type": "rings", "expand": "parents", "depth": 0}}).status_code == 400
+
+
+@override_settings(RESPONSE_CACHE_SHARED=True)
+class TestResponseCache(TestCase):
+
+    def setUp(self):
+        response_cache.clear()
+        models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.frodo = models.Artefact.objects.create(
+            artefact_type_reference_id="lor_characters", artefact_data={"name": "frodo", "race": "hobbit"}
+        )
+        self.bilbo = models.Artefact.objects.create(
+            artefact_type_reference_id="lor_characters", artefact_data={"name": "bilbo", "race": "hobbit"}
+        )
+
+    def tearDown(self):
+        response_cache.clear()
+
+    @staticmethod
+    def _query(query: Dict[str, Any]):
+        return Client().get("/api/artefact/query/", {
+            "artefact_type": "lor_characters",
+            "q": base64.b64encode(json.dumps(query).encode("utf-8")).decode("utf-8"),
+        })
+
+    def test_artefact_detail(self):
+        assert Client().get(f"/api/artefact/{self.frodo.id}/")["X-Response-Cache"] == "miss"
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(f"/api/artefact/{self.frodo.id}/")
+        assert response["X-Response-Cache"] == "hit"
+        assert response.json()["artefact_data"] == {"name": "frodo", "race": "hobbit"}
+        assert len(queries) == 0
+        models.RelationShip.objects.create(parent=self.bilbo, child=self.frodo, relationship_type="heir")
+        response = Client().get(f"/api/artefact/{self.frodo.id}/")
+        assert response["X-Response-Cache"] == "miss"
+        assert len(response.json()["parents"]) == 1
+        # errors are not cached
+        assert Client().get("/api/artefact/0/").status_code == 404
+        assert Client().get("/api/artefact/0/").status_code == 404
+
+    def test_non_canonical_artefact_url(self):
+        url = f"/api/artefact/0{self.frodo.id}/"
+        assert Client().get(url)["X-Response-Cache"] == "miss"
+        assert Client().get(url)["X-Response-Cache"] == "hit"
+        models.RelationShip.objects.create(parent=self.bilbo, child=self.frodo, relationship_type="heir")
+        response = Client().get(url)
+        assert response["X-Response-Cache"] == "miss"
+        assert len(response.json()["parents"]) == 1
+        assert Client().get("/api/artefact/frodo/").status_code == 404
+
+    def test_process_local_cache_is_bypassed(self):
+        with override_settings(RESPONSE_CACHE_SHARED=False):
+            response = Client().get(f"/api/artefact/{self.frodo.id}/")
+            assert response["X-Response-Cache"] == "bypass"
+            assert Client().get(f"/api/artefact/{self.frodo.id}/")["X-Response-Cache"] == "bypass"
+            # responses are still tagged and revalidated
+            etag = response["ETag"]
+            assert Client().get(f"/api/artefact/{self.frodo.id}/", HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    def test_expanded_lineage(self):
+        url = f"/api/artefact/{self.frodo.id}/?expand=parents&depth=2"
+        assert Client().get(url)["X-Response-Cache"] == "miss"
+        assert Client().get(url)["X-Response-Cache"] == "hit"
+        # the ancestors of the parents are reachable through any relationship
+        sam = models.Artefact.objects.create(artefact_type_reference_id="lor_characters", artefact_data={"name": "sam"})
+        models.RelationShip.objects.create(parent=sam, child=self.bilbo, relationship_type="friend")
+        assert Client().get(url)["X-Response-Cache"] == "miss"
+
+    def test_artefact_type(self):
+        assert Client().get("/api/artefact-type/lor_characters/")["X-Response-Cache"] == "miss"
+        assert Client().get("/api/artefact-type/lor_characters/")["X-Response-Cache"] == "hit"
+        Client().post(
+            "/api/artefact-type/ensure/",
+            [{"type_name": "lor_characters", "schema": {"type": "object"}, "indexed_paths": ["name"]}],
+            content_type="application/json"
+        )
+        response = Client().get("/api/artefact-type/lor_characters/")
+        assert response["X-Response-Cache"] == "miss"
+        assert response.json()["indexed_paths"] == ["name"]
+
+    def test_normalized_query(self):
+        assert self._query({"artefact_data__race": "hobbit", "artefact_data__name": "frodo"})[
+            "X-Response-Cache"] == "miss"
+        response = self._query({"artefact_data__name": "frodo", "artefact_data__race": "hobbit"})
+        assert response["X-Response-Cache"] == "hit"
+        assert [artefact["id"] for artefact in response.json()] == [self.frodo.id]
+        # new artefacts of the type invalidate its queries
+        bulk.ingest({"artefacts": [
+            {"artefact_type_reference": "lor_characters", "artefact_data": {"name": "frodo", "race": "hobbit"}}
+        ]})
+        response = self._query({"artefact_data__name": "frodo", "artefact_data__race": "hobbit"})
+        assert response["X-Response-Cache"] == "miss"
+        assert len(response.json()) == 2
+
+    def test_relationship_listing(self):
+        url = f"/api/artefact-relationship/?parent={self.bilbo.id}"
+        assert Client().get(url).json() == []
+        assert Client().get(url)["X-Response-Cache"] == "hit"
+        models.RelationShip.objects.create(parent=self.bilbo, child=self.frodo, relationship_type="heir")
+        assert len(Client().get(url).json()) == 1
+
+    def test_stats(self):
+        for _ in range(3):
+            Client().get(f"/api/artefact/{self.frodo.id}/")
+        etag = Client().get(f"/api/artefact/{self.frodo.id}/")["ETag"]
+        Client().get(f"/api/artefact/{self.frodo.id}/", HTTP_IF_NONE_MATCH=etag)
+        stats = Client().get("/api/response-cache/stats/").json()
+        assert stats["artefact"] == {"hits": 4, "misses": 1, "hit_rate": 4 / 5, "not_modified": 1}
+
+
+@override_settings(RESPONSE_CACHE_SHARED=True)
+class TestConditionalRequests(TestCase):
+
+    def setUp(self):
+        response_cache.clear()
+        models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.frodo = models.Artefact.objects.create(
+            artefact_type_reference_id="lor_characters", artefact_data={"name": "frodo"}
+        )
+        self.bilbo = models.Artefact.objects.create(
+            artefact_type_reference_id="lor_characters", artefact_data={"name": "bilbo"}
+        )
+
+    def tearDown(self):
+        response_cache.clear()
+
+    def test_artefact_revalidation(self):
+        url = f"/api/artefact/{self.frodo.id}/"
+        etag = Client().get(url)["ETag"]
+        assert etag.startswith('"') and etag.endswith('-json"')
+        with CaptureQueriesContext(connection) as queries:
+            response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response["ETag"] == etag
+        assert len(queries) == 0
+        # compressed responses have weak tags, they still validate
+        assert Client().get(url, HTTP_IF_NONE_MATCH=f"W/{etag}").status_code == 304
+        assert Client().get(url, HTTP_IF_NONE_MATCH='"other"').status_code == 200
+        # the tag is the same once the cached response expired, and changes with the response
+        response_cache.clear()
+        assert Client().get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        models.RelationShip.objects.create(parent=self.bilbo, child=self.frodo, relationship_type="heir")
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_wire_formats_have_distinct_tags(self):
+        url = f"/api/artefact/{self.frodo.id}/"
+        json_etag = Client().get(url)["ETag"]
+        msgpack_response = Client().get(url, HTTP_ACCEPT="application/msgpack")
+        assert msgpack_response["ETag"] != json_etag
+        assert Client().get(url, HTTP_ACCEPT="application/msgpack", HTTP_IF_NONE_MATCH=json_etag).status_code == 200
+
+    def test_artefact_type_and_relationship_listing(self):
+        for url in ("/api/artefact-type/lor_characters/", f"/api/artefact-relationship/?parent={self.bilbo.id}"):
+            etag = Client().get(url)["ETag"]
+            assert Client().get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        models.RelationShip.objects.create(parent=self.bilbo, child=self.frodo, relationship_type="heir")
+        assert Client().get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+class TestChangeFeed(TestCase):
+
+    def setUp(self):
+        models.ArtefactType.objects.create(type_name="use_cases", schema={"type": "object"})
+        models.ArtefactType.objects.create(type_name="checkpoints", schema={"type": "object"})
+        self.use_case = models.Artefact.objects.create(artefact_type_reference_id="use_cases", artefact_data={})
+
+    def _save_checkpoint(self, parent=None):
+        checkpoint = models.Artefact.objects.create(artefact_type_reference_id="checkpoints", artefact_data={})
+        models.RelationShip.objects.create(
+            parent=parent or self.use_case, child=checkpoint, relationship_type="checkpoint_use_case"
+        )
+        return checkpoint
+
+    @staticmethod
+    def _get_changes(**params):
+        return Client().get("/api/changes/", params).json()
+
+    def test_inserts_are_sequenced(self):
+        start = models.Change.objects.get(artefact=self.use_case).id
+        checkpoint = self._save_checkpoint()
+        feed = self._get_changes(after=start)
+        assert [(change["sequence"], change["kind"]) for change in feed["changes"]] == [
+            (start + 1, "artefact"), (start + 2, "relationship")
+        ]
+        assert feed["changes"][1] == {
+            "sequence": start + 2,
+            "kind": "relationship",
+            "artefact": checkpoint.id,
+            "artefact_type": "checkpoints",
+            "relationship": models.RelationShip.objects.get(child=checkpoint).id,
+            "relationship_type": "checkpoint_use_case",
+            "parent": self.use_case.id,
+        }
+        assert feed["last_sequence"] == start + 2
+        assert self._get_changes(after=start + 2) == {"changes": [], "last_sequence": start + 2}
+
+    def test_filters(self):
+        start = models.Change.objects.get(artefact=self.use_case).id
+        other_use_case = models.Artefact.objects.create(artefact_type_reference_id="use_cases", artefact_data={})
+        checkpoint = self._save_checkpoint()
+        self._save_checkpoint(parent=other_use_case)
+        feed = self._get_changes(
+            after=start, kind="relationship", relationship_type="checkpoint_use_case", parent=self.use_case.id
+        )
+        assert [change["artefact"] for change in feed["changes"]] == [checkpoint.id]
+        feed = self._get_changes(after=start, kind="artefact", artefact_type="use_cases", limit=1)
+        assert [change["artefact"] for change in feed["changes"]] == [other_use_case.id]
+        assert feed["last_sequence"] == feed["changes"][0]["sequence"]
+        assert Client().get("/api/changes/", {"kind": "type"}).status_code == 400
+        assert Client().get("/api/changes/", {"timeout": 3600}).status_code == 400
+
+    def test_feed_starts_at_its_end(self):
+        feed = self._get_changes(timeout=0.1)
+        assert feed["changes"] == []
+        self._save_checkpoint()
+        assert len(self._get_changes(after=feed["last_sequence"])["changes"]) == 2
+
+    def test_synchronous_wait_is_capped(self):
+        with mock.patch.object(changes, "SYNC_WAIT_TIMEOUT", 0.2):
+            start_time = time.monotonic()
+            feed = self._get_changes(timeout=30)
+        assert feed["changes"] == []
+        assert time.monotonic() - start_time < 5
+
+    def test_bulk_inserts_are_recorded(self):
+        start = models.Change.objects.get(artefact=self.use_case).id
+        bulk_ids = bulk.ingest({
+            "artefacts": [{"ref": "c", "artefact_type_reference": "checkpoints", "artefact_data": {}}],
+            "relationships": [
+                {"parent": self.use_case.id, "child_ref": "c", "relationship_type": "checkpoint_use_case"}
+            ]
+        })
+        feed = self._get_changes(after=start, relationship_type="checkpoint_use_case")
+        assert [
+            (change["artefact"], change["artefact_type"], change["relationship"]) for change in feed["changes"]
+        ] == [(bulk_ids["artefacts"][0], "checkpoints", bulk_ids["relationships"][0])]
+
+    def test_event_stream(self):
+        start = models.Change.objects.get(artefact=self.use_case).id
+        checkpoint = self._save_checkpoint()
+        response = Client().get(
+            "/api/changes/", {"kind": "artefact"}, HTTP_ACCEPT="text/event-stream", HTTP_LAST_EVENT_ID=str(start)
+        )
+        assert response["Content-Type"].startswith("text/event-stream")
+        events = response.content.decode("utf-8").split("\n\n")
+        assert events[0] == "retry: 100"
+        event_id, event_type, event_data = events[1].split("\n")
+        assert event_id == f"id: {start + 1}" and event_type == "event: change"
+        assert json.loads(event_data[len("data: "):])["artefact"] == checkpoint.id
+        # the stream ends with the sequence to resume from
+        assert events[2] == f"id: {start + 1}"
+
+
+class TestAsyncReadViews(TransactionTestCase):
+
+    def setUp(self):
+        artefact_type = models.ArtefactType.objects.create(type_name="lor_characters", schema={"type": "object"})
+        self.artefact = models.Artefact(artefact_type_reference=artefact_type, artefact_data={"character_name": "sam"})
+        self.artefact.save()
+
+    def test_async_query_view(self):
+        view = async_views.async_view(views.ArtefactQueryView.as_view())
+        query = base64.b64encode(json.dumps({"artefact_data__character_name": "sam"}).encode("utf-8"))
+        request = RequestFactory().get(
+            "/api/artefact/query/", {"artefact_type": "lor_characters", "q": query.decode("utf-8"), "fields": "id"}
+        )
+        response = async_to_sync(view)(request)
+        assert response.status_code == 200
+        assert json.loads(response.content) == [{"id": self.artefact.id}]
+
+    def test_read_routes_are_served_async(self):
+        async_patterns = async_views.serve_async(urls.urlpatterns, urls.ASYNC_READ_ROUTES)
+        async_patterns = async_views.serve_async(async_patterns, urls.ASYNC_POST_READ_ROUTES)
+        async_names = {
+            url_pattern.name for url_pattern in async_patterns
+            if asyncio.iscoroutinefunction(getattr(url_pattern, "callback", None))
+        }
+        assert async_names == set(urls.ASYNC_READ_ROUTES) | set(urls.ASYNC_POST_READ_ROUTES)
+
+    def test_writes_are_not_served_in_the_thread_pool(self):
+        request_threads = {}
+
+        def view(request):
+            request_threads[request.method] = threading.current_thread()
+            return HttpResponse()
+
+        async_view = async_views.async_view(view)
+        async_to_sync(async_view)(RequestFactory().get("/api/artefact-relationship/"))
+        async_to_sync(async_view)(RequestFactory().post("/api/artefact-relationship/"))
+        # writes run on the thread of synchronous views, here the thread running the event loop's caller
+        assert request_threads["POST"] is threading.current_thread()
+        assert request_threads["GET"] is not threading.current_thread()
+
+    def test_async_long_poll(self):
+        view = async_views.long_poll_view(views.ChangeFeedView.as_view())
+        request = RequestFactory().get("/api/changes/", {"artefact_type": "lor_characters", "timeout": 10})
+
+        def save_artefact():
+            artefact = models.Artefact(artefact_type_reference_id="lor_characters", artefact_data={"name": "frodo"})
+            artefact.save()
+            return artefact
+
+        async def poll_and_save():
+            poll = asyncio.ensure_future(view(request))
+            await asyncio.sleep(0.5)
+            artefact = await async_views.in_thread_pool(save_artefact)()
+            return artefact, await asyncio.wait_for(poll, timeout=5)
+
+        artefact, response = async_to_sync(poll_and_save)()
+        assert response.status_code == 200
+        assert [change["artefact"] for change in json.loads(response.content)["changes"]] == [artefact.id]
+
+    def test_server_timing_in_async_requests(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        timing_middleware = middleware.ServerTimingMiddleware(get_response)
+        assert asyncio.iscoroutinefunction(timing_middleware)
+        response = async_to_sync(timing_middleware)(RequestFactory().get("/"))
+        assert response["Server-Timing"].startswith("total;dur=")
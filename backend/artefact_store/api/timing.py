@@ -0,0 +1,38 @@
+"""
+durations of the steps of a request (schema validation for instance), they are reported to clients in the
+`Server-Timing` header by `middleware.ServerTimingMiddleware`.
+"""
+import contextlib
+import contextvars
+import time
+from typing import Dict, Iterator, Optional
+
+# total duration (in seconds) of each timed step of the current request, `None` outside of requests
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+@contextlib.contextmanager
+def timed(metric: str) -> Iterator[None]:
+    """adds the duration of the block to `metric` in the current request's timings"""
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[metric] = timings.get(metric, 0.0) + time.perf_counter() - start_time
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[Dict[str, float]]:
+    """collects the timings of the block (a request)"""
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
@@ -1,13 +1,39 @@
+import functools
+
+from django.conf import settings
 from django.urls import path
 from rest_framework import routers
 
-from . import views
+from . import views, async_views
+
+# read endpoints served by async views when `ASYNC_READ_VIEWS` is set (under asgi), see `async_views`. Only their GET
+# requests are moved to the thread pool, writes to the same routes (artefact and relationship saves) are not
+ASYNC_READ_ROUTES = (
+    "artefact-query", "artefact-detail", "artefact-ancestors", "artefact-descendants", "relationship-list",
+    "relationship-detail",
+)
+# read endpoints posting their parameters (lists of ids or of queries), their POST requests are reads
+ASYNC_POST_READ_ROUTES = ("artefact-query-batch", "artefact-many")
+# long-polled endpoints, their async views wait without holding a thread when `ASYNC_LONG_POLL` is set (under asgi)
+LONG_POLL_ROUTES = ("change-feed",)
 
 router = routers.DefaultRouter()
 router.register("artefact-type", views.ArtefactTypeViewset)
 router.register("artefact", views.ArtefactViewset)
 router.register("artefact-relationship", views.RelationshipViewset)
 urlpatterns = [
-    path(r"artefact/query/", views.ArtefactQueryView.as_view())
+    path(r"artefact/query/", views.ArtefactQueryView.as_view(), name="artefact-query"),
+    path(r"artefact/query/batch/", views.ArtefactQueryBatchView.as_view(), name="artefact-query-batch"),
+    path(r"artefact/graph/", views.ArtefactGraphView.as_view()),
+    path(r"artefact/bulk/", views.ArtefactBulkView.as_view(), name="artefact-bulk"),
+    path(r"changes/", views.ChangeFeedView.as_view(), name="change-feed"),
+    path(r"response-cache/stats/", views.ResponseCacheStatsView.as_view(), name="response-cache-stats"),
 ]
 urlpatterns += router.urls
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_views.serve_async(urlpatterns, ASYNC_READ_ROUTES)
+    urlpatterns = async_views.serve_async(
+        urlpatterns, ASYNC_POST_READ_ROUTES, functools.partial(async_views.async_view, read_methods=("POST",))
+    )
+if settings.ASYNC_LONG_POLL:
+    urlpatterns = async_views.serve_async(urlpatterns, LONG_POLL_ROUTES, async_views.long_poll_view)
@@ -0,0 +1,48 @@
+"""
+validation of artefact data against the schema of its artefact type. Building a validator checks the schema against
+its meta schema, which costs more than validating most artefacts, so the validator of each type is built once and
+kept in memory until the type's schema changes.
+"""
+import copy
+import threading
+from typing import Any, Dict, Tuple, Optional
+
+from jsonschema import exceptions, validators
+
+from . import timing
+
+# validator of each artefact type along with the schema it was built from
+_validators: Dict[str, Tuple[dict, Any]] = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(artefact_type):
+    cached_validator = _validators.get(artefact_type.type_name)
+    if cached_validator is not None and cached_validator[0] == artefact_type.schema:
+        return cached_validator[1]
+    with timing.timed("validator_build"):
+        validator_class = validators.validator_for(artefact_type.schema)
+        validator_class.check_schema(artefact_type.schema)
+        validator = validator_class(artefact_type.schema)
+    with _validators_lock:
+        _validators[artefact_type.type_name] = (copy.deepcopy(artefact_type.schema), validator)
+    return validator
+
+
+def validate_artefact_data(artefact_data, artefact_type):
+    """raises the `jsonschema.ValidationError` that best describes why the data does not match the type's schema"""
+    validator = get_validator(artefact_type)
+    with timing.timed("validation"):
+        error = get_validation_error(validator, artefact_data)
+    if error is not None:
+        raise error
+
+
+def get_validation_error(validator, artefact_data) -> Optional[exceptions.ValidationError]:
+    """the error that best describes why the data is not valid, `None` when it is"""
+    return exceptions.best_match(validator.iter_errors(artefact_data))
+
+
+def clear_validators():
+    with _validators_lock:
+        _validators.clear()
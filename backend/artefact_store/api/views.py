@@ -1,31 +1,405 @@
 import json
 import base64
+from typing import Optional, List
 
-from rest_framework import viewsets, request, views, response
+from django.core.exceptions import FieldError, ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework import viewsets, request, views, response, status, decorators, exceptions, generics
+from rest_framework.settings import api_settings
 
-from . import serializers, models
+from . import (
+    serializers, models, pagination, projections, indexes, ordering, bulk, parsers, response_cache, changes, renderers
+)
+
+# maximum number of relationships followed when expanding an artefact's lineage
+MAX_LINEAGE_DEPTH = 32
+# actions returning artefacts, they accept projections
+ARTEFACT_READ_ACTIONS = ("list", "retrieve", "many", "ancestors", "descendants")
 
 
 class ArtefactTypeViewset(viewsets.ModelViewSet):
     serializer_class = serializers.ArtefactTypeSerializer
     queryset = models.ArtefactType.objects.all()
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            artefact_type = serializer.save()
+            # the indexes are created outside of the transaction, once the type is saved
+            transaction.on_commit(lambda: indexes.ensure_artefact_type_indexes([artefact_type]))
+
+    def perform_update(self, serializer):
+        self.perform_create(serializer)
+
+    def retrieve(self, request: request.Request, *args, **kwargs):
+        return response_cache.cached_response(
+            request,
+            "artefact_type",
+            [("artefact_type", _get_lookup_pk(self))],
+            lambda: self.get_serializer(self.get_object()).data
+        )
+
+    @decorators.action(detail=False, methods=["post"])
+    def ensure(self, request: request.Request):
+        """
+        creates the posted artefact types that do not exist yet and returns all of them (existing ones as stored) in
+        the order they were posted. The indexed paths of existing types are extended with the posted ones.
+        """
+        serializer = serializers.EnsureArtefactTypeSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        type_names = [artefact_type["type_name"] for artefact_type in serializer.validated_data]
+        with transaction.atomic():
+            existing_types = models.ArtefactType.objects.in_bulk(type_names)
+            models.ArtefactType.objects.bulk_create([
+                models.ArtefactType(**artefact_type)
+                for artefact_type in serializer.validated_data
+                if artefact_type["type_name"] not in existing_types
+            ], ignore_conflicts=True)
+            artefact_types = models.ArtefactType.objects.in_bulk(type_names)
+            self._extend_indexed_paths(artefact_types, serializer.validated_data)
+            transaction.on_commit(lambda: indexes.ensure_artefact_type_indexes(artefact_types.values()))
+            # types are bulk created and updated, without the signals invalidating the cached responses
+            response_cache.invalidate_artefact_types(type_names)
+        return response.Response(
+            self.get_serializer([artefact_types[type_name] for type_name in type_names], many=True).data
+        )
+
+    @staticmethod
+    def _extend_indexed_paths(artefact_types, artefact_type_jsons):
+        updated_types = []
+        for artefact_type_json in artefact_type_jsons:
+            artefact_type = artefact_types[artefact_type_json["type_name"]]
+            new_paths = [
+                data_path for data_path in artefact_type_json.get("indexed_paths", [])
+                if data_path not in artefact_type.indexed_paths
+            ]
+            if new_paths:
+                artefact_type.indexed_paths = [*artefact_type.indexed_paths, *new_paths]
+                updated_types.append(artefact_type)
+        models.ArtefactType.objects.bulk_update(updated_types, ["indexed_paths"])
+
 
 class ArtefactViewset(viewsets.ModelViewSet):
     serializer_class = serializers.ArtefactSerializer
     queryset = models.Artefact.objects.all()
+    pagination_class = pagination.KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ARTEFACT_READ_ACTIONS:
+            queryset = self.projection.apply(queryset)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ARTEFACT_READ_ACTIONS:
+            kwargs.update(self.projection.serializer_kwargs())
+        return super().get_serializer(*args, **kwargs)
+
+    @property
+    def projection(self) -> projections.ArtefactProjection:
+        if not hasattr(self, "_projection"):
+            self._projection = projections.ArtefactProjection.from_request(self.request)
+        return self._projection
+
+    def retrieve(self, request: request.Request, *args, **kwargs):
+        """
+        returns an artefact, with `?expand=parents&depth=N` its ancestors (up to N relationships away) are
+        returned as well under `ancestors` so that the whole lineage is loaded in one request. Responses are cached
+        until relationships are added to the artefact (or to any artefact when its ancestors are expanded).
+        """
+        expand = _get_expand(request)
+        dependencies = [("artefact", _get_lookup_pk(self))]
+        if expand:
+            dependencies.append(response_cache.RELATIONSHIPS)
+
+        def build_artefact_json():
+            artefact = self.get_object()
+            artefact_json = self.get_serializer(artefact).data
+            if expand:
+                artefact_json["ancestors"] = self._get_ancestors_json([artefact.id])
+            return artefact_json
+
+        return response_cache.cached_response(request, "artefact", dependencies, build_artefact_json)
+
+    @decorators.action(detail=False, methods=["post"])
+    def many(self, request: request.Request):
+        """
+        returns the posted artefact ids (`{"ids": [...]}`) in one query, `results` follows the order of the ids and
+        `missing` lists the ids that do not exist. Projections and `?expand=parents&depth=N` work as for a single
+        artefact, the ancestors of all the artefacts are returned together under `ancestors`.
+        """
+        serializer = serializers.ArtefactIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        artefact_ids = serializer.validated_data["ids"]
+        artefacts = self.get_queryset().in_bulk(artefact_ids)
+        found_ids = [artefact_id for artefact_id in artefact_ids if artefact_id in artefacts]
+        many_json = {
+            "results": self.get_serializer([artefacts[artefact_id] for artefact_id in found_ids], many=True).data,
+            "missing": [artefact_id for artefact_id in artefact_ids if artefact_id not in artefacts]
+        }
+        if _get_expand(request):
+            many_json["ancestors"] = self._get_ancestors_json(list(artefacts))
+        return response.Response(many_json)
+
+    @decorators.action(detail=True, methods=["get"])
+    def ancestors(self, request: request.Request, pk=None):
+        """
+        artefacts the artefact derives from, computed by the database in one recursive query. The lineage can be
+        restricted to the relationships of some types (`relationship_types`, comma separated) and to `depth`
+        relationships away, `artefact_types` only keeps the artefacts of some types (the traversal still goes through
+        the other ones). Results are paginated with `page_size` and accept projections.
+
+        >>> GET /api/artefact/12/ancestors/?relationship_types=batch_formula&artefact_types=dataset_formula&depth=2
+        """
+        return self._lineage_response(models.Artefact.objects.ancestors)
+
+    @decorators.action(detail=True, methods=["get"])
+    def descendants(self, request: request.Request, pk=None):
+        """
+        artefacts derived from the artefact (the checkpoints trained on the batches of a formula for instance), with
+        the same filters as `ancestors`.
+
+        >>> GET /api/artefact/12/descendants/?artefact_types=model_checkpoint&depth=2
+        """
+        return self._lineage_response(models.Artefact.objects.descendants)
+
+    def _lineage_response(self, get_lineage):
+        artefact = generics.get_object_or_404(models.Artefact.objects.only("id"), pk=self.kwargs["pk"])
+        relationship_types = _get_list_param(self.request, "relationship_types")
+        artefact_types = _get_list_param(self.request, "artefact_types")
+        lineage = get_lineage([artefact.id], max_depth=_get_depth(self.request), relationship_types=relationship_types)
+        if artefact_types is not None:
+            lineage = lineage.filter(artefact_type_reference__in=artefact_types)
+        lineage = self.projection.apply(lineage.order_by("id"))
+        page = self.paginate_queryset(lineage)
+        if page is None:
+            return response.Response(self.get_serializer(lineage, many=True).data)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def _get_ancestors_json(self, artefact_ids):
+        ancestors = self.projection.apply(
+            models.Artefact.objects.ancestors(artefact_ids, max_depth=_get_depth(self.request))
+        )
+        return self.get_serializer(ancestors, many=True).data
+
+
+def _get_lookup_pk(view: viewsets.GenericViewSet) -> str:
+    """
+    canonical primary key of the url of a detail view, the one cached responses are invalidated with: `/artefact/012/`
+    depends on the artefact 12
+    """
+    try:
+        return str(view.get_queryset().model._meta.pk.to_python(view.kwargs[view.lookup_field]))
+    except DjangoValidationError:
+        raise exceptions.NotFound()
+
+
+def _get_expand(request: request.Request) -> bool:
+    expand = request.query_params.get("expand")
+    if expand is None:
+        return False
+    if expand != "parents":
+        raise exceptions.ValidationError({"expand": f"cannot expand {expand}, only `parents` is supported"})
+    return True
+
+
+def _get_list_param(request: request.Request, name: str) -> Optional[List[str]]:
+    """comma separated query parameter, `None` when missing or empty"""
+    items = [item for item in request.query_params.get(name, "").split(",") if item]
+    return items or None
+
+
+def _get_depth(request: request.Request) -> int:
+    try:
+        depth = int(request.query_params.get("depth", MAX_LINEAGE_DEPTH))
+    except ValueError:
+        raise exceptions.ValidationError({"depth": "depth must be an integer"})
+    if depth < 1:
+        # the lineage always starts with the direct relationships, it cannot be less than 1 relationship deep
+        raise exceptions.ValidationError({"depth": "depth must be at least 1"})
+    return min(depth, MAX_LINEAGE_DEPTH)
 
 
 class ArtefactQueryView(views.APIView):
+    """
+    artefacts of the type `artefact_type` matching the filters of `q` (base64 encoded json of django style filters).
+    Queries are scoped to a type so that they only touch the rows of that type, through the `(artefact_type_reference,
+    <path>)` indexes of its indexed paths (see `indexes`). Results are paginated on ids with `page_size`, or ordered and
+    limited with `order_by` and `limit` (see `ordering.ArtefactOrdering`) to select the latest artefacts in a single
+    query.
+
+    >>> GET /api/artefact/query/?artefact_type=dataset_formula&q=eyJmb3JtdWxhX25hbWUiOiAiZm9vIn0=
+    """
+    pagination_class = pagination.KeysetPagination
 
     def get(self, request: request.Request):
+        artefact_type = request.query_params.get("artefact_type")
+        if not artefact_type:
+            raise exceptions.ValidationError({"artefact_type": "queries must be scoped to an artefact type"})
+        # results change with the artefacts of the type and with the relationships they are filtered on or include
+        return response_cache.cached_response(
+            request,
+            "artefact_query",
+            [("type_artefacts", artefact_type), response_cache.RELATIONSHIPS],
+            lambda: self._get_query_data(request, artefact_type)
+        )
+
+    def _get_query_data(self, request: request.Request, artefact_type: str):
         query_parameters = json.loads(base64.b64decode(request.query_params["q"]))
-        objects = models.Artefact.objects.filter(**{key: value for key, value in query_parameters.items()})
-        artefacts = objects.all()
-        serializer = serializers.ArtefactSerializer(artefacts, many=True)
-        return response.Response(serializer.data)
+        projection = projections.ArtefactProjection.from_request(request)
+        artefact_ordering = ordering.ArtefactOrdering.from_request(request, filters=query_parameters)
+        artefacts = projection.apply(_filter_artefacts(artefact_type, query_parameters))
+        if not artefact_ordering.is_default:
+            if "page_size" in request.query_params:
+                raise exceptions.ValidationError({"page_size": "ordered or limited queries cannot be paginated"})
+            artefacts = artefact_ordering.apply(artefacts)
+            return serializers.ArtefactSerializer(artefacts, many=True, **projection.serializer_kwargs()).data
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(artefacts, request, view=self)
+        if page is None:
+            return serializers.ArtefactSerializer(artefacts, many=True, **projection.serializer_kwargs()).data
+        serializer = serializers.ArtefactSerializer(page, many=True, **projection.serializer_kwargs())
+        return paginator.get_paginated_response(serializer.data).data
+
+
+class ArtefactQueryBatchView(views.APIView):
+    """
+    runs several named queries in one request, so that the independent lookups of a pipeline's start-up (formulas by
+    name and version, use cases, latest batches) cost a single round trip. Each query takes the parameters of the
+    query endpoint and returns at most `limit` artefacts (`ordering.MAX_LIMIT` by default). The ancestors of the
+    artefacts of queries expanding their parents (`"expand": "parents", "depth": N`) are returned together under
+    `ancestors`, so that the artefacts can be built without further requests.
+
+    >>> POST /api/artefact/query/batch/
+    ... {"queries": {"formula": {"artefact_type": "dataset_formula", "filters": {"artefact_data__formula_name": "foo"},
+    ...                          "order_by": ["-artefact_data.version.major"], "limit": 1, "fields": ["id"]}}}
+    {"results": {"formula": [{"id": 12}]}}
+    """
+
+    def post(self, request: request.Request):
+        serializer = serializers.ArtefactQueryBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = {}
+        ancestors = {}
+        for query_name, query in serializer.validated_data["queries"].items():
+            try:
+                projection = projections.ArtefactProjection(fields=query.get("fields"), omit=query["omit"])
+                artefact_ordering = ordering.ArtefactOrdering(
+                    order_by=query["order_by"],
+                    limit=query.get("limit", ordering.MAX_LIMIT),
+                    filters=query["filters"],
+                )
+                artefacts = list(artefact_ordering.apply(
+                    projection.apply(_filter_artefacts(query["artefact_type"], query["filters"]))
+                ))
+            except exceptions.ValidationError as error:
+                raise exceptions.ValidationError({"queries": {query_name: error.detail}})
+            except (FieldError, ValueError) as error:
+                # unknown fields or lookups and values of the wrong type in the filters
+                raise exceptions.ValidationError({"queries": {query_name: {"filters": str(error)}}})
+            results[query_name] = serializers.ArtefactSerializer(
+                artefacts, many=True, **projection.serializer_kwargs()
+            ).data
+            if "expand" in query:
+                query_ancestors = list(projection.apply(models.Artefact.objects.ancestors(
+                    [artefact.id for artefact in artefacts],
+                    max_depth=min(query.get("depth", MAX_LINEAGE_DEPTH), MAX_LINEAGE_DEPTH)
+                )))
+                ancestors.update(zip(
+                    [ancestor.id for ancestor in query_ancestors],
+                    serializers.ArtefactSerializer(query_ancestors, many=True, **projection.serializer_kwargs()).data
+                ))
+        batch_json = {"results": results}
+        if ancestors:
+            batch_json["ancestors"] = list(ancestors.values())
+        return response.Response(batch_json)
+
+
+def _filter_artefacts(artefact_type: str, query_parameters: dict):
+    """artefacts of the type matching the django style filters of a query"""
+    return models.Artefact.objects.filter(artefact_type_reference=artefact_type).filter(
+        **{key: value for key, value in query_parameters.items()}
+    )
+
+
+class ArtefactGraphView(views.APIView):
+    """saves artefacts together with their relationships in a single transaction."""
+
+    def post(self, request: request.Request):
+        serializer = serializers.ArtefactGraphSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return response.Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ArtefactBulkView(views.APIView):
+    """
+    saves many artefacts and relationships at once (backfills), posted as a json object of `artefacts` and
+    `relationships` lists or streamed as newline delimited json. The rows are validated as a set and inserted in
+    chunked transactions (see `bulk`), the response lists the assigned ids in the order of the rows.
+
+    >>> POST /api/artefact/bulk/
+    ... {"artefacts": [{"ref": "b0", "artefact_type_reference": "dataset_batch", "artefact_data": {...}}],
+    ...  "relationships": [{"parent": 12, "child_ref": "b0", "relationship_type": "batch_formula"}]}
+    {"artefacts": [13], "relationships": [7]}
+    """
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, parsers.BulkNDJSONParser]
+
+    def post(self, request: request.Request):
+        if not isinstance(request.data, dict):
+            raise exceptions.ValidationError("expected an object of `artefacts` and `relationships`")
+        return response.Response(bulk.ingest(request.data), status=status.HTTP_201_CREATED)
 
 
 class RelationshipViewset(viewsets.ModelViewSet):
+    """
+    relationships, the listing can be filtered by `parent`, `child`, `relationship_type` and `creation_time` ranges
+    (`creation_time__gte`, `creation_time__lt`...) so that the relationships of a given type of an artefact are
+    selected by the store rather than by the client.
+
+    >>> GET /api/artefact-relationship/?parent=12&relationship_type=checkpoint_use_case&creation_time__gte=2026-10-01
+    """
     serializer_class = serializers.RelationShipSerializer
-    queryset = models.RelationShip.objects.all()
\ No newline at end of file
+    queryset = models.RelationShip.objects.order_by("id")
+    pagination_class = pagination.KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            filters_serializer = serializers.RelationshipFiltersSerializer(data=self.request.query_params)
+            filters_serializer.is_valid(raise_exception=True)
+            queryset = queryset.filter(**filters_serializer.validated_data)
+        return queryset
+
+    def list(self, request: request.Request, *args, **kwargs):
+        def build_relationships_json():
+            return super(RelationshipViewset, self).list(request, *args, **kwargs).data
+
+        # listings change with any relationship added, whatever its ends
+        return response_cache.cached_response(
+            request, "relationship_list", [response_cache.RELATIONSHIPS], build_relationships_json
+        )
+
+
+class ChangeFeedView(views.APIView):
+    """
+    changes (inserts of artefacts and relationships) after the sequence number `after`, waiting up to `timeout`
+    seconds for one, see `changes`. The async view waits on the event loop and passes the feed it waited for, this
+    view waits at most `changes.SYNC_WAIT_TIMEOUT` seconds as it holds a worker thread meanwhile.
+
+    >>> GET /api/changes/?after=120&relationship_type=batch_formula&parent=7&timeout=30
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, renderers.EventStreamRenderer]
+
+    def get(self, request: request.Request, feed: Optional[changes.ChangeFeed] = None):
+        if feed is None:
+            feed = changes.ChangeFeed.from_request(request)
+            feed.timeout = min(feed.timeout, changes.SYNC_WAIT_TIMEOUT)
+            feed.wait()
+        return response.Response(feed.get_page())
+
+
+class ResponseCacheStatsView(views.APIView):
+    """hits, misses and hit rate of the cached read endpoints, counted by the process serving the request"""
+
+    def get(self, request: request.Request):
+        return response.Response(response_cache.get_stats())
\ No newline at end of file
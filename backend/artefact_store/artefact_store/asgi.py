@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'artefact_store.settings')
+# the change feed is long-polled on the event loop, waiting clients do not hold threads
+os.environ.setdefault('ARTEFACT_STORE_ASYNC_LONG_POLL', '1')
 
 application = get_asgi_application()
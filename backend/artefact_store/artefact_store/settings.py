@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # compresses large responses for clients sending `Accept-Encoding: gzip`, it must run last on the response
+    'django.middleware.gzip.GZipMiddleware',
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +57,27 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'artefact_store.urls'
 
+# serves the read endpoints with async views under asgi (see `api.async_views`), opt-in: the `load_test_read_views`
+# command measured them slower than the synchronous views
+ASYNC_READ_VIEWS = os.environ.get('ARTEFACT_STORE_ASYNC_READ_VIEWS', '0') == '1'
+# serves the change feed with the long-poll view (see `api.async_views.long_poll_view`), whose waiting requests do not
+# hold threads. `artefact_store.asgi` enables it, under wsgi the synchronous view waits for a short time instead
+ASYNC_LONG_POLL = os.environ.get('ARTEFACT_STORE_ASYNC_LONG_POLL', '0') == '1'
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'api.parsers.MessagePackParser',
+    ],
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -83,6 +108,38 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# `responses` holds the cached responses of the read endpoints (see `api.response_cache`). The in-memory cache is local
+# to each process, the processes of a deployment share the cache (and its invalidations) when
+# `ARTEFACT_STORE_RESPONSE_CACHE_DIR` sets a directory for a file based cache.
+RESPONSE_CACHE_DIR = os.environ.get('ARTEFACT_STORE_RESPONSE_CACHE_DIR')
+# responses are only cached when all the processes of the store share the cache: a write only invalidates the cache of
+# the process handling it, the other processes would keep serving stale responses. The in-memory cache is shared when
+# the store runs a single process, which `ARTEFACT_STORE_RESPONSE_CACHE_SHARED=1` declares.
+RESPONSE_CACHE_SHARED = (
+    os.environ.get('ARTEFACT_STORE_RESPONSE_CACHE_SHARED', '1' if RESPONSE_CACHE_DIR else '0') == '1'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': RESPONSE_CACHE_DIR,
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    } if RESPONSE_CACHE_DIR else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'responses',
+        'TIMEOUT': 3600,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -1,3 +1,5 @@
+from typing import List
+
 import attr
 
 import typing_utils
@@ -70,6 +72,15 @@ class Version:
     def to_json(self) -> typing_utils.JSON:
         return {"major": self.major, "minor": self.minor, "patch": self.patch}
 
+    @staticmethod
+    def ordering_fields(data_path: str, descending: bool = False) -> List[str]:
+        """
+        `order_by` fields ordering artefacts by the version stored at `data_path` in their data, versions are
+        compared on their numbers (`10.0.0` comes after `9.1.0`).
+        """
+        direction = "-" if descending else ""
+        return [f"{direction}artefact_data.{data_path}.{part}" for part in ("major", "minor", "patch")]
+
     def is_compatible(self, other: "Version") -> bool:
         if self.major == 0 and other.major == 0:
             return self.minor == other.minor
@@ -1,2 +1,6 @@
 import jeyn.backend.errors
-import jeyn.backend.artefacts
\ No newline at end of file
+import jeyn.backend.instrumentation
+import jeyn.backend.client
+import jeyn.backend.embedded
+import jeyn.backend.artefacts
+from jeyn.backend.instrumentation import stats, request_budget
@@ -1,7 +1,12 @@
 from ._artefact_class_meta import ArtefactClassMeta
 from ._artefact import Artefact
+from ._artefact_cache import ArtefactCache, artefact_cache
 from ._relationship import Relationship
+from ._query_batch import QueryBatch, BatchedLookup
 
 __all__ = [
-    "Artefact"
-]
\ No newline at end of file
+    "Artefact",
+    "ArtefactCache",
+    "artefact_cache",
+    "QueryBatch",
+]
@@ -1,13 +1,16 @@
 import abc
-import base64
-import json
-from typing import List, Any, Dict
+import asyncio
+import contextlib
+import contextvars
+from typing import List, Any, Dict, Tuple, Optional, Iterator, AsyncIterator, Sequence
 
-import requests
-
-from .. import errors, constants, artefacts
+from .. import errors, artefacts, client, constants
 import typing_utils
 
+# jsons of the ancestors returned along with the artefact being loaded, they are used to build its related artefacts
+# without going back to the backend.
+_prefetched_artefact_jsons: contextvars.ContextVar = contextvars.ContextVar("prefetched_artefact_jsons", default={})
+
 
 class Artefact(abc.ABC):
     _artefact_id: int = None
@@ -18,30 +21,363 @@ class Artefact(abc.ABC):
             raise errors.MetaCreationError("`_meta` attribute was set explicitly, you probably want to define a Meta "
                                            "class instead")
         cls._meta = cls._generate_metadata()
-        cls._meta.save_type_if_needed(check=True)
 
     @classmethod
     def get(cls, **kwargs) -> List["Artefact"]:
-        response = requests.get(f"{constants.store_route}/api/artefact/query/?{cls._build_query_string(kwargs)}")
-        response.raise_for_status()
-        result = []
-        for artefact_json in response.json():
-            artefact_object = cls.from_artefact_json(artefact_json)
-            artefact_object._artefact_id = artefact_json["id"]
-            result.append(artefact_object)
-        return result
+        return list(cls.iterate(**kwargs))
+
+    @classmethod
+    async def aget(cls, **kwargs) -> List["Artefact"]:
+        """asyncio counterpart of `get`"""
+        return [artefact async for artefact in cls.aiterate(**kwargs)]
+
+    @classmethod
+    def iterate(cls, page_size: int = constants.query_page_size, **kwargs) -> Iterator["Artefact"]:
+        """
+        lazily iterates over the artefacts matching the query, results are fetched `page_size` artefacts at a time
+        and only when needed.
+        """
+        cls._meta.ensure_registered()
+        for artefact_json in client.get_client().iter_query_artefacts(
+            cls._build_query(kwargs), cls._meta.artefact_type_name, page_size
+        ):
+            yield cls._from_cache_or_json(artefact_json)
+
+    @classmethod
+    async def aiterate(cls, page_size: int = constants.query_page_size, **kwargs) -> AsyncIterator["Artefact"]:
+        """asyncio counterpart of `iterate`, the artefacts of a page are built concurrently"""
+        async_client = client.get_async_client()
+        if not cls._meta.is_registered:
+            await async_client.run(cls._meta.ensure_registered)
+        query = cls._build_query(kwargs)
+        cursor = None
+        while True:
+            artefact_jsons, cursor = await async_client.query_artefacts_page(
+                query, cls._meta.artefact_type_name, page_size, cursor=cursor
+            )
+            page_artefacts = await asyncio.gather(*(
+                cls._afrom_cache_or_json(artefact_json) for artefact_json in artefact_jsons
+            ))
+            for artefact in page_artefacts:
+                yield artefact
+            if cursor is None:
+                return
+
+    @classmethod
+    def iterate_json(
+            cls,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+            page_size: int = constants.query_page_size,
+            **kwargs
+    ) -> Iterator[typing_utils.JSON]:
+        """
+        lazily iterates over the raw backend jsons of the artefacts matching the query, restricted to `fields` (top
+        level fields or `artefact_data.<path>` json paths) and without the `omit` fields. This is useful to select
+        artefacts from a few of their attributes before loading them.
+
+        >>> formula_versions = DatasetFormulaArtefact.iterate_json(fields=["id", "artefact_data.version"], formula_name="foo")
+        """
+        cls._meta.ensure_registered()
+        yield from client.get_client().iter_query_artefacts(
+            cls._build_query(kwargs), cls._meta.artefact_type_name, page_size, fields=fields, omit=omit
+        )
+
+    @classmethod
+    def first(cls, **kwargs) -> Optional["Artefact"]:
+        """returns the first artefact matching the query (or `None`), only a single artefact is fetched"""
+        return next(cls.iterate(page_size=1, **kwargs), None)
+
+    @classmethod
+    def get_latest(
+            cls,
+            order_by: Sequence[str],
+            child_of: Optional["Artefact"] = None,
+            relationship_type: Optional[str] = None,
+            **kwargs
+    ) -> Optional["Artefact"]:
+        """
+        returns the first artefact matching the query once ordered by `order_by` (see
+        `BaseBackendClient.query_artefacts`) or `None`. The store orders the artefacts and only returns the id of the
+        first one, which is then loaded with its ancestors. `child_of` and `relationship_type` restrict the query to
+        the children of an artefact, ordering can then use the relationship's columns.
+
+        >>> CheckpointArtefact.get_latest(["-parents.creation_time"], child_of=use_case_artefact)
+        >>> DatasetFormulaArtefact.get_latest(Version.ordering_fields("version", descending=True), formula_name="foo")
+        """
+        cls._meta.ensure_registered()
+        artefact_jsons = client.get_client().query_artefacts(
+            cls._build_ordered_query(kwargs, child_of, relationship_type),
+            cls._meta.artefact_type_name,
+            order_by=order_by,
+            limit=1,
+            fields=["id"]
+        )
+        if len(artefact_jsons) == 0:
+            return None
+        return cls.get_from_id(artefact_jsons[0]["id"])
+
+    @classmethod
+    async def aget_latest(
+            cls,
+            order_by: Sequence[str],
+            child_of: Optional["Artefact"] = None,
+            relationship_type: Optional[str] = None,
+            **kwargs
+    ) -> Optional["Artefact"]:
+        """asyncio counterpart of `get_latest`"""
+        async_client = client.get_async_client()
+        if not cls._meta.is_registered:
+            await async_client.run(cls._meta.ensure_registered)
+        artefact_jsons = await async_client.query_artefacts(
+            cls._build_ordered_query(kwargs, child_of, relationship_type),
+            cls._meta.artefact_type_name,
+            order_by=order_by,
+            limit=1,
+            fields=["id"]
+        )
+        if len(artefact_jsons) == 0:
+            return None
+        return await cls.aget_from_id(artefact_jsons[0]["id"])
 
     @classmethod
-    def get_from_id(cls, artefact_id: int) -> "Artefact":
-        response = requests.get(f"{constants.store_route}/api/artefact/{artefact_id}")
-        response.raise_for_status()
-        return cls.from_artefact_json(artefact_json=response.json())
+    def get_descendants_of(
+            cls,
+            artefact: "Artefact",
+            relationship_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None
+    ) -> List["Artefact"]:
+        """
+        artefacts of this class derived from `artefact`, following only `relationship_types` up to `max_depth`
+        relationships away if given. The store computes the lineage in one query and returns the ids of the
+        descendants, which are then loaded with `get_many`.
+
+        >>> CheckpointArtefact.get_descendants_of(formula_artefact, ["batch_formula", "checkpoint_dataset_batch"])
+        """
+        return cls.get_many(cls._get_lineage_ids(artefact, "descendants", relationship_types, max_depth))
+
+    @classmethod
+    def get_ancestors_of(
+            cls,
+            artefact: "Artefact",
+            relationship_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None
+    ) -> List["Artefact"]:
+        """artefacts of this class `artefact` derives from, see `get_descendants_of`"""
+        return cls.get_many(cls._get_lineage_ids(artefact, "ancestors", relationship_types, max_depth))
+
+    @classmethod
+    async def aget_descendants_of(
+            cls,
+            artefact: "Artefact",
+            relationship_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None
+    ) -> List["Artefact"]:
+        """asyncio counterpart of `get_descendants_of`"""
+        return await cls.aget_many(await client.get_async_client().run(
+            cls._get_lineage_ids, artefact, "descendants", relationship_types, max_depth
+        ))
+
+    @classmethod
+    async def aget_ancestors_of(
+            cls,
+            artefact: "Artefact",
+            relationship_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None
+    ) -> List["Artefact"]:
+        """asyncio counterpart of `get_ancestors_of`"""
+        return await cls.aget_many(await client.get_async_client().run(
+            cls._get_lineage_ids, artefact, "ancestors", relationship_types, max_depth
+        ))
+
+    @classmethod
+    def _get_lineage_ids(
+            cls,
+            artefact: "Artefact",
+            direction: str,
+            relationship_types: Optional[Sequence[str]],
+            max_depth: Optional[int]
+    ) -> List[int]:
+        if not artefact.is_saved:
+            raise errors.RelationshipError(f"cannot load the lineage of {artefact}, it is not saved yet")
+        cls._meta.ensure_registered()
+        return [
+            artefact_json["id"]
+            for artefact_json in client.get_client().iter_lineage(
+                artefact.artefact_id,
+                direction,
+                page_size=constants.lineage_page_size,
+                relationship_types=relationship_types,
+                artefact_types=[cls._meta.artefact_type_name],
+                max_depth=max_depth,
+                fields=["id"]
+            )
+        ]
+
+    @classmethod
+    def get_from_id(cls, artefact_id: int, ancestors_depth: Optional[int] = constants.ancestors_depth) -> "Artefact":
+        """
+        loads an artefact from its id. Its ancestors (up to `ancestors_depth` relationships away) are fetched in the
+        same request so that the related artefacts it references are built without any other request.
+        """
+        cached_artefact = artefacts.artefact_cache.get(artefact_id)
+        if isinstance(cached_artefact, cls):
+            return cached_artefact
+        prefetched_artefact_json = _prefetched_artefact_jsons.get().get(artefact_id)
+        if prefetched_artefact_json is not None:
+            return cls._build_and_cache(prefetched_artefact_json)
+        artefact_json = client.get_client().get_artefact(artefact_id, ancestors_depth=ancestors_depth)
+        with cls._prefetched_ancestors(artefact_json):
+            return cls._build_and_cache(artefact_json)
+
+    @classmethod
+    async def aget_from_id(
+            cls, artefact_id: int, ancestors_depth: Optional[int] = constants.ancestors_depth
+    ) -> "Artefact":
+        """asyncio counterpart of `get_from_id`"""
+        cached_artefact = artefacts.artefact_cache.get(artefact_id)
+        if isinstance(cached_artefact, cls):
+            return cached_artefact
+        prefetched_artefact_json = _prefetched_artefact_jsons.get().get(artefact_id)
+        if prefetched_artefact_json is not None:
+            return await cls._abuild_and_cache(prefetched_artefact_json)
+        artefact_json = await client.get_async_client().get_artefact(artefact_id, ancestors_depth=ancestors_depth)
+        with cls._prefetched_ancestors(artefact_json):
+            return await cls._abuild_and_cache(artefact_json)
+
+    @classmethod
+    def get_many(
+            cls,
+            artefact_ids: Sequence[int],
+            ancestors_depth: Optional[int] = constants.ancestors_depth,
+            skip_missing: bool = False
+    ) -> List["Artefact"]:
+        """
+        loads artefacts from their ids, in order. The ones not loaded yet are fetched along with their ancestors in a
+        single request (one per `constants.many_ids_limit` ids). Ids that do not exist raise an
+        `ArtefactNotFoundError` unless `skip_missing` is set.
+        """
+        artefacts_by_id, prefetched_artefact_jsons, ids_to_fetch = cls._split_loaded_ids(artefact_ids)
+        for artefact_json in prefetched_artefact_jsons:
+            artefacts_by_id[artefact_json["id"]] = cls._build_and_cache(artefact_json)
+        if ids_to_fetch:
+            many_json = client.get_client().get_artefacts(ids_to_fetch, ancestors_depth=ancestors_depth)
+            cls._check_missing_ids(many_json["missing"], skip_missing=skip_missing)
+            with cls._prefetched_ancestors(many_json):
+                for artefact_json in many_json["results"]:
+                    artefacts_by_id[artefact_json["id"]] = cls._build_and_cache(artefact_json)
+        return [artefacts_by_id[artefact_id] for artefact_id in artefact_ids if artefact_id in artefacts_by_id]
+
+    @classmethod
+    async def aget_many(
+            cls,
+            artefact_ids: Sequence[int],
+            ancestors_depth: Optional[int] = constants.ancestors_depth,
+            skip_missing: bool = False
+    ) -> List["Artefact"]:
+        """asyncio counterpart of `get_many`, the artefacts are built concurrently"""
+        artefacts_by_id, artefact_jsons, ids_to_fetch = cls._split_loaded_ids(artefact_ids)
+        if ids_to_fetch:
+            many_json = await client.get_async_client().get_artefacts(ids_to_fetch, ancestors_depth=ancestors_depth)
+            cls._check_missing_ids(many_json["missing"], skip_missing=skip_missing)
+            artefact_jsons.extend(many_json["results"])
+        else:
+            many_json = {}
+        with cls._prefetched_ancestors(many_json):
+            built_artefacts = await asyncio.gather(*(
+                cls._abuild_and_cache(artefact_json) for artefact_json in artefact_jsons
+            ))
+        artefacts_by_id.update(zip([artefact_json["id"] for artefact_json in artefact_jsons], built_artefacts))
+        return [artefacts_by_id[artefact_id] for artefact_id in artefact_ids if artefact_id in artefacts_by_id]
+
+    @classmethod
+    def _split_loaded_ids(
+            cls, artefact_ids: Sequence[int]
+    ) -> Tuple[Dict[int, "Artefact"], List[typing_utils.JSON], List[int]]:
+        """artefacts of the identity map, jsons prefetched along with an artefact being loaded and ids to fetch"""
+        artefacts_by_id = {}
+        prefetched_artefact_jsons = []
+        ids_to_fetch = []
+        for artefact_id in dict.fromkeys(artefact_ids):
+            cached_artefact = artefacts.artefact_cache.get(artefact_id)
+            prefetched_artefact_json = _prefetched_artefact_jsons.get().get(artefact_id)
+            if isinstance(cached_artefact, cls):
+                artefacts_by_id[artefact_id] = cached_artefact
+            elif prefetched_artefact_json is not None:
+                prefetched_artefact_jsons.append(prefetched_artefact_json)
+            else:
+                ids_to_fetch.append(artefact_id)
+        return artefacts_by_id, prefetched_artefact_jsons, ids_to_fetch
+
+    @classmethod
+    def _check_missing_ids(cls, missing_ids: List[int], skip_missing: bool):
+        if missing_ids and not skip_missing:
+            raise errors.ArtefactNotFoundError(
+                f"no {cls._meta.artefact_type_name} artefacts with ids {', '.join(map(str, missing_ids))}"
+            )
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _prefetched_ancestors(artefact_json: typing_utils.JSON):
+        ancestor_jsons = artefact_json.get("ancestors", [])
+        if len(ancestor_jsons) == 0:
+            yield
+            return
+        prefetched_artefact_jsons = {
+            **_prefetched_artefact_jsons.get(),
+            **{ancestor_json["id"]: ancestor_json for ancestor_json in ancestor_jsons}
+        }
+        token = _prefetched_artefact_jsons.set(prefetched_artefact_jsons)
+        try:
+            yield
+        finally:
+            _prefetched_artefact_jsons.reset(token)
+
+    @classmethod
+    def _from_cache_or_json(cls, artefact_json: typing_utils.JSON) -> "Artefact":
+        """
+        builds the artefact from its backend json unless it is already in the identity map, saved artefacts are
+        immutable so the cached object is always up to date.
+        """
+        cached_artefact = artefacts.artefact_cache.get(artefact_json["id"])
+        if isinstance(cached_artefact, cls):
+            return cached_artefact
+        return cls._build_and_cache(artefact_json)
+
+    @classmethod
+    async def _afrom_cache_or_json(cls, artefact_json: typing_utils.JSON) -> "Artefact":
+        cached_artefact = artefacts.artefact_cache.get(artefact_json["id"])
+        if isinstance(cached_artefact, cls):
+            return cached_artefact
+        return await cls._abuild_and_cache(artefact_json)
+
+    @classmethod
+    def _build_and_cache(cls, artefact_json: typing_utils.JSON) -> "Artefact":
+        return cls._cache_built_artefact(cls.from_artefact_json(artefact_json=artefact_json), artefact_json)
+
+    @classmethod
+    async def _abuild_and_cache(cls, artefact_json: typing_utils.JSON) -> "Artefact":
+        return cls._cache_built_artefact(await cls.afrom_artefact_json(artefact_json=artefact_json), artefact_json)
+
+    @staticmethod
+    def _cache_built_artefact(artefact_object: "Artefact", artefact_json: typing_utils.JSON) -> "Artefact":
+        artefact_object._artefact_id = artefact_json["id"]
+        artefacts.artefact_cache.put(artefact_object)
+        return artefact_object
 
     @classmethod
     @abc.abstractmethod
     def from_artefact_json(cls, artefact_json: typing_utils.JSON) -> "Artefact":
         pass
 
+    @classmethod
+    async def afrom_artefact_json(cls, artefact_json: typing_utils.JSON) -> "Artefact":
+        """
+        asyncio counterpart of `from_artefact_json`. By default `from_artefact_json` is run in the backend client's
+        thread pool, artefacts that load related artefacts should override it to load them concurrently.
+        """
+        return await client.get_async_client().run(cls.from_artefact_json, artefact_json)
+
     @property
     def is_saved(self):
         return self._artefact_id is not None
@@ -62,14 +398,112 @@ class Artefact(abc.ABC):
         pass
 
     def save(self):
-        self._save_artefact()
-        self._save_relationships()
+        self.save_graph([self])
+
+    async def asave(self):
+        """asyncio counterpart of `save`"""
+        await self.asave_graph([self])
+
+    @classmethod
+    def save_graph(cls, artefacts_to_save: List["Artefact"]):
+        """
+        saves artefacts and all their relationships in a single request, the backend commits them in one
+        transaction so that no artefact is left without its relationships. Relationships between the saved artefacts
+        are allowed, any other end of a relationship must already be saved.
+        """
+        for artefact in artefacts_to_save:
+            artefact._meta.ensure_registered()
+        graph_json, relationships = cls._build_graph_json(artefacts_to_save)
+        response_json = client.get_client().save_graph(graph_json)
+        cls._update_with_saved_graph(artefacts_to_save, relationships, response_json)
+
+    @classmethod
+    async def asave_graph(cls, artefacts_to_save: List["Artefact"]):
+        """asyncio counterpart of `save_graph`"""
+        async_client = client.get_async_client()
+        for artefact in artefacts_to_save:
+            if not artefact._meta.is_registered:
+                await async_client.run(artefact._meta.ensure_registered)
+        graph_json, relationships = cls._build_graph_json(artefacts_to_save)
+        response_json = await async_client.save_graph(graph_json)
+        cls._update_with_saved_graph(artefacts_to_save, relationships, response_json)
+
+    @classmethod
+    def save_bulk(cls, artefacts_to_save: List["Artefact"]):
+        """
+        saves many artefacts and their relationships at once with the store's bulk ingestion, to backfill histories
+        of dataset batches or model checkpoints. The store validates them as a set and inserts them in chunked
+        transactions: unlike `save_graph`, an insertion failure leaves the previous chunks saved.
+        """
+        for artefact_meta in {id(artefact._meta): artefact._meta for artefact in artefacts_to_save}.values():
+            artefact_meta.ensure_registered()
+        bulk_json, relationships = cls._build_graph_json(artefacts_to_save)
+        response_json = client.get_client().save_bulk(bulk_json)
+        cls._update_with_saved_ids(
+            artefacts_to_save, relationships, response_json["artefacts"], response_json["relationships"]
+        )
+
+    @classmethod
+    async def asave_bulk(cls, artefacts_to_save: List["Artefact"]):
+        """asyncio counterpart of `save_bulk`"""
+        async_client = client.get_async_client()
+        for artefact_meta in {id(artefact._meta): artefact._meta for artefact in artefacts_to_save}.values():
+            if not artefact_meta.is_registered:
+                await async_client.run(artefact_meta.ensure_registered)
+        bulk_json, relationships = cls._build_graph_json(artefacts_to_save)
+        response_json = await async_client.save_bulk(bulk_json)
+        cls._update_with_saved_ids(
+            artefacts_to_save, relationships, response_json["artefacts"], response_json["relationships"]
+        )
+
+    @staticmethod
+    def _build_graph_json(
+            artefacts_to_save: List["Artefact"]
+    ) -> Tuple[typing_utils.JSON, List["artefacts.Relationship"]]:
+        artefact_refs = {id(artefact): str(ref) for ref, artefact in enumerate(artefacts_to_save)}
+        relationships = [
+            relationship
+            for artefact in artefacts_to_save
+            for relationship in artefact.get_relationships()
+        ]
+        graph_json = {
+            "artefacts": [
+                {"ref": artefact_refs[id(artefact)], **artefact.generate_db_json()} for artefact in artefacts_to_save
+            ],
+            "relationships": [relationship.to_graph_json(artefact_refs) for relationship in relationships]
+        }
+        return graph_json, relationships
+
+    @staticmethod
+    def _update_with_saved_graph(
+            artefacts_to_save: List["Artefact"],
+            relationships: List["artefacts.Relationship"],
+            response_json: typing_utils.JSON
+    ):
+        Artefact._update_with_saved_ids(
+            artefacts_to_save,
+            relationships,
+            [saved_artefact_json["id"] for saved_artefact_json in response_json["artefacts"]],
+            [saved_relationship_json["id"] for saved_relationship_json in response_json["relationships"]],
+        )
+
+    @staticmethod
+    def _update_with_saved_ids(
+            artefacts_to_save: List["Artefact"],
+            relationships: List["artefacts.Relationship"],
+            artefact_ids: List[int],
+            relationship_ids: List[int]
+    ):
+        for artefact, artefact_id in zip(artefacts_to_save, artefact_ids):
+            artefact._artefact_id = artefact_id
+            artefacts.artefact_cache.put(artefact)
+        for relationship, relationship_id in zip(relationships, relationship_ids):
+            relationship.id = relationship_id
 
     def generate_db_json(self) -> typing_utils.JSON:
-        type_route = f"{constants.store_route}/api/artefact-type/{self._meta.artefact_type_name}/"
         return {
             "artefact_type_reference": self._meta.artefact_type_name,
-            "artefact_data": json.dumps(self.artefact_json()),
+            "artefact_data": self.artefact_json(),
         }
 
     @classmethod
@@ -96,10 +530,21 @@ class Artefact(abc.ABC):
         return use_case_artefact_ids[0]
 
     @staticmethod
-    def _build_query_string(query_dict: Dict[str, Any]) -> str:
-        formated_query_json = {f"artefact_data__{k}": v for k, v in query_dict.items()}
-        query_bytes = base64.b64encode(json.dumps(formated_query_json).encode('utf-8'))
-        return f"q={query_bytes.decode('utf-8')}"
+    def _build_query(query_dict: Dict[str, Any]) -> Dict[str, Any]:
+        return {f"artefact_data__{k}": v for k, v in query_dict.items()}
+
+    @classmethod
+    def _build_ordered_query(
+            cls, query_dict: Dict[str, Any], child_of: Optional["Artefact"], relationship_type: Optional[str]
+    ) -> Dict[str, Any]:
+        query = cls._build_query(query_dict)
+        if child_of is not None:
+            if not child_of.is_saved:
+                raise errors.RelationshipError(f"cannot query the children of {child_of}, it is not saved yet")
+            query["parents__parent"] = child_of.artefact_id
+        if relationship_type is not None:
+            query["parents__relationship_type"] = relationship_type
+        return query
 
     @staticmethod
     def _build_query_argument(query_dict: Dict[str, Any]) -> Dict[str, str]:
@@ -122,17 +567,6 @@ class Artefact(abc.ABC):
             raise errors.ArtefactMetaError(f"the Meta class attribute must be a python type")
         return artefacts.ArtefactClassMeta(
             schema=getattr(cls.Meta, "schema"),
-            artefact_type_name=getattr(cls.Meta, "artefact_type_name", cls.__name__)
+            artefact_type_name=getattr(cls.Meta, "artefact_type_name", cls.__name__),
+            indexed_paths=getattr(cls.Meta, "indexed_paths", [])
         )
-
-    def _save_artefact(self):
-        response = requests.post(f"{constants.store_route}/api/artefact/", data=self.generate_db_json())
-        response.raise_for_status()
-        response_json = response.json()
-        self._artefact_id = response_json["id"]
-
-    def _save_relationships(self):
-        for relationship in self.get_relationships():
-            relationship.save()
-
-
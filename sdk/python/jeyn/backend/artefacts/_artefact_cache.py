@@ -0,0 +1,71 @@
+import collections
+import threading
+from typing import Optional, Dict
+
+from .. import client, constants, artefacts
+
+
+class ArtefactCache:
+    """
+    in-process identity map of the artefacts loaded from (or saved to) the backend. Artefacts are immutable once
+    saved so an artefact id always maps to the same object, this avoids fetching again artefacts that are referenced
+    by many others (the formula of every batch for instance). The least recently used artefacts are evicted once
+    `max_size` artefacts are cached.
+
+    ids are only unique within a store so the cache is emptied when the backend client is swapped.
+    """
+
+    def __init__(self, max_size: int = constants.artefact_cache_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._artefacts: "collections.OrderedDict[int, artefacts.Artefact]" = collections.OrderedDict()
+        self._client = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._artefacts)
+
+    def __contains__(self, artefact_id: int):
+        with self._lock:
+            self._check_client()
+            return artefact_id in self._artefacts
+
+    def get(self, artefact_id: int) -> Optional["artefacts.Artefact"]:
+        with self._lock:
+            self._check_client()
+            artefact = self._artefacts.get(artefact_id)
+            if artefact is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._artefacts.move_to_end(artefact_id)
+            return artefact
+
+    def put(self, artefact: "artefacts.Artefact"):
+        if not artefact.is_saved or self.max_size <= 0:
+            return
+        with self._lock:
+            self._check_client()
+            self._artefacts[artefact.artefact_id] = artefact
+            self._artefacts.move_to_end(artefact.artefact_id)
+            while len(self._artefacts) > self.max_size:
+                self._artefacts.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._artefacts.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self), "max_size": self.max_size}
+
+    def _check_client(self):
+        backend_client = client.get_client()
+        if self._client is not backend_client:
+            self._artefacts.clear()
+            self._client = backend_client
+
+
+artefact_cache = ArtefactCache()
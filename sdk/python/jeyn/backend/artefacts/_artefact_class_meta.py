@@ -1,26 +1,61 @@
-import requests
+import threading
+from typing import List, ClassVar, Sequence
 
-from backend import constants
+from .. import client
 import typing_utils
 
 
 class ArtefactClassMeta:
+    """
+    metadata of an artefact class. Artefact types are not registered on the backend when the class is defined
+    (that would mean blocking http calls at import time) but lazily, the first time an artefact type is saved or
+    queried. All the types not yet registered are then registered together in a single request.
+    """
+
     artefact_type_name: str
     schema: typing_utils.JSON
+    # json paths of the artefact data the artefacts are queried by, the backend indexes them
+    indexed_paths: List[str]
+
+    _all_metas: ClassVar[List["ArtefactClassMeta"]] = []
+    _registration_lock: ClassVar[threading.Lock] = threading.Lock()
 
-    def __init__(self, schema: typing_utils.JSON, artefact_type_name: str):
+    def __init__(self, schema: typing_utils.JSON, artefact_type_name: str, indexed_paths: Sequence[str] = ()):
         self.schema = schema
         self.artefact_type_name = artefact_type_name
+        self.indexed_paths = list(indexed_paths)
+        # client the type was registered with, registration is done again if the client is swapped.
+        self._registered_client = None
+        self._all_metas.append(self)
 
-    def save_type_if_needed(self, check: bool = True):
-        response = requests.get(f"{constants.store_route}/api/artefact-type/{self.artefact_type_name}/")
-        if response.status_code == 404:
-            self.save_type()
+    @property
+    def is_registered(self) -> bool:
+        return self._registered_client is client.get_client()
+
+    def ensure_registered(self, check: bool = True):
+        """registers this artefact type along with every other pending type if it is not registered yet"""
+        if self.is_registered:
             return
-        response.raise_for_status()
-        if check:
-            self._check_type_data(response.json())
-        self._update_with_remote_artefact_type(response.json())
+        with self._registration_lock:
+            if self.is_registered:
+                return
+            self.register_pending_types(check=check)
+
+    @classmethod
+    def register_pending_types(cls, check: bool = True):
+        backend_client = client.get_client()
+        pending_metas = [meta for meta in cls._all_metas if meta._registered_client is not backend_client]
+        if len(pending_metas) == 0:
+            return
+        remote_artefact_type_jsons = backend_client.ensure_artefact_types([meta.to_json() for meta in pending_metas])
+        for meta, remote_artefact_type_json in zip(pending_metas, remote_artefact_type_jsons):
+            if check:
+                meta._check_type_data(remote_artefact_type_json)
+            meta._update_with_remote_artefact_type(remote_artefact_type_json)
+            meta._registered_client = backend_client
+
+    def save_type_if_needed(self, check: bool = True):
+        self.ensure_registered(check=check)
 
     def _update_with_remote_artefact_type(self, remote_artefact_type_json: typing_utils.JSON):
         pass
@@ -29,11 +64,11 @@ class ArtefactClassMeta:
         pass
 
     def save_type(self):
-        response = requests.post(f"{constants.store_route}/api/artefact-type/", json=self.to_json())
-        response.raise_for_status()
+        client.get_client().save_artefact_type(self.to_json())
 
     def to_json(self) -> typing_utils.JSON:
         return {
             "schema": self.schema,
-            "type_name": self.artefact_type_name
-        }
\ No newline at end of file
+            "type_name": self.artefact_type_name,
+            "indexed_paths": self.indexed_paths
+        }
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Dict, List, Optional, Sequence, Type, Any
+
+import attr
+
+from .. import errors, client, constants, artefacts
+import typing_utils
+
+
+@attr.s
+class BatchedLookup:
+    """lookup of a `QueryBatch`, its `result` is available once the batch is executed"""
+    artefact_cls: Type["artefacts.Artefact"] = attr.field()
+    query_json: typing_utils.JSON = attr.field()
+    single: bool = attr.field(default=False)
+    _result: Any = attr.field(init=False, default=None)
+    _is_executed: bool = attr.field(init=False, default=False)
+
+    @property
+    def result(self):
+        """the matching artefacts, or the first of them (`None` if none matches) for single artefact lookups"""
+        if not self._is_executed:
+            raise errors.BackendError("the lookup's batch has not been executed yet")
+        return self._result
+
+    def _set_result(self, loaded_artefacts: List["artefacts.Artefact"]):
+        self._result = (loaded_artefacts[0] if loaded_artefacts else None) if self.single else loaded_artefacts
+        self._is_executed = True
+
+
+class QueryBatch:
+    """
+    lookups issued together and answered by the store in a single round trip, such as the independent lookups of a
+    pipeline's start-up (formulas by name and version, use cases by name, latest batches). Each lookup returns a
+    `BatchedLookup` whose `result` is set when the batch is executed. The ancestors of the matching artefacts are
+    returned along with them so that building the artefacts does not load their parents one by one.
+
+    >>> batch = QueryBatch()
+    >>> formula = batch.get_latest(DatasetFormulaArtefact, Version.ordering_fields("version", True), formula_name="f")
+    >>> use_case = batch.first(UseCaseArtefact, use_case_name="churn")
+    >>> batch.execute()
+    >>> formula.result, use_case.result
+    """
+
+    def __init__(self):
+        self._lookups: List[BatchedLookup] = []
+
+    def get(self, artefact_cls: Type["artefacts.Artefact"], limit: Optional[int] = None, **kwargs) -> BatchedLookup:
+        """artefacts of `artefact_cls` matching the query, at most `limit` of them (and at most 1000)"""
+        query_json = {"filters": artefact_cls._build_query(kwargs)}
+        if limit is not None:
+            query_json["limit"] = limit
+        return self._add_lookup(artefact_cls, query_json)
+
+    def first(self, artefact_cls: Type["artefacts.Artefact"], **kwargs) -> BatchedLookup:
+        """first artefact of `artefact_cls` matching the query (or `None`), see `Artefact.first`"""
+        return self._add_lookup(artefact_cls, {"filters": artefact_cls._build_query(kwargs), "limit": 1}, single=True)
+
+    def get_latest(
+            self,
+            artefact_cls: Type["artefacts.Artefact"],
+            order_by: Sequence[str],
+            child_of: Optional["artefacts.Artefact"] = None,
+            relationship_type: Optional[str] = None,
+            **kwargs
+    ) -> BatchedLookup:
+        """first artefact of `artefact_cls` matching the query once ordered by `order_by`, see `Artefact.get_latest`"""
+        query_json = {
+            "filters": artefact_cls._build_ordered_query(kwargs, child_of, relationship_type),
+            "order_by": list(order_by),
+            "limit": 1,
+        }
+        return self._add_lookup(artefact_cls, query_json, single=True)
+
+    def execute(self):
+        """
+        runs the lookups in a single request and builds their artefacts, with the ancestors returned along with them
+        """
+        for artefact_cls in self._get_artefact_classes():
+            artefact_cls._meta.ensure_registered()
+        batch_json = client.get_client().query_artefacts_batch(self._get_queries_json())
+        with artefacts.Artefact._prefetched_ancestors(batch_json):
+            for lookup_name, lookup in self._get_named_lookups().items():
+                lookup._set_result([
+                    lookup.artefact_cls._from_cache_or_json(artefact_json)
+                    for artefact_json in batch_json["results"][lookup_name]
+                ])
+
+    async def aexecute(self):
+        """asyncio counterpart of `execute`, the artefacts of the lookups are built concurrently"""
+        async_client = client.get_async_client()
+        for artefact_cls in self._get_artefact_classes():
+            if not artefact_cls._meta.is_registered:
+                await async_client.run(artefact_cls._meta.ensure_registered)
+        batch_json = await async_client.query_artefacts_batch(self._get_queries_json())
+        named_lookups = self._get_named_lookups()
+        with artefacts.Artefact._prefetched_ancestors(batch_json):
+            loaded_artefacts = await asyncio.gather(*(
+                asyncio.gather(*(
+                    lookup.artefact_cls._afrom_cache_or_json(artefact_json)
+                    for artefact_json in batch_json["results"][lookup_name]
+                ))
+                for lookup_name, lookup in named_lookups.items()
+            ))
+        for lookup, lookup_artefacts in zip(named_lookups.values(), loaded_artefacts):
+            lookup._set_result(list(lookup_artefacts))
+
+    def _add_lookup(
+            self, artefact_cls: Type["artefacts.Artefact"], query_json: typing_utils.JSON, single: bool = False
+    ) -> BatchedLookup:
+        # the ancestors the artefacts are built from are returned along with them, as when loading them by id
+        query_json = {
+            "artefact_type": artefact_cls._meta.artefact_type_name,
+            "expand": "parents",
+            "depth": constants.ancestors_depth,
+            **query_json
+        }
+        lookup = BatchedLookup(artefact_cls, query_json, single=single)
+        self._lookups.append(lookup)
+        return lookup
+
+    def _get_named_lookups(self) -> Dict[str, BatchedLookup]:
+        return {str(lookup_index): lookup for lookup_index, lookup in enumerate(self._lookups)}
+
+    def _get_queries_json(self) -> Dict[str, typing_utils.JSON]:
+        return {lookup_name: lookup.query_json for lookup_name, lookup in self._get_named_lookups().items()}
+
+    def _get_artefact_classes(self) -> List[Type["artefacts.Artefact"]]:
+        return list({id(lookup.artefact_cls): lookup.artefact_cls for lookup in self._lookups}.values())
@@ -1,9 +1,10 @@
-from typing import Optional
+import datetime
+from typing import Optional, Dict, Any, Iterator, AsyncIterator, List
 
 import attr
-import requests
 
-from backend import errors, constants, utils, artefacts
+from .. import errors, client, artefacts, constants
+import typing_utils
 
 
 @attr.s
@@ -30,9 +31,7 @@ class Relationship:
     def save(self):
         self._check_artefact_is_saved(self.parent)
         self._check_artefact_is_saved(self.child)
-        response = requests.post(f"{constants.store_route}/api/artefact-relationship/", json=self.to_json())
-        utils.django_raise_for_status(response)
-        self.id = response.json()["id"]
+        self.id = client.get_client().save_relationship(self.to_json())["id"]
 
     def to_json(self):
         return {
@@ -41,10 +40,98 @@ class Relationship:
             "parent": self.parent.artefact_id
         }
 
+    def to_graph_json(self, artefact_refs: Dict[int, str]):
+        """
+        json of the relationship inside a saved graph, ends that are saved with the relationship (whose python ids are
+        in `artefact_refs`) are referenced by their ref, the other ones must already be saved.
+        """
+        relationship_json = {"relationship_type": self.relationship_type}
+        for end_name, end in (("parent", self.parent), ("child", self.child)):
+            if id(end) in artefact_refs:
+                relationship_json[f"{end_name}_ref"] = artefact_refs[id(end)]
+            else:
+                self._check_artefact_is_saved(end)
+                relationship_json[end_name] = end.artefact_id
+        return relationship_json
+
+    @classmethod
+    def iterate_json(
+            cls,
+            parent: Optional["artefacts.Artefact"] = None,
+            child: Optional["artefacts.Artefact"] = None,
+            relationship_type: Optional[str] = None,
+            created_after: Optional[datetime.datetime] = None,
+            created_before: Optional[datetime.datetime] = None,
+            page_size: int = constants.query_page_size
+    ) -> Iterator[typing_utils.JSON]:
+        """
+        lazily iterates over the jsons of the relationships matching the filters, they are selected by the store
+        (with its `(parent, relationship_type, creation_time)` index) so that only the matching ones are transferred.
+        `created_after` is inclusive, `created_before` exclusive.
+
+        >>> Relationship.iterate_json(parent=use_case_artefact, relationship_type="checkpoint_use_case", created_after=week)
+        """
+        filters = cls._build_filters(parent, child, relationship_type, created_after, created_before)
+        yield from client.get_client().iter_query_relationships(filters, page_size=page_size)
+
+    @classmethod
+    async def aiterate_json(
+            cls,
+            parent: Optional["artefacts.Artefact"] = None,
+            child: Optional["artefacts.Artefact"] = None,
+            relationship_type: Optional[str] = None,
+            created_after: Optional[datetime.datetime] = None,
+            created_before: Optional[datetime.datetime] = None,
+            page_size: int = constants.query_page_size
+    ) -> AsyncIterator[typing_utils.JSON]:
+        """asyncio counterpart of `iterate_json`"""
+        filters = cls._build_filters(parent, child, relationship_type, created_after, created_before)
+        async_client = client.get_async_client()
+        cursor = None
+        while True:
+            relationship_jsons, cursor = await async_client.query_relationships_page(
+                filters, page_size=page_size, cursor=cursor
+            )
+            for relationship_json in relationship_jsons:
+                yield relationship_json
+            if cursor is None:
+                return
+
+    @classmethod
+    def _build_filters(
+            cls,
+            parent: Optional["artefacts.Artefact"],
+            child: Optional["artefacts.Artefact"],
+            relationship_type: Optional[str],
+            created_after: Optional[datetime.datetime],
+            created_before: Optional[datetime.datetime]
+    ) -> Dict[str, Any]:
+        filters = {}
+        for end_name, end in (("parent", parent), ("child", child)):
+            if end is not None:
+                cls._check_artefact_is_saved(end)
+                filters[end_name] = end.artefact_id
+        if relationship_type is not None:
+            filters["relationship_type"] = relationship_type
+        if created_after is not None:
+            filters["creation_time__gte"] = created_after.isoformat()
+        if created_before is not None:
+            filters["creation_time__lt"] = created_before.isoformat()
+        return filters
+
+    @classmethod
+    def get_artefact_children_json(
+            cls, artefact: "artefacts.Artefact", relationship_type: Optional[str] = None
+    ) -> List[typing_utils.JSON]:
+        """get all the children relationships of an artefact, of type `relationship_type` only if given"""
+        return list(cls.iterate_json(parent=artefact, relationship_type=relationship_type))
+
     @classmethod
-    def get_artefact_children_json(cls, artefact: "artefacts.Artefact"):
-        """get all the children relationships of an artefact"""
-        response = requests.get(f"{constants.store_route}/api/artefact/{artefact.artefact_id}")
-        response.raise_for_status()
-        result = []
-        return response.json()["children"]
+    async def aget_artefact_children_json(
+            cls, artefact: "artefacts.Artefact", relationship_type: Optional[str] = None
+    ) -> List[typing_utils.JSON]:
+        """asyncio counterpart of `get_artefact_children_json`"""
+        return [
+            relationship_json
+            async for relationship_json in cls.aiterate_json(parent=artefact, relationship_type=relationship_type)
+        ]
@@ -0,0 +1,727 @@
+"""
+the client is the single entry point the jeyn sdk uses to talk to the artefact store.
+
+It holds a pooled, keep-alive http session so that chained backend calls (loading a checkpoint fetches its use case,
+its batch and the batch's formula) reuse the same connections instead of paying a new handshake each time. There is
+one client per process, it can be tuned with `configure` or swapped altogether with `set_client` (in tests for
+instance).
+
+>>> jeyn.backend.client.configure(store_route="http://artefact-store:8000", timeout=5, pool_maxsize=32)
+
+The store route also selects the backend: `sqlite://<path>` routes use the embedded, in-process sqlite store (see
+`jeyn.backend.embedded`) instead of an artefact store server. The default route is read from the `JEYN_STORE_ROUTE`
+environment variable.
+
+>>> jeyn.backend.client.configure(store_route="sqlite:///tmp/artefacts.sqlite3")
+
+The payloads of the store's GET responses are kept along with their entity tag and revalidated with conditional
+requests (see `jeyn.backend.validators`), a response that did not change costs its headers only.
+
+asyncio applications use the `AsyncBackendClient` returned by `get_async_client`, it runs the calls of the process'
+client in a dedicated thread pool so that they never block the event loop.
+"""
+import abc
+import asyncio
+import base64
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from concurrent import futures
+from typing import Optional, List, Union, Tuple, Callable, Any, Dict, Iterator, Sequence, AsyncIterator
+from urllib import parse
+
+import requests
+from requests import adapters
+
+from . import constants, errors, utils, instrumentation, validators
+from .. import typing_utils
+
+
+EMBEDDED_ROUTE_PREFIX = "sqlite://"
+
+
+class BaseBackendClient(abc.ABC):
+    """
+    operations the sdk needs from an artefact store. Queries are dicts of django style filters on the artefacts
+    (`{"artefact_data__formula_name": "foo"}`) or on their relationships (`{"parents__parent": 12}`).
+    """
+
+    @abc.abstractmethod
+    def close(self):
+        pass
+
+    @abc.abstractmethod
+    def get_artefact(
+            self,
+            artefact_id: int,
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        """
+        returns the json of an artefact, if `ancestors_depth` is set its ancestors up to `ancestors_depth`
+        relationships away are returned along with it under `ancestors`. `fields` and `omit` restrict the returned
+        fields (see `BackendClient.projection_params`).
+        """
+
+    @abc.abstractmethod
+    def get_artefacts(
+            self,
+            artefact_ids: Sequence[int],
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        """
+        returns many artefacts at once: `results` holds the jsons of the artefacts in the order of `artefact_ids`,
+        `missing` the ids that do not exist and, if `ancestors_depth` is set, `ancestors` the ancestors of all of
+        them (see `get_artefact`).
+        """
+
+    @abc.abstractmethod
+    def query_artefacts_page(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        """
+        returns a page of the query's artefacts of type `artefact_type` and the cursor of the next page (`None` on the
+        last page). Queries are scoped to a type so that the store only reads the rows of that type.
+        """
+
+    @abc.abstractmethod
+    def query_artefacts(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            order_by: Sequence[str] = (),
+            limit: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> List[typing_utils.JSON]:
+        """
+        returns the query's artefacts of type `artefact_type` ordered by `order_by` fields (`id`,
+        `artefact_data.<path>` or `parents.<column>` and `children.<column>` when filtering on relationships, `-`
+        prefix for descending order), at most `limit` of them. Ordering and limiting happen in the store so that
+        selecting the latest artefact returns a single one.
+        """
+
+    @abc.abstractmethod
+    def query_artefacts_batch(self, queries: Dict[str, typing_utils.JSON]) -> typing_utils.JSON:
+        """
+        runs named queries in a single request, `results` holds the artefacts of each of them. A query has the
+        parameters of `query_artefacts`: `artefact_type`, `filters` (the query), `order_by`, `limit`, `fields` and
+        `omit`, each query returns at most 1000 artefacts. The ancestors of the artefacts of queries with
+        `"expand": "parents"` (up to `depth` relationships away) are returned together under `ancestors`.
+        """
+
+    def iter_query_artefacts(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            page_size: int = constants.query_page_size,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Iterator[typing_utils.JSON]:
+        """iterates over the query's artefacts, pages are only fetched when the previous one has been consumed"""
+        cursor = None
+        while True:
+            artefact_jsons, cursor = self.query_artefacts_page(
+                query, artefact_type, page_size=page_size, cursor=cursor, fields=fields, omit=omit
+            )
+            yield from artefact_jsons
+            if cursor is None:
+                return
+
+    @abc.abstractmethod
+    def query_lineage_page(
+            self,
+            artefact_id: int,
+            direction: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            relationship_types: Optional[Sequence[str]] = None,
+            artefact_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        """
+        returns a page of the `ancestors` or `descendants` (`direction`) of an artefact, ordered by id, and the cursor
+        of the next page. The lineage is computed by the store in a single query, following only the relationships of
+        `relationship_types` up to `max_depth` relationships away if given. `artefact_types` only keeps the
+        artefacts of some types, the other ones are still traversed.
+        """
+
+    def iter_lineage(
+            self,
+            artefact_id: int,
+            direction: str,
+            page_size: int = constants.query_page_size,
+            **lineage_kwargs
+    ) -> Iterator[typing_utils.JSON]:
+        """iterates over the ancestors or descendants of an artefact, see `query_lineage_page`"""
+        cursor = None
+        while True:
+            artefact_jsons, cursor = self.query_lineage_page(
+                artefact_id, direction, page_size=page_size, cursor=cursor, **lineage_kwargs
+            )
+            yield from artefact_jsons
+            if cursor is None:
+                return
+
+    @abc.abstractmethod
+    def query_relationships_page(
+            self, filters: Dict[str, Any], page_size: int, cursor: Optional[str] = None
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        """
+        returns a page of the relationships matching `filters` (`parent`, `child`, `relationship_type` and
+        `creation_time__gt`, `__gte`, `__lt` or `__lte` iso formatted times) and the cursor of the next page.
+        """
+
+    def iter_query_relationships(
+            self, filters: Dict[str, Any], page_size: int = constants.query_page_size
+    ) -> Iterator[typing_utils.JSON]:
+        """iterates over the relationships matching `filters`, pages are only fetched when needed"""
+        cursor = None
+        while True:
+            relationship_jsons, cursor = self.query_relationships_page(filters, page_size=page_size, cursor=cursor)
+            yield from relationship_jsons
+            if cursor is None:
+                return
+
+    @abc.abstractmethod
+    def get_changes(
+            self,
+            filters: Dict[str, Any],
+            after: Optional[int] = None,
+            limit: int = constants.change_page_size,
+            timeout: float = 0.0,
+    ) -> Tuple[List[typing_utils.JSON], int]:
+        """
+        returns the changes (inserts of artefacts and relationships) after the sequence number `after` (the current
+        end of the feed if `None`) matching `filters` (`kind`, `artefact_type`, `relationship_type`, `parent`),
+        waiting up to `timeout` seconds for one, along with the sequence number to resume from.
+        """
+
+    def iter_changes(
+            self, filters: Dict[str, Any], after: Optional[int] = None, timeout: float = constants.change_poll_timeout
+    ) -> Iterator[typing_utils.JSON]:
+        """
+        endless iterator over the changes matching `filters` as they happen, the change feed is long-polled. It starts
+        after the sequence number `after`, or with the changes made once the iteration starts.
+        """
+        while True:
+            changes, after = self.get_changes(filters, after=after, timeout=timeout if after is not None else 0.0)
+            yield from changes
+
+    @abc.abstractmethod
+    def save_artefact(self, artefact_json: typing_utils.JSON) -> typing_utils.JSON:
+        pass
+
+    @abc.abstractmethod
+    def save_graph(self, graph_json: typing_utils.JSON) -> typing_utils.JSON:
+        """saves artefacts and their relationships in one request and one transaction."""
+
+    @abc.abstractmethod
+    def save_bulk(self, bulk_json: typing_utils.JSON) -> typing_utils.JSON:
+        """
+        saves many `artefacts` and `relationships` (backfills), validated as a set and inserted in chunked
+        transactions. Returns the ids of the saved `artefacts` and `relationships`, in order.
+        """
+
+    @abc.abstractmethod
+    def save_relationship(self, relationship_json: typing_utils.JSON) -> typing_utils.JSON:
+        pass
+
+    @abc.abstractmethod
+    def get_artefact_type(self, artefact_type_name: str) -> Optional[typing_utils.JSON]:
+        """returns the remote artefact type or `None` if it does not exist yet."""
+
+    @abc.abstractmethod
+    def ensure_artefact_types(self, artefact_type_jsons: List[typing_utils.JSON]) -> List[typing_utils.JSON]:
+        """creates the artefact types that do not exist yet and returns all the remote types, in order."""
+
+    @abc.abstractmethod
+    def save_artefact_type(self, artefact_type_json: typing_utils.JSON) -> typing_utils.JSON:
+        pass
+
+
+class BackendClient(BaseBackendClient):
+    """
+    http client of the artefact store.
+
+    Args:
+        store_route: root url of the artefact store, defaults to `constants.store_route`.
+        timeout: timeout (in seconds) of every request, either a single value or a (connect, read) tuple.
+        pool_connections: number of host connection pools to keep.
+        pool_maxsize: maximum number of kept-alive connections per host.
+        max_retries: number of retries on connection errors.
+        session: an already built session to use instead of creating one.
+        validator_cache_size: number of responses kept to revalidate them with conditional requests, 0 disables it.
+        validator_cache_bytes: maximum total size of the bodies of the responses kept to revalidate them.
+    """
+
+    def __init__(
+            self,
+            store_route: Optional[str] = None,
+            timeout: Union[float, Tuple[float, float]] = constants.request_timeout,
+            pool_connections: int = constants.pool_connections,
+            pool_maxsize: int = constants.pool_maxsize,
+            max_retries: int = 0,
+            session: Optional[requests.Session] = None,
+            validator_cache_size: int = constants.validator_cache_size,
+            validator_cache_bytes: int = constants.validator_cache_bytes,
+    ):
+        self.store_route = (store_route or constants.store_route).rstrip("/")
+        self.timeout = timeout
+        self._session = session or self._build_session(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries
+        )
+        self.validators = validators.ValidatorCache(validator_cache_size, max_bytes=validator_cache_bytes)
+
+    @staticmethod
+    def _build_session(pool_connections: int, pool_maxsize: int, max_retries: int) -> requests.Session:
+        session = requests.Session()
+        adapter = adapters.HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        # responses are negotiated: MessagePack when available, gzip compressed when large
+        session.headers.update({
+            "Connection": "keep-alive", "Accept": utils.accept_header(), "Accept-Encoding": "gzip, deflate"
+        })
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+    def request(self, method: str, route: str, **kwargs) -> requests.Response:
+        """sends a request to `route` (relative to the store route) through the pooled session."""
+        kwargs.setdefault("timeout", self.timeout)
+        start_time = time.perf_counter()
+        response = self._session.request(method, f"{self.store_route}{route}", **kwargs)
+        instrumentation.record(method, route, response, latency=time.perf_counter() - start_time)
+        return response
+
+    def conditional_get(self, route: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        sends a GET request revalidating the response of the same request cached earlier and returns the decoded
+        payload, the cached one when the store answers that it is still current (304).
+        """
+        key = self.validators.key(route, params)
+        cached_response = self.validators.get(key)
+        headers = {"If-None-Match": cached_response.etag} if cached_response is not None else None
+        response = self.request("GET", route, params=params, headers=headers)
+        return self.validators.revalidate(key, cached_response, response)
+
+    def close(self):
+        self._session.close()
+
+    def get_artefact(
+            self,
+            artefact_id: int,
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        params = self.projection_params(fields=fields, omit=omit)
+        if ancestors_depth:
+            params.update({"expand": "parents", "depth": ancestors_depth})
+        return self.conditional_get(f"/api/artefact/{artefact_id}/", params=params)
+
+    def get_artefacts(
+            self,
+            artefact_ids: Sequence[int],
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        params = self.projection_params(fields=fields, omit=omit)
+        if ancestors_depth:
+            params.update({"expand": "parents", "depth": ancestors_depth})
+        artefact_ids = list(artefact_ids)
+        many_json = {"results": [], "missing": []}
+        ancestors = {}
+        # the store caps the ids of a request, larger lists are loaded in chunks of that size
+        for start in range(0, len(artefact_ids), constants.many_ids_limit):
+            chunk_ids = artefact_ids[start:start + constants.many_ids_limit]
+            response = self.request("POST", "/api/artefact/many/", params=params, json={"ids": chunk_ids})
+            utils.django_raise_for_status(response)
+            chunk_json = utils.decode_response(response)
+            many_json["results"].extend(chunk_json["results"])
+            many_json["missing"].extend(chunk_json["missing"])
+            ancestors.update((ancestor_json["id"], ancestor_json) for ancestor_json in chunk_json.get("ancestors", []))
+        if ancestors_depth:
+            many_json["ancestors"] = list(ancestors.values())
+        return many_json
+
+    def query_artefacts_page(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        params = {
+            "artefact_type": artefact_type,
+            "q": self.encode_query(query),
+            "page_size": page_size,
+            "cursor": cursor,
+            **self.projection_params(fields=fields, omit=omit)
+        }
+        page_json = self.conditional_get("/api/artefact/query/", params=params)
+        return page_json["results"], self._get_cursor(page_json["next"])
+
+    def query_artefacts(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            order_by: Sequence[str] = (),
+            limit: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> List[typing_utils.JSON]:
+        params = {
+            "artefact_type": artefact_type,
+            "q": self.encode_query(query),
+            "order_by": ",".join(order_by) or None,
+            "limit": limit,
+            **self.projection_params(fields=fields, omit=omit)
+        }
+        return self.conditional_get("/api/artefact/query/", params=params)
+
+    def query_artefacts_batch(self, queries: Dict[str, typing_utils.JSON]) -> typing_utils.JSON:
+        response = self.request("POST", "/api/artefact/query/batch/", json={"queries": queries})
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+    def query_lineage_page(
+            self,
+            artefact_id: int,
+            direction: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            relationship_types: Optional[Sequence[str]] = None,
+            artefact_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        params = {
+            "page_size": page_size,
+            "cursor": cursor,
+            "relationship_types": ",".join(relationship_types) if relationship_types is not None else None,
+            "artefact_types": ",".join(artefact_types) if artefact_types is not None else None,
+            "depth": max_depth,
+            **self.projection_params(fields=fields, omit=omit)
+        }
+        response = self.request("GET", f"/api/artefact/{artefact_id}/{direction}/", params=params)
+        utils.django_raise_for_status(response)
+        page_json = utils.decode_response(response)
+        return page_json["results"], self._get_cursor(page_json["next"])
+
+    def query_relationships_page(
+            self, filters: Dict[str, Any], page_size: int, cursor: Optional[str] = None
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        params = {**filters, "page_size": page_size, "cursor": cursor}
+        page_json = self.conditional_get("/api/artefact-relationship/", params=params)
+        return page_json["results"], self._get_cursor(page_json["next"])
+
+    def get_changes(
+            self,
+            filters: Dict[str, Any],
+            after: Optional[int] = None,
+            limit: int = constants.change_page_size,
+            timeout: float = 0.0,
+    ) -> Tuple[List[typing_utils.JSON], int]:
+        params = {**filters, "after": after, "limit": limit, "timeout": timeout}
+        connect_timeout, read_timeout = self.timeout if isinstance(self.timeout, tuple) else (self.timeout,) * 2
+        # the store holds the request until a change happens or `timeout` elapses
+        response = self.request(
+            "GET", "/api/changes/", params=params, timeout=(connect_timeout, read_timeout + timeout)
+        )
+        utils.django_raise_for_status(response)
+        feed_json = utils.decode_response(response)
+        return feed_json["changes"], feed_json["last_sequence"]
+
+    @staticmethod
+    def encode_query(query: Dict[str, Any]) -> str:
+        """the `q` parameter of the query endpoint: the base64 encoded json of the filters"""
+        return base64.b64encode(json.dumps(query).encode("utf-8")).decode("utf-8")
+
+    @staticmethod
+    def projection_params(
+            fields: Optional[Sequence[str]] = None, omit: Optional[Sequence[str]] = None
+    ) -> Dict[str, str]:
+        """
+        query parameters restricting the fields of returned artefacts. `fields` can contain top level fields (`id`,
+        `artefact_type_reference`, `artefact_data`, `children`, `parents`) or json paths inside the artefact data
+        (`artefact_data.version`), `omit` removes top level fields.
+        """
+        params = {}
+        if fields is not None:
+            params["fields"] = ",".join(fields)
+        if omit is not None:
+            params["omit"] = ",".join(omit)
+        return params
+
+    @staticmethod
+    def _get_cursor(page_url: Optional[str]) -> Optional[str]:
+        if page_url is None:
+            return None
+        return parse.parse_qs(parse.urlparse(page_url).query)["cursor"][0]
+
+    def save_artefact(self, artefact_json: typing_utils.JSON) -> typing_utils.JSON:
+        response = self.request("POST", "/api/artefact/", json=artefact_json)
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+    def save_graph(self, graph_json: typing_utils.JSON) -> typing_utils.JSON:
+        response = self.request("POST", "/api/artefact/graph/", json=graph_json)
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+    def save_bulk(self, bulk_json: typing_utils.JSON) -> typing_utils.JSON:
+        response = self.request("POST", "/api/artefact/bulk/", json=bulk_json)
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+    def save_relationship(self, relationship_json: typing_utils.JSON) -> typing_utils.JSON:
+        response = self.request("POST", "/api/artefact-relationship/", json=relationship_json)
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+    def get_artefact_type(self, artefact_type_name: str) -> Optional[typing_utils.JSON]:
+        try:
+            return self.conditional_get(f"/api/artefact-type/{artefact_type_name}/")
+        except errors.ArtefactNotFoundError:
+            return None
+
+    def ensure_artefact_types(self, artefact_type_jsons: List[typing_utils.JSON]) -> List[typing_utils.JSON]:
+        response = self.request("POST", "/api/artefact-type/ensure/", json=artefact_type_jsons)
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+    def save_artefact_type(self, artefact_type_json: typing_utils.JSON) -> typing_utils.JSON:
+        response = self.request("POST", "/api/artefact-type/", json=artefact_type_json)
+        utils.django_raise_for_status(response)
+        return utils.decode_response(response)
+
+
+class AsyncBackendClient:
+    """
+    asyncio counterpart of `BackendClient`. Calls are forwarded to the process' client (so `configure` and
+    `set_client` apply) and run in a thread pool, concurrent requests for the same artefact share a single request.
+
+    Args:
+        max_workers: maximum number of concurrent backend calls, defaults to the size of the connection pool.
+        max_poll_workers: maximum number of concurrently long-polled change feed requests. They run in a thread pool
+            of their own so that waiting for changes does not hold back the other calls.
+    """
+
+    def __init__(
+            self, max_workers: int = constants.pool_maxsize, max_poll_workers: int = constants.change_poll_workers
+    ):
+        self._executor = futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="jeyn-backend")
+        self._poll_executor = futures.ThreadPoolExecutor(
+            max_workers=max_poll_workers, thread_name_prefix="jeyn-backend-changes"
+        )
+        self._pending_artefacts: Dict[Tuple, asyncio.Future] = {}
+
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        """runs a blocking function in the client's thread pool (with the caller's context)"""
+        return await self._run_in(self._executor, function, *args, **kwargs)
+
+    @staticmethod
+    async def _run_in(executor: futures.Executor, function: Callable, *args, **kwargs) -> Any:
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(context.run, function, *args, **kwargs)
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self._poll_executor.shutdown(wait=False)
+
+    async def get_artefact(
+            self,
+            artefact_id: int,
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        key = (
+            asyncio.get_running_loop(),
+            artefact_id,
+            ancestors_depth,
+            tuple(fields) if fields is not None else None,
+            tuple(omit) if omit is not None else None
+        )
+        pending_artefact = self._pending_artefacts.get(key)
+        if pending_artefact is None:
+            pending_artefact = asyncio.ensure_future(self.run(
+                lambda: get_client().get_artefact(artefact_id, ancestors_depth=ancestors_depth, fields=fields, omit=omit)
+            ))
+            self._pending_artefacts[key] = pending_artefact
+            pending_artefact.add_done_callback(lambda _: self._pending_artefacts.pop(key, None))
+        return await asyncio.shield(pending_artefact)
+
+    async def get_artefacts(
+            self,
+            artefact_ids: Sequence[int],
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        return await self.run(lambda: get_client().get_artefacts(
+            artefact_ids, ancestors_depth=ancestors_depth, fields=fields, omit=omit
+        ))
+
+    async def query_artefacts_page(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        return await self.run(lambda: get_client().query_artefacts_page(
+            query, artefact_type, page_size=page_size, cursor=cursor, fields=fields, omit=omit
+        ))
+
+    async def query_artefacts(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            order_by: Sequence[str] = (),
+            limit: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> List[typing_utils.JSON]:
+        return await self.run(lambda: get_client().query_artefacts(
+            query, artefact_type, order_by=order_by, limit=limit, fields=fields, omit=omit
+        ))
+
+    async def query_artefacts_batch(self, queries: Dict[str, typing_utils.JSON]) -> typing_utils.JSON:
+        return await self.run(lambda: get_client().query_artefacts_batch(queries))
+
+    async def query_lineage_page(
+            self, artefact_id: int, direction: str, page_size: int, cursor: Optional[str] = None, **lineage_kwargs
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        return await self.run(lambda: get_client().query_lineage_page(
+            artefact_id, direction, page_size=page_size, cursor=cursor, **lineage_kwargs
+        ))
+
+    async def query_relationships_page(
+            self, filters: Dict[str, Any], page_size: int, cursor: Optional[str] = None
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        return await self.run(lambda: get_client().query_relationships_page(
+            filters, page_size=page_size, cursor=cursor
+        ))
+
+    async def get_changes(
+            self,
+            filters: Dict[str, Any],
+            after: Optional[int] = None,
+            limit: int = constants.change_page_size,
+            timeout: float = 0.0,
+    ) -> Tuple[List[typing_utils.JSON], int]:
+        # requests waiting for changes run in the poll thread pool, they would otherwise hold the other calls' threads
+        executor = self._poll_executor if timeout > 0 else self._executor
+        return await self._run_in(
+            executor, lambda: get_client().get_changes(filters, after=after, limit=limit, timeout=timeout)
+        )
+
+    async def iter_changes(
+            self, filters: Dict[str, Any], after: Optional[int] = None, timeout: float = constants.change_poll_timeout
+    ) -> AsyncIterator[typing_utils.JSON]:
+        """
+        asyncio counterpart of `BaseBackendClient.iter_changes`, each waiting request holds a thread of the poll
+        thread pool (see `max_poll_workers`)
+        """
+        while True:
+            changes, after = await self.get_changes(filters, after=after, timeout=timeout if after is not None else 0.0)
+            for change in changes:
+                yield change
+
+    async def save_graph(self, graph_json: typing_utils.JSON) -> typing_utils.JSON:
+        return await self.run(lambda: get_client().save_graph(graph_json))
+
+    async def save_bulk(self, bulk_json: typing_utils.JSON) -> typing_utils.JSON:
+        return await self.run(lambda: get_client().save_bulk(bulk_json))
+
+
+_client: Optional[BaseBackendClient] = None
+_client_pid: Optional[int] = None
+_async_client: Optional[AsyncBackendClient] = None
+_async_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def create_client(store_route: Optional[str] = None, **client_kwargs) -> BaseBackendClient:
+    """
+    builds the client of the store at `store_route` (defaults to `constants.store_route`): an `EmbeddedBackendClient`
+    for `sqlite://<path>` routes and an http `BackendClient` otherwise.
+    """
+    store_route = store_route or constants.store_route
+    if store_route.startswith(EMBEDDED_ROUTE_PREFIX):
+        from . import embedded
+        return embedded.EmbeddedBackendClient(store_route[len(EMBEDDED_ROUTE_PREFIX):], **client_kwargs)
+    return BackendClient(store_route=store_route, **client_kwargs)
+
+
+def get_client() -> BaseBackendClient:
+    """
+    returns the process' client, creating it with the default settings if needed. Connections cannot be shared
+    across a fork so a forked process gets its own client.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = create_client()
+            _client_pid = os.getpid()
+        return _client
+
+
+def get_async_client() -> AsyncBackendClient:
+    """returns the process' asyncio client."""
+    global _async_client, _async_client_pid
+    with _client_lock:
+        if _async_client is None or _async_client_pid != os.getpid():
+            _async_client = AsyncBackendClient()
+            _async_client_pid = os.getpid()
+        return _async_client
+
+
+def set_client(client: BaseBackendClient) -> None:
+    """replaces the process' client, for instance with a fake one in tests."""
+    global _client, _client_pid
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def configure(**client_kwargs) -> BaseBackendClient:
+    """
+    builds a new client with `client_kwargs` (see `create_client`) and uses it for all backend traffic, the
+    connections of the previous client are closed.
+    """
+    previous_client, previous_pid = _client, _client_pid
+    client = create_client(**client_kwargs)
+    set_client(client)
+    if previous_client is not None and previous_pid == os.getpid():
+        previous_client.close()
+    return client
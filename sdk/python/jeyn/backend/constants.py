@@ -1 +1,35 @@
-store_route = "http://127.0.0.1:8000"
+import os
+
+# `http(s)://` routes point to an artefact store server, `sqlite://<path>` routes to an embedded store
+store_route = os.environ.get("JEYN_STORE_ROUTE", "http://127.0.0.1:8000")
+
+# default settings of the http client used to talk to the store, see `jeyn.backend.client.configure`
+request_timeout = 30.0
+pool_connections = 4
+pool_maxsize = 16
+
+# maximum number of artefacts kept in the in-process identity map, see `jeyn.backend.artefacts.artefact_cache`
+artefact_cache_size = 1024
+
+# maximum number of store responses kept by the http client to revalidate them, and maximum total size (in bytes) of
+# their bodies, see `jeyn.backend.validators`
+validator_cache_size = 4096
+validator_cache_bytes = 64 * 1024 * 1024
+
+# maximum number of artefact ids the store accepts in a single request loading many artefacts
+many_ids_limit = 1000
+
+# number of relationships followed when loading an artefact's ancestors along with it, see `Artefact.get_from_id`
+ancestors_depth = 8
+
+# number of artefacts fetched per request when iterating over query results
+query_page_size = 100
+
+# number of artefact ids fetched per request when loading the ancestors or descendants of an artefact
+lineage_page_size = 1000
+
+# maximum number of changes fetched per request to the change feed, and time (in seconds) each request waits for one
+change_page_size = 100
+change_poll_timeout = 30.0
+# maximum number of change feed requests the asyncio client long-polls at once, in threads of their own
+change_poll_workers = 32
@@ -0,0 +1,881 @@
+"""
+embedded artefact store: the artefacts, their types and relationships are kept in a local sqlite database accessed
+in-process, with the same semantics as the artefact store server (queries, projections, lineage expansion, atomic
+graphs). Metadata calls then cost a sqlite query instead of an http round trip, which suits local experiments, tests
+and single machine pipelines.
+
+It is selected with a `sqlite://<path>` store route, either through the `JEYN_STORE_ROUTE` environment variable or
+with `configure`:
+
+>>> jeyn.backend.client.configure(store_route="sqlite:///tmp/artefacts.sqlite3")
+>>> jeyn.backend.client.configure(store_route="sqlite://:memory:")
+"""
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional, Sequence, List, Dict, Any, Tuple, Iterable, Union
+
+from . import client, constants, errors, instrumentation
+from .. import typing_utils
+
+try:
+    import jsonschema
+except ImportError:  # pragma: no cover
+    # artefact data is then validated by the sdk's artefact classes only
+    jsonschema = None
+
+ARTEFACT_FIELDS = ("id", "artefact_type_reference", "artefact_data", "children", "parents")
+RELATIONSHIP_FIELDS = ("children", "parents")
+DATA_PATH_PREFIX = "artefact_data."
+ARTEFACT_DATA_FILTER_PREFIX = "artefact_data__"
+FILTER_LOOKUPS = {"exact": "=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+# relationship fields queries can filter and order on, with the joins they need and the columns of their relationships
+RELATIONSHIP_JOINS = {
+    "parents": "JOIN relationship AS parents ON parents.child_id = artefact.id",
+    "children": "JOIN relationship AS children ON children.parent_id = artefact.id",
+}
+RELATIONSHIP_COLUMNS = {
+    "id": "id", "parent": "parent_id", "child": "child_id", "relationship_type": "relationship_type",
+    "creation_time": "creation_time"
+}
+RELATIONSHIP_FILTERS = {
+    "parent": "parent_id = ?", "child": "child_id = ?", "relationship_type": "relationship_type = ?",
+    "creation_time__gt": "creation_time > ?", "creation_time__gte": "creation_time >= ?",
+    "creation_time__lt": "creation_time < ?", "creation_time__lte": "creation_time <= ?",
+}
+# relationship columns followed from and to when computing the ancestors or descendants of artefacts
+LINEAGE_DIRECTIONS = {"ancestors": ("child_id", "parent_id"), "descendants": ("parent_id", "child_id")}
+# maximum number of relationships followed when computing a lineage, as on the artefact store
+MAX_LINEAGE_DEPTH = 32
+# maximum number of parameters bound to a single `IN` clause
+MAX_IN_PARAMETERS = 500
+# rows inserted per transaction by bulk saves
+BULK_CHUNK_SIZE = 1000
+# number of artefacts returned by each query of a batch, as on the artefact store
+MAX_QUERY_LIMIT = 1000
+# change feed filters, the `kind` filter is a condition of its own
+CHANGE_FILTERS = {
+    "artefact_type": "artefact_type = ?", "relationship_type": "relationship_type = ?", "parent": "parent_id = ?"
+}
+CHANGE_KINDS = {"artefact": "relationship_id IS NULL", "relationship": "relationship_id IS NOT NULL"}
+# interval (in seconds) at which waiting change feed reads check for new changes
+CHANGE_POLL_INTERVAL = 0.25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artefact_type (
+    type_name TEXT PRIMARY KEY,
+    schema TEXT NOT NULL,
+    indexed_paths TEXT NOT NULL DEFAULT '[]'
+);
+CREATE TABLE IF NOT EXISTS artefact (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    artefact_type_reference TEXT NOT NULL REFERENCES artefact_type (type_name) ON DELETE CASCADE,
+    artefact_data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relationship (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parent_id INTEGER NOT NULL REFERENCES artefact (id) ON DELETE CASCADE,
+    child_id INTEGER NOT NULL REFERENCES artefact (id) ON DELETE CASCADE,
+    relationship_type TEXT NOT NULL,
+    creation_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artefact_artefact_type_reference ON artefact (artefact_type_reference);
+CREATE INDEX IF NOT EXISTS relationship_parent_id ON relationship (parent_id);
+CREATE INDEX IF NOT EXISTS relationship_child_id ON relationship (child_id);
+CREATE INDEX IF NOT EXISTS relationship_parent_type_time ON relationship (parent_id, relationship_type, creation_time);
+-- change feed: the inserts of artefacts and relationships, recorded by triggers, the ids are the feed's sequence
+CREATE TABLE IF NOT EXISTS change (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    artefact_id INTEGER NOT NULL REFERENCES artefact (id) ON DELETE CASCADE,
+    artefact_type TEXT NOT NULL,
+    relationship_id INTEGER REFERENCES relationship (id) ON DELETE CASCADE,
+    relationship_type TEXT,
+    parent_id INTEGER REFERENCES artefact (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS change_type_sequence ON change (artefact_type, id);
+CREATE INDEX IF NOT EXISTS change_parent_type_sequence ON change (parent_id, relationship_type, id);
+CREATE TRIGGER IF NOT EXISTS artefact_change AFTER INSERT ON artefact BEGIN
+    INSERT INTO change (artefact_id, artefact_type) VALUES (NEW.id, NEW.artefact_type_reference);
+END;
+CREATE TRIGGER IF NOT EXISTS relationship_change AFTER INSERT ON relationship BEGIN
+    INSERT INTO change (artefact_id, artefact_type, relationship_id, relationship_type, parent_id)
+    SELECT NEW.child_id, artefact_type_reference, NEW.id, NEW.relationship_type, NEW.parent_id
+    FROM artefact WHERE id = NEW.child_id;
+END;
+"""
+
+
+class EmbeddedBackendClient(client.BaseBackendClient):
+    """
+    client of an artefact store kept in a local sqlite database.
+
+    Args:
+        database: path of the sqlite database (created if needed) or `:memory:`.
+        timeout: time (in seconds) to wait for a lock held by another process.
+    """
+
+    def __init__(self, database: str, timeout: float = 30.0):
+        self.database = database
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(database, timeout=timeout, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock:
+            if database != ":memory:":
+                self._connection.execute("PRAGMA journal_mode = WAL")
+            self._connection.execute("PRAGMA foreign_keys = ON")
+            self._connection.executescript(SCHEMA)
+            self._upgrade_schema()
+
+    def _upgrade_schema(self):
+        """adds the columns missing from databases created by older versions"""
+        artefact_type_columns = [row["name"] for row in self._execute("PRAGMA table_info(artefact_type)")]
+        if "indexed_paths" not in artefact_type_columns:
+            self._connection.execute("ALTER TABLE artefact_type ADD COLUMN indexed_paths TEXT NOT NULL DEFAULT '[]'")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    @instrumentation.recorded
+    def get_artefact(
+            self,
+            artefact_id: int,
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        projection = _ArtefactProjection(fields=fields, omit=omit or ())
+        with self._lock:
+            rows = self._execute("SELECT * FROM artefact WHERE id = ?", [artefact_id])
+            if len(rows) == 0:
+                raise errors.ArtefactNotFoundError(f"no artefact with id {artefact_id}")
+            artefact_json, = self._artefact_jsons(rows, projection)
+            if ancestors_depth:
+                artefact_json["ancestors"] = self._ancestor_jsons([artefact_id], ancestors_depth, projection)
+        return artefact_json
+
+    @instrumentation.recorded
+    def get_artefacts(
+            self,
+            artefact_ids: Sequence[int],
+            ancestors_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> typing_utils.JSON:
+        projection = _ArtefactProjection(fields=fields, omit=omit or ())
+        with self._lock:
+            rows = self._select_in("SELECT * FROM artefact WHERE id IN ({})", list(set(artefact_ids)))
+            artefact_jsons = dict(zip([row["id"] for row in rows], self._artefact_jsons(rows, projection)))
+            many_json = {
+                "results": [
+                    artefact_jsons[artefact_id] for artefact_id in artefact_ids if artefact_id in artefact_jsons
+                ],
+                "missing": [artefact_id for artefact_id in artefact_ids if artefact_id not in artefact_jsons]
+            }
+            if ancestors_depth:
+                many_json["ancestors"] = self._ancestor_jsons(list(artefact_jsons), ancestors_depth, projection)
+        return many_json
+
+    def _ancestor_jsons(
+            self, artefact_ids: List[int], ancestors_depth: int, projection: "_ArtefactProjection"
+    ) -> List[typing_utils.JSON]:
+        return list(self._ancestor_jsons_by_id(artefact_ids, ancestors_depth, projection).values())
+
+    def _ancestor_jsons_by_id(
+            self, artefact_ids: List[int], ancestors_depth: int, projection: "_ArtefactProjection"
+    ) -> Dict[int, typing_utils.JSON]:
+        if len(artefact_ids) == 0:
+            return {}
+        lineage_sql, parameters = _build_lineage_select("ancestors", artefact_ids, ancestors_depth)
+        rows = self._execute(f"{lineage_sql} ORDER BY id", parameters)
+        return dict(zip([row["id"] for row in rows], self._artefact_jsons(rows, projection)))
+
+    @instrumentation.recorded
+    def query_lineage_page(
+            self,
+            artefact_id: int,
+            direction: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            relationship_types: Optional[Sequence[str]] = None,
+            artefact_types: Optional[Sequence[str]] = None,
+            max_depth: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        projection = _ArtefactProjection(fields=fields, omit=omit or ())
+        max_depth = min(max_depth if max_depth is not None else MAX_LINEAGE_DEPTH, MAX_LINEAGE_DEPTH)
+        lineage_sql, parameters = _build_lineage_select(direction, [artefact_id], max_depth, relationship_types)
+        if artefact_types is not None:
+            lineage_sql += f" AND artefact_type_reference IN ({', '.join('?' * len(artefact_types))})"
+            parameters.extend(artefact_types)
+        if cursor is not None:
+            lineage_sql += " AND id > ?"
+            parameters.append(int(cursor))
+        with self._lock:
+            if len(self._execute("SELECT id FROM artefact WHERE id = ?", [artefact_id])) == 0:
+                raise errors.ArtefactNotFoundError(f"no artefact with id {artefact_id}")
+            rows = self._execute(f"{lineage_sql} ORDER BY id LIMIT ?", [*parameters, page_size + 1])
+            artefact_jsons = self._artefact_jsons(rows[:page_size], projection)
+        next_cursor = str(rows[page_size - 1]["id"]) if len(rows) > page_size else None
+        return artefact_jsons, next_cursor
+
+    @instrumentation.recorded
+    def query_artefacts_page(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            page_size: int,
+            cursor: Optional[str] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        projection = _ArtefactProjection(fields=fields, omit=omit or ())
+        conditions, parameters = _build_conditions(query, artefact_type)
+        if cursor is not None:
+            conditions.append("artefact.id > ?")
+            parameters.append(int(cursor))
+        with self._lock:
+            rows = self._execute(
+                f"{_build_select(query, conditions)} ORDER BY artefact.id LIMIT ?", [*parameters, page_size + 1]
+            )
+            artefact_jsons = self._artefact_jsons(rows[:page_size], projection)
+        next_cursor = str(rows[page_size - 1]["id"]) if len(rows) > page_size else None
+        return artefact_jsons, next_cursor
+
+    @instrumentation.recorded
+    def query_artefacts(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            order_by: Sequence[str] = (),
+            limit: Optional[int] = None,
+            fields: Optional[Sequence[str]] = None,
+            omit: Optional[Sequence[str]] = None,
+    ) -> List[typing_utils.JSON]:
+        with self._lock:
+            return self._query_artefacts(query, artefact_type, order_by, limit, fields, omit)
+
+    @instrumentation.recorded
+    def query_artefacts_batch(self, queries: Dict[str, typing_utils.JSON]) -> typing_utils.JSON:
+        results = {}
+        ancestors = {}
+        with self._lock:
+            for query_name, query in queries.items():
+                query_kwargs = {
+                    "order_by": query.get("order_by", ()),
+                    "limit": min(query.get("limit", MAX_QUERY_LIMIT), MAX_QUERY_LIMIT),
+                }
+                results[query_name] = self._query_artefacts(
+                    query.get("filters", {}),
+                    query["artefact_type"],
+                    fields=query.get("fields"),
+                    omit=query.get("omit"),
+                    **query_kwargs
+                )
+                if query.get("expand") == "parents":
+                    artefact_ids = [
+                        artefact_json["id"] for artefact_json in self._query_artefacts(
+                            query.get("filters", {}), query["artefact_type"], fields=["id"], omit=None, **query_kwargs
+                        )
+                    ]
+                    projection = _ArtefactProjection(fields=query.get("fields"), omit=query.get("omit") or ())
+                    ancestors.update(self._ancestor_jsons_by_id(
+                        artefact_ids, min(query.get("depth", MAX_LINEAGE_DEPTH), MAX_LINEAGE_DEPTH), projection
+                    ))
+        batch_json = {"results": results}
+        if ancestors:
+            batch_json["ancestors"] = list(ancestors.values())
+        return batch_json
+
+    def _query_artefacts(
+            self,
+            query: Dict[str, Any],
+            artefact_type: str,
+            order_by: Sequence[str],
+            limit: Optional[int],
+            fields: Optional[Sequence[str]],
+            omit: Optional[Sequence[str]],
+    ) -> List[typing_utils.JSON]:
+        projection = _ArtefactProjection(fields=fields, omit=omit or ())
+        conditions, parameters = _build_conditions(query, artefact_type)
+        order_terms = [*_build_order_terms(order_by, query), "artefact.id"]
+        sql = f"{_build_select(query, conditions)} ORDER BY {', '.join(order_terms)}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return self._artefact_jsons(self._execute(sql, parameters), projection)
+
+    @instrumentation.recorded
+    def query_relationships_page(
+            self, filters: Dict[str, Any], page_size: int, cursor: Optional[str] = None
+    ) -> Tuple[List[typing_utils.JSON], Optional[str]]:
+        conditions = []
+        parameters = []
+        for key, value in filters.items():
+            if key not in RELATIONSHIP_FILTERS:
+                raise errors.BackendError(f"unsupported relationship filter {key}")
+            conditions.append(RELATIONSHIP_FILTERS[key])
+            parameters.append(_normalize_time(value) if key.startswith("creation_time") else value)
+        if cursor is not None:
+            conditions.append("id > ?")
+            parameters.append(int(cursor))
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._execute(
+                f"SELECT * FROM relationship {where_clause} ORDER BY id LIMIT ?", [*parameters, page_size + 1]
+            )
+        relationship_jsons = [_relationship_json(row) for row in rows[:page_size]]
+        next_cursor = str(rows[page_size - 1]["id"]) if len(rows) > page_size else None
+        return relationship_jsons, next_cursor
+
+    @instrumentation.recorded
+    def get_changes(
+            self,
+            filters: Dict[str, Any],
+            after: Optional[int] = None,
+            limit: int = constants.change_page_size,
+            timeout: float = 0.0,
+    ) -> Tuple[List[typing_utils.JSON], int]:
+        conditions = ["id > ?"]
+        parameters = []
+        for key, value in filters.items():
+            if key == "kind" and value in CHANGE_KINDS:
+                conditions.append(CHANGE_KINDS[value])
+            elif key in CHANGE_FILTERS:
+                conditions.append(CHANGE_FILTERS[key])
+                parameters.append(value)
+            else:
+                raise errors.BackendError(f"unsupported change filter {key}={value}")
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if after is None:
+                    after = self._execute("SELECT COALESCE(MAX(id), 0) AS id FROM change")[0]["id"]
+                rows = self._execute(
+                    f"SELECT * FROM change WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?",
+                    [after, *parameters, limit]
+                )
+            if rows or time.monotonic() >= deadline:
+                break
+            # other processes may write to the database, it is polled without holding the lock
+            time.sleep(min(CHANGE_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+        return [_change_json(row) for row in rows], rows[-1]["id"] if rows else after
+
+    @instrumentation.recorded
+    def save_artefact(self, artefact_json: typing_utils.JSON) -> typing_utils.JSON:
+        with self._lock, self._connection:
+            artefact_id = self._insert_artefact(artefact_json)
+            artefact_json, = self._artefact_jsons(
+                self._execute("SELECT * FROM artefact WHERE id = ?", [artefact_id]), _ArtefactProjection()
+            )
+        return artefact_json
+
+    @instrumentation.recorded
+    def save_graph(self, graph_json: typing_utils.JSON) -> typing_utils.JSON:
+        refs = [artefact_json["ref"] for artefact_json in graph_json["artefacts"]]
+        if len(set(refs)) != len(refs):
+            raise errors.BackendError("artefact refs must be unique within a graph")
+        artefact_ids = {}
+        relationship_ids = []
+        with self._lock, self._connection:
+            for artefact_json in graph_json["artefacts"]:
+                try:
+                    artefact_ids[artefact_json["ref"]] = self._insert_artefact(artefact_json)
+                except errors.ArtefactValidationError as error:
+                    raise errors.ArtefactValidationError(f"{artefact_json['ref']}: {error}") from error
+            for relationship_json in graph_json.get("relationships", []):
+                relationship_ids.append(self._insert_relationship({
+                    "parent": self._get_graph_end(relationship_json, "parent", artefact_ids),
+                    "child": self._get_graph_end(relationship_json, "child", artefact_ids),
+                    "relationship_type": relationship_json["relationship_type"],
+                }))
+            relationship_jsons = self._relationship_jsons(relationship_ids)
+        return {
+            "artefacts": [{"ref": ref, "id": artefact_id} for ref, artefact_id in artefact_ids.items()],
+            "relationships": relationship_jsons
+        }
+
+    @instrumentation.recorded
+    def save_bulk(self, bulk_json: typing_utils.JSON) -> typing_utils.JSON:
+        artefact_jsons = bulk_json.get("artefacts", [])
+        relationship_jsons = bulk_json.get("relationships", [])
+        with self._lock:
+            artefact_rows, refs = self._build_bulk_artefact_rows(artefact_jsons)
+            self._check_bulk_relationships(relationship_jsons, refs)
+            artefact_ids = self._insert_chunked(
+                "INSERT INTO artefact (artefact_type_reference, artefact_data) VALUES (?, ?)", artefact_rows
+            )
+            relationship_rows = [
+                [
+                    *(
+                        relationship_json[end] if end in relationship_json
+                        else artefact_ids[refs[relationship_json[f"{end}_ref"]]]
+                        for end in ("parent", "child")
+                    ),
+                    relationship_json["relationship_type"],
+                    _now()
+                ]
+                for relationship_json in relationship_jsons
+            ]
+            relationship_ids = self._insert_chunked(
+                "INSERT INTO relationship (parent_id, child_id, relationship_type, creation_time) VALUES (?, ?, ?, ?)",
+                relationship_rows
+            )
+        return {"artefacts": artefact_ids, "relationships": relationship_ids}
+
+    @instrumentation.recorded
+    def save_relationship(self, relationship_json: typing_utils.JSON) -> typing_utils.JSON:
+        with self._lock, self._connection:
+            relationship_id = self._insert_relationship(relationship_json)
+            relationship_json, = self._relationship_jsons([relationship_id])
+        return relationship_json
+
+    @instrumentation.recorded
+    def get_artefact_type(self, artefact_type_name: str) -> Optional[typing_utils.JSON]:
+        with self._lock:
+            return self._get_artefact_type(artefact_type_name)
+
+    @instrumentation.recorded
+    def ensure_artefact_types(self, artefact_type_jsons: List[typing_utils.JSON]) -> List[typing_utils.JSON]:
+        type_names = [artefact_type_json["type_name"] for artefact_type_json in artefact_type_jsons]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO artefact_type (type_name, schema, indexed_paths) VALUES (?, ?, ?)",
+                [_artefact_type_row(artefact_type_json) for artefact_type_json in artefact_type_jsons]
+            )
+            artefact_types = {
+                row["type_name"]: _artefact_type_json(row)
+                for row in self._select_in("SELECT * FROM artefact_type WHERE type_name IN ({})", type_names)
+            }
+            # indexed paths of existing types are extended with the posted ones
+            for artefact_type_json in artefact_type_jsons:
+                artefact_type = artefact_types[artefact_type_json["type_name"]]
+                new_paths = [
+                    data_path for data_path in artefact_type_json.get("indexed_paths", [])
+                    if data_path not in artefact_type["indexed_paths"]
+                ]
+                if new_paths:
+                    artefact_type["indexed_paths"] = [*artefact_type["indexed_paths"], *new_paths]
+                    self._connection.execute(
+                        "UPDATE artefact_type SET indexed_paths = ? WHERE type_name = ?",
+                        [json.dumps(artefact_type["indexed_paths"]), artefact_type["type_name"]]
+                    )
+            self._ensure_path_indexes(
+                data_path for artefact_type in artefact_types.values() for data_path in artefact_type["indexed_paths"]
+            )
+        return [artefact_types[type_name] for type_name in type_names]
+
+    @instrumentation.recorded
+    def save_artefact_type(self, artefact_type_json: typing_utils.JSON) -> typing_utils.JSON:
+        with self._lock, self._connection:
+            try:
+                self._connection.execute(
+                    "INSERT INTO artefact_type (type_name, schema, indexed_paths) VALUES (?, ?, ?)",
+                    _artefact_type_row(artefact_type_json)
+                )
+            except sqlite3.IntegrityError as error:
+                raise errors.BackendError(
+                    f"artefact type {artefact_type_json['type_name']} already exists"
+                ) from error
+            self._ensure_path_indexes(artefact_type_json.get("indexed_paths", []))
+        return {
+            "type_name": artefact_type_json["type_name"],
+            "schema": artefact_type_json["schema"],
+            "indexed_paths": artefact_type_json.get("indexed_paths", [])
+        }
+
+    def _ensure_path_indexes(self, data_paths: Iterable[str]):
+        """
+        `(artefact_type_reference, <path>)` indexes of the json paths artefact types are queried by, queries are
+        scoped to a type so that they only read the rows of that type
+        """
+        for data_path in sorted(set(data_paths)):
+            path_hash = hashlib.md5(data_path.encode("utf-8")).hexdigest()[:12]
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS artefact_type_path_{path_hash} ON artefact "
+                f"(artefact_type_reference, json_extract(artefact_data, {_json_path_literal(data_path.split('.'))}))"
+            )
+            # index of the path created before queries were scoped to a type
+            self._connection.execute(f"DROP INDEX IF EXISTS artefact_path_{path_hash}")
+
+    def _execute(self, sql: str, parameters: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def _select_in(self, sql: str, values: Sequence[Any]) -> List[sqlite3.Row]:
+        """runs `sql`, which has an `IN ({})` clause, for `values` in chunks of `MAX_IN_PARAMETERS`"""
+        rows = []
+        for start in range(0, len(values), MAX_IN_PARAMETERS):
+            chunk = values[start:start + MAX_IN_PARAMETERS]
+            rows.extend(self._execute(sql.format(", ".join("?" * len(chunk))), chunk))
+        return rows
+
+    def _get_artefact_type(self, artefact_type_name: str) -> Optional[typing_utils.JSON]:
+        rows = self._execute("SELECT * FROM artefact_type WHERE type_name = ?", [artefact_type_name])
+        if len(rows) == 0:
+            return None
+        return _artefact_type_json(rows[0])
+
+    def _insert_artefact(self, artefact_json: typing_utils.JSON) -> int:
+        artefact_type_name = artefact_json["artefact_type_reference"]
+        artefact_type = self._get_artefact_type(artefact_type_name)
+        if artefact_type is None:
+            raise errors.BackendError(f"unknown artefact type {artefact_type_name}")
+        artefact_data = artefact_json["artefact_data"]
+        if isinstance(artefact_data, str):
+            artefact_data = json.loads(artefact_data)
+        if jsonschema is not None:
+            try:
+                jsonschema.validate(artefact_data, artefact_type["schema"])
+            except jsonschema.ValidationError as error:
+                raise errors.ArtefactValidationError(error.message) from error
+        return self._connection.execute(
+            "INSERT INTO artefact (artefact_type_reference, artefact_data) VALUES (?, ?)",
+            [artefact_type_name, json.dumps(artefact_data)]
+        ).lastrowid
+
+    def _build_bulk_artefact_rows(
+            self, artefact_jsons: List[typing_utils.JSON]
+    ) -> Tuple[List[List[Any]], Dict[str, int]]:
+        """validated artefact rows, along with the index of each ref. The validator of each type is built once"""
+        type_names = list({artefact_json["artefact_type_reference"] for artefact_json in artefact_jsons})
+        schemas = {
+            row["type_name"]: json.loads(row["schema"])
+            for row in self._select_in("SELECT * FROM artefact_type WHERE type_name IN ({})", type_names)
+        }
+        validators = {}
+        if jsonschema is not None:
+            validators = {
+                type_name: jsonschema.validators.validator_for(schema)(schema) for type_name, schema in schemas.items()
+            }
+        rows = []
+        refs = {}
+        for index, artefact_json in enumerate(artefact_jsons):
+            artefact_type_name = artefact_json["artefact_type_reference"]
+            if artefact_type_name not in schemas:
+                raise errors.BackendError(f"unknown artefact type {artefact_type_name}")
+            ref = artefact_json.get("ref")
+            if ref is not None:
+                if ref in refs:
+                    raise errors.BackendError(f"duplicated artefact ref {ref}")
+                refs[ref] = index
+            artefact_data = artefact_json["artefact_data"]
+            if isinstance(artefact_data, str):
+                artefact_data = json.loads(artefact_data)
+            if artefact_type_name in validators:
+                error = jsonschema.exceptions.best_match(validators[artefact_type_name].iter_errors(artefact_data))
+                if error is not None:
+                    raise errors.ArtefactValidationError(f"{ref if ref is not None else index}: {error.message}")
+            rows.append([artefact_type_name, json.dumps(artefact_data)])
+        return rows, refs
+
+    def _check_bulk_relationships(self, relationship_jsons: List[typing_utils.JSON], refs: Dict[str, int]):
+        """checks the relationship ends before anything is inserted"""
+        saved_ids = []
+        for relationship_json in relationship_jsons:
+            for end in ("parent", "child"):
+                if (end in relationship_json) == (f"{end}_ref" in relationship_json):
+                    raise errors.BackendError(f"exactly one of `{end}` and `{end}_ref` must be provided")
+                if end in relationship_json:
+                    saved_ids.append(relationship_json[end])
+                elif relationship_json[f"{end}_ref"] not in refs:
+                    raise errors.BackendError(f"unknown artefact ref {relationship_json[f'{end}_ref']}")
+        saved_ids = list(set(saved_ids))
+        existing_ids = {row["id"] for row in self._select_in("SELECT id FROM artefact WHERE id IN ({})", saved_ids)}
+        missing_ids = [artefact_id for artefact_id in saved_ids if artefact_id not in existing_ids]
+        if missing_ids:
+            raise errors.ArtefactNotFoundError(f"no artefact with id {missing_ids[0]}")
+
+    def _insert_chunked(self, sql: str, rows: List[List[Any]]) -> List[int]:
+        """inserts the rows in transactions of `BULK_CHUNK_SIZE` rows and returns their ids, in order"""
+        ids = []
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            with self._connection:
+                ids.extend(self._connection.execute(sql, row).lastrowid for row in rows[start:start + BULK_CHUNK_SIZE])
+        return ids
+
+    def _insert_relationship(self, relationship_json: typing_utils.JSON) -> int:
+        try:
+            return self._connection.execute(
+                "INSERT INTO relationship (parent_id, child_id, relationship_type, creation_time) VALUES (?, ?, ?, ?)",
+                [
+                    relationship_json["parent"],
+                    relationship_json["child"],
+                    relationship_json["relationship_type"],
+                    _now()
+                ]
+            ).lastrowid
+        except sqlite3.IntegrityError as error:
+            raise errors.ArtefactNotFoundError(
+                f"no artefact with id {relationship_json['parent']} or {relationship_json['child']}"
+            ) from error
+
+    @staticmethod
+    def _get_graph_end(relationship_json: typing_utils.JSON, end: str, artefact_ids: Dict[str, int]) -> int:
+        if (end in relationship_json) == (f"{end}_ref" in relationship_json):
+            raise errors.BackendError(f"exactly one of `{end}` and `{end}_ref` must be provided")
+        if end in relationship_json:
+            return relationship_json[end]
+        ref = relationship_json[f"{end}_ref"]
+        if ref not in artefact_ids:
+            raise errors.BackendError(f"unknown artefact ref {ref}")
+        return artefact_ids[ref]
+
+    def _relationship_jsons(self, relationship_ids: List[int]) -> List[typing_utils.JSON]:
+        relationships = {
+            row["id"]: _relationship_json(row)
+            for row in self._select_in("SELECT * FROM relationship WHERE id IN ({})", relationship_ids)
+        }
+        return [relationships[relationship_id] for relationship_id in relationship_ids]
+
+    def _artefact_jsons(self, rows: Iterable[sqlite3.Row], projection: "_ArtefactProjection") -> List[typing_utils.JSON]:
+        rows = list(rows)
+        artefact_ids = [row["id"] for row in rows]
+        children = self._load_relationships(artefact_ids, "parent_id", "child") if "children" in projection.fields else {}
+        parents = self._load_relationships(artefact_ids, "child_id", "parent") if "parents" in projection.fields else {}
+        artefact_jsons = []
+        for row in rows:
+            artefact_json = {
+                "id": row["id"],
+                "artefact_type_reference": row["artefact_type_reference"],
+                "artefact_data": projection.project_data(json.loads(row["artefact_data"])),
+                "children": children.get(row["id"], []),
+                "parents": parents.get(row["id"], []),
+            }
+            artefact_jsons.append({field: artefact_json[field] for field in projection.fields})
+        return artefact_jsons
+
+    def _load_relationships(
+            self, artefact_ids: List[int], artefact_column: str, related_field: str
+    ) -> Dict[int, List[typing_utils.JSON]]:
+        """relationships of the artefacts keyed by artefact id, each one references the artefact on the other end"""
+        relationships = {}
+        for row in self._select_in(
+                f"SELECT * FROM relationship WHERE {artefact_column} IN ({{}}) ORDER BY id", artefact_ids
+        ):
+            relationships.setdefault(row[artefact_column], []).append({
+                "id": row["id"],
+                related_field: row[f"{related_field}_id"],
+                "relationship_type": row["relationship_type"],
+                "creation_time": row["creation_time"]
+            })
+        return relationships
+
+
+class _ArtefactProjection:
+    """fields selected with `fields` and `omit`, same semantics as the artefact store's projections"""
+
+    def __init__(self, fields: Optional[Sequence[str]] = None, omit: Sequence[str] = ()):
+        fields = list(ARTEFACT_FIELDS) if fields is None else list(fields)
+        unknown_fields = [
+            field for field in [*fields, *omit]
+            if field not in ARTEFACT_FIELDS and not field.startswith(DATA_PATH_PREFIX)
+        ]
+        if unknown_fields:
+            raise errors.BackendError(f"unknown artefact fields {', '.join(unknown_fields)}")
+        self.data_paths = list(dict.fromkeys(
+            field[len(DATA_PATH_PREFIX):] for field in fields
+            if field.startswith(DATA_PATH_PREFIX) and field not in omit
+        ))
+        overlapping_paths = [
+            data_path for data_path in self.data_paths
+            if any(data_path.startswith(f"{other_path}.") for other_path in self.data_paths)
+        ]
+        if overlapping_paths:
+            raise errors.BackendError(
+                f"artefact data paths {', '.join(overlapping_paths)} are inside other requested paths"
+            )
+        self.fields = [field for field in ARTEFACT_FIELDS if field in fields and field not in omit]
+        if "artefact_data" in self.fields:
+            self.data_paths = []
+        elif self.data_paths:
+            self.fields.append("artefact_data")
+
+    def project_data(self, artefact_data: typing_utils.JSON) -> typing_utils.JSON:
+        if not self.data_paths:
+            return artefact_data
+        projected_data = {}
+        for data_path in self.data_paths:
+            *parent_keys, last_key = data_path.split(".")
+            nested_data = projected_data
+            for key in parent_keys:
+                nested_data = nested_data.setdefault(key, {})
+            nested_data[last_key] = _get_path(artefact_data, data_path.split("."))
+        return projected_data
+
+
+def _get_path(data: Any, keys: List[str]) -> Any:
+    for key in keys:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _build_lineage_select(
+        direction: str,
+        artefact_ids: Sequence[int],
+        max_depth: int,
+        relationship_types: Optional[Sequence[str]] = None
+) -> Tuple[str, List[Any]]:
+    """
+    select statement of the ancestors or descendants of `artefact_ids` computed with a recursive query, only
+    following the relationships of `relationship_types` if given
+    """
+    if direction not in LINEAGE_DIRECTIONS:
+        raise errors.BackendError(f"unknown lineage direction {direction}, expected ancestors or descendants")
+    if max_depth < 1:
+        # as in the store, the lineage always starts with the direct relationships
+        raise errors.ArtefactValidationError("depth must be at least 1")
+    from_column, to_column = LINEAGE_DIRECTIONS[direction]
+    type_condition = ""
+    type_parameters = []
+    if relationship_types is not None:
+        type_condition = f"AND relationship_type IN ({', '.join('?' * len(relationship_types))})"
+        type_parameters = list(relationship_types)
+    lineage_sql = f"""
+        WITH RECURSIVE lineage(artefact_id, depth) AS (
+            SELECT {to_column}, 1 FROM relationship
+            WHERE {from_column} IN ({", ".join("?" * len(artefact_ids))}) {type_condition}
+            UNION
+            SELECT relationship.{to_column}, lineage.depth + 1
+            FROM relationship
+            JOIN lineage ON relationship.{from_column} = lineage.artefact_id
+            WHERE lineage.depth < ? {type_condition}
+        )
+        SELECT * FROM artefact WHERE id IN (SELECT artefact_id FROM lineage)"""
+    return lineage_sql, [*artefact_ids, *type_parameters, max_depth, *type_parameters]
+
+
+def _build_select(query: Dict[str, Any], conditions: List[str]) -> str:
+    """select statement of the artefacts matching `conditions`, joined with the relationships the query filters on"""
+    relationship_fields = {key.split("__")[0] for key in query}
+    joins = [join for field, join in RELATIONSHIP_JOINS.items() if field in relationship_fields]
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"SELECT artefact.* FROM artefact {' '.join(joins)} {where_clause}"
+
+
+def _build_conditions(query: Dict[str, Any], artefact_type: str) -> Tuple[List[str], List[Any]]:
+    """
+    translates django style filters (`artefact_data__version__major__gte`, `parents__relationship_type`) to sql
+    conditions on the artefacts of type `artefact_type`
+    """
+    conditions = ["artefact.artefact_type_reference = ?"]
+    parameters = [artefact_type]
+    for key, value in query.items():
+        *keys, lookup = key.split("__")
+        if lookup not in FILTER_LOOKUPS:
+            keys, lookup = [*keys, lookup], "exact"
+        operator = FILTER_LOOKUPS[lookup]
+        if keys[0] == "artefact_data" and len(keys) > 1:
+            # the path is a literal so that the expression indexes of the path can be used
+            json_path = _json_path_literal(keys[1:])
+            if value is None and lookup == "exact":
+                conditions.append(f"json_type(artefact.artefact_data, {json_path}) = 'null'")
+            elif isinstance(value, (dict, list)):
+                conditions.append(f"json_extract(artefact.artefact_data, {json_path}) {operator} json(?)")
+                parameters.append(json.dumps(value))
+            else:
+                conditions.append(f"json_extract(artefact.artefact_data, {json_path}) {operator} ?")
+                parameters.append(value)
+        elif keys in (["id"], ["artefact_type_reference"]):
+            conditions.append(f"artefact.{keys[0]} {operator} ?")
+            parameters.append(value)
+        elif len(keys) == 2 and keys[0] in RELATIONSHIP_JOINS and keys[1] in RELATIONSHIP_COLUMNS:
+            conditions.append(f"{keys[0]}.{RELATIONSHIP_COLUMNS[keys[1]]} {operator} ?")
+            parameters.append(value)
+        else:
+            raise errors.BackendError(f"unsupported query filter {key}")
+    return conditions, parameters
+
+
+def _build_order_terms(order_by: Sequence[str], query: Dict[str, Any]) -> List[str]:
+    """
+    translates `order_by` fields (`-artefact_data.version.major`, `parents.creation_time`) to sql order terms, missing
+    values come last as on the artefact store. Relationship columns need a filter of the `query` on the relationship,
+    the unfiltered join would return the artefacts once per relationship.
+    """
+    filtered_fields = {key.split("__")[0] for key in query}
+    order_terms = []
+    for field in order_by:
+        descending = field.startswith("-")
+        field = field.lstrip("-")
+        relationship_field, _, relationship_column = field.partition(".")
+        if field == "id":
+            expression = "artefact.id"
+        elif field.startswith(DATA_PATH_PREFIX):
+            json_path = _json_path_literal(field[len(DATA_PATH_PREFIX):].split("."))
+            expression = f"json_extract(artefact.artefact_data, {json_path})"
+        elif relationship_field in RELATIONSHIP_JOINS and relationship_column in RELATIONSHIP_COLUMNS:
+            if relationship_field not in filtered_fields:
+                raise errors.BackendError(f"cannot order artefacts by {field} without a filter on {relationship_field}")
+            expression = f"{relationship_field}.{RELATIONSHIP_COLUMNS[relationship_column]}"
+        else:
+            raise errors.BackendError(f"cannot order artefacts by {field}")
+        order_terms.extend([f"{expression} IS NULL", f"{expression} {'DESC' if descending else 'ASC'}"])
+    return order_terms
+
+
+def _json_path_literal(keys: Sequence[str]) -> str:
+    """sql literal of the json path of `keys` (`$."version"."major"`)"""
+    json_path = "$" + "".join(f".{json.dumps(key)}" for key in keys)
+    return "'{}'".format(json_path.replace("'", "''"))
+
+
+def _artefact_type_row(artefact_type_json: typing_utils.JSON) -> Tuple[str, str, str]:
+    return (
+        artefact_type_json["type_name"],
+        json.dumps(artefact_type_json["schema"]),
+        json.dumps(artefact_type_json.get("indexed_paths", []))
+    )
+
+
+def _artefact_type_json(row: sqlite3.Row) -> typing_utils.JSON:
+    return {
+        "type_name": row["type_name"],
+        "schema": json.loads(row["schema"]),
+        "indexed_paths": json.loads(row["indexed_paths"])
+    }
+
+
+def _relationship_json(row: sqlite3.Row) -> typing_utils.JSON:
+    return {
+        "id": row["id"],
+        "parent": row["parent_id"],
+        "child": row["child_id"],
+        "relationship_type": row["relationship_type"],
+        "creation_time": row["creation_time"]
+    }
+
+
+def _change_json(row: sqlite3.Row) -> typing_utils.JSON:
+    return {
+        "sequence": row["id"],
+        "kind": "artefact" if row["relationship_id"] is None else "relationship",
+        "artefact": row["artefact_id"],
+        "artefact_type": row["artefact_type"],
+        "relationship": row["relationship_id"],
+        "relationship_type": row["relationship_type"],
+        "parent": row["parent_id"],
+    }
+
+
+def _now() -> str:
+    return _format_time(datetime.datetime.now(datetime.timezone.utc))
+
+
+def _normalize_time(value: Union[str, datetime.datetime]) -> str:
+    """stored format of an iso formatted (or python) time, times without timezone are in utc"""
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return _format_time(value)
+
+
+def _format_time(value: datetime.datetime) -> str:
+    # a fixed precision keeps the stored times ordered as strings
+    return value.astimezone(datetime.timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
@@ -17,3 +17,14 @@ class ArtefactMetaError(BackendError):
 class RelationshipError(BackendError):
     pass
 
+
+class ArtefactNotFoundError(BackendError):
+    pass
+
+
+class ArtefactValidationError(BackendError):
+    pass
+
+
+class RequestBudgetExceededError(BackendError):
+    pass
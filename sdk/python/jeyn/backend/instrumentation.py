@@ -0,0 +1,165 @@
+"""
+instrumentation of the requests sent to the artefact store. Requests are recorded per endpoint (method and route with
+ids replaced by `{id}`) with their latency and the bytes sent and received, while a `stats` block is active. Calls to
+the embedded store are recorded as well, as `sqlite <client method>` endpoints.
+
+>>> with jeyn.backend.stats() as request_stats:
+...     ModelStore.get_latest_use_case_checkpoint(use_case)
+>>> request_stats.request_count
+>>> print(request_stats.summary())
+
+`request_budget` turns this into an assertion, to catch N+1 regressions in tests:
+
+>>> with jeyn.backend.request_budget(3):
+...     DatasetStore().get_formula_batches(formula)
+"""
+import bisect
+import contextlib
+import functools
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Iterator, Callable
+
+import requests
+
+from . import errors
+
+# upper bounds (in milliseconds) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, float("inf"))
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class EndpointStats:
+    """requests sent to a single endpoint"""
+
+    def __init__(self):
+        self.count = 0
+        self.latencies: List[float] = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @property
+    def total_latency(self) -> float:
+        return sum(self.latencies)
+
+    def histogram(self) -> Dict[float, int]:
+        """number of requests per latency bucket, keyed by the bucket's upper bound in milliseconds"""
+        counts = [0] * len(LATENCY_BUCKETS_MS)
+        for latency in self.latencies:
+            counts[bisect.bisect_left(LATENCY_BUCKETS_MS, latency * 1000)] += 1
+        return dict(zip(LATENCY_BUCKETS_MS, counts))
+
+    def _record(self, latency: float, bytes_sent: int, bytes_received: int):
+        self.count += 1
+        self.latencies.append(latency)
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+
+
+class RequestStats:
+    """requests sent while a `stats` block is active, keyed by endpoint (`GET /api/artefact/{id}/`)"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def request_count(self) -> int:
+        return sum(endpoint_stats.count for endpoint_stats in self.endpoints.values())
+
+    @property
+    def bytes_sent(self) -> int:
+        return sum(endpoint_stats.bytes_sent for endpoint_stats in self.endpoints.values())
+
+    @property
+    def bytes_received(self) -> int:
+        return sum(endpoint_stats.bytes_received for endpoint_stats in self.endpoints.values())
+
+    def count(self, endpoint: Optional[str] = None) -> int:
+        """number of requests sent, to `endpoint` only if given"""
+        if endpoint is None:
+            return self.request_count
+        endpoint_stats = self.endpoints.get(endpoint)
+        return endpoint_stats.count if endpoint_stats is not None else 0
+
+    def summary(self) -> str:
+        lines = [
+            f"{endpoint}: {endpoint_stats.count} requests, {endpoint_stats.total_latency * 1000:.1f}ms, "
+            f"{endpoint_stats.bytes_sent}B sent, {endpoint_stats.bytes_received}B received"
+            for endpoint, endpoint_stats in sorted(self.endpoints.items())
+        ]
+        return "\n".join([f"{self.request_count} requests", *lines])
+
+    def _record(self, endpoint: str, latency: float, bytes_sent: int, bytes_received: int):
+        with self._lock:
+            self.endpoints.setdefault(endpoint, EndpointStats())._record(latency, bytes_sent, bytes_received)
+
+
+_active_stats: List[RequestStats] = []
+_active_stats_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def stats() -> Iterator[RequestStats]:
+    """records the requests sent by every thread of the process until the block exits"""
+    request_stats = RequestStats()
+    with _active_stats_lock:
+        _active_stats.append(request_stats)
+    try:
+        yield request_stats
+    finally:
+        with _active_stats_lock:
+            _active_stats.remove(request_stats)
+
+
+@contextlib.contextmanager
+def request_budget(max_requests: int, endpoint: Optional[str] = None) -> Iterator[RequestStats]:
+    """
+    raises a `RequestBudgetExceededError` if the block sends more than `max_requests` requests (to `endpoint` only if
+    given).
+    """
+    with stats() as request_stats:
+        yield request_stats
+    request_count = request_stats.count(endpoint)
+    if request_count > max_requests:
+        raise errors.RequestBudgetExceededError(
+            f"{request_count} requests sent{f' to {endpoint}' if endpoint else ''} for a budget of {max_requests}\n"
+            f"{request_stats.summary()}"
+        )
+
+
+def record(method: str, route: str, response: requests.Response, latency: float):
+    """records a request sent to `route` in every active `stats` block"""
+    if not _active_stats:
+        return
+    _record(
+        f"{method} {_ID_SEGMENT.sub('/{id}', route)}",
+        latency=latency,
+        bytes_sent=len(response.request.body or b"") if response.request is not None else 0,
+        bytes_received=int(response.headers.get("Content-Length") or len(response.content))
+    )
+
+
+def recorded(function: Callable) -> Callable:
+    """records the calls of an embedded store method"""
+
+    @functools.wraps(function)
+    def recorded_function(*args, **kwargs):
+        if not _active_stats:
+            return function(*args, **kwargs)
+        start_time = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _record(f"sqlite {function.__name__}", latency=time.perf_counter() - start_time)
+
+    return recorded_function
+
+
+def _record(endpoint: str, latency: float, bytes_sent: int = 0, bytes_received: int = 0):
+    with _active_stats_lock:
+        active_stats = list(_active_stats)
+    for request_stats in active_stats:
+        request_stats._record(endpoint, latency, bytes_sent, bytes_received)
@@ -1,7 +1,50 @@
-from requests import Response
+import json
+from typing import Any
+
+from requests import HTTPError, Response
+
+from . import errors
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    # responses are then requested in json
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def accept_header() -> str:
+    """media types the sdk can decode, MessagePack (smaller and faster to decode) is preferred when installed"""
+    if msgpack is None:
+        return "application/json"
+    return f"{MSGPACK_MEDIA_TYPE}, application/json;q=0.9"
+
+
+def decode_response(response: Response) -> Any:
+    if response.headers.get("Content-Type", "").startswith(MSGPACK_MEDIA_TYPE):
+        return msgpack.unpackb(response.content, raw=False)
+    return response.json()
 
 
 def django_raise_for_status(response: Response) -> None:
-    if response.status_code == 400:
-        print(response.json())
-    response.raise_for_status()
\ No newline at end of file
+    """
+    raises the errors the embedded store raises for the same calls: `ArtefactNotFoundError` when the store answers
+    404 and `ArtefactValidationError` (with the store's error details) when it rejects the request (400), the
+    `requests.HTTPError` of other error statuses.
+    """
+    try:
+        response.raise_for_status()
+    except HTTPError as error:
+        if response.status_code == 404:
+            raise errors.ArtefactNotFoundError(f"not found: {response.url}") from error
+        if response.status_code == 400:
+            raise errors.ArtefactValidationError(_error_details(response)) from error
+        raise
+
+
+def _error_details(response: Response) -> str:
+    try:
+        return json.dumps(decode_response(response))
+    except ValueError:
+        return response.text
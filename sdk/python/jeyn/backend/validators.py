@@ -0,0 +1,101 @@
+import collections
+import copy
+import threading
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import requests
+
+from . import constants, utils
+
+ValidatorKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class ValidatedResponse(NamedTuple):
+    """entity tag and decoded payload of a response, `size` is the size of its body"""
+    etag: str
+    payload: Any
+    size: int
+
+
+class ValidatorCache:
+    """
+    payloads of the store's GET responses kept along with their entity tag (`ETag`). Artefacts are immutable so a
+    response read again is most often unchanged: the client sends its tag in `If-None-Match` and the store answers
+    with an empty 304 when the response is still current, a copy of the cached payload is then returned. The least
+    recently used payloads are evicted once `max_size` responses or `max_bytes` bytes of response bodies are cached.
+    """
+
+    def __init__(
+            self, max_size: int = constants.validator_cache_size, max_bytes: int = constants.validator_cache_bytes
+    ):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self._responses: "collections.OrderedDict[ValidatorKey, ValidatedResponse]" = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._responses)
+
+    @staticmethod
+    def key(route: str, params: Optional[Dict[str, Any]] = None) -> ValidatorKey:
+        return route, tuple(sorted((name, str(value)) for name, value in (params or {}).items() if value is not None))
+
+    def get(self, key: ValidatorKey) -> Optional[ValidatedResponse]:
+        with self._lock:
+            cached_response = self._responses.get(key)
+            if cached_response is not None:
+                self._responses.move_to_end(key)
+            return cached_response
+
+    def put(self, key: ValidatorKey, response: requests.Response, payload: Any):
+        """keeps the payload of the response if it is successful, tagged and not larger than the cache"""
+        if response.status_code != 200 or "ETag" not in response.headers or self.max_size <= 0:
+            return
+        size = len(response.content)
+        with self._lock:
+            self._pop(key)
+            if size > self.max_bytes:
+                return
+            self._responses[key] = ValidatedResponse(response.headers["ETag"], payload, size)
+            self._bytes += size
+            while len(self._responses) > self.max_size or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._responses)))
+
+    def revalidate(
+            self, key: ValidatorKey, cached_response: Optional[ValidatedResponse], response: requests.Response
+    ) -> Any:
+        """
+        the payload of the request: the cached one when the store confirmed it is current (304), else the payload of
+        `response`. Error responses raise.
+        """
+        if response.status_code == 304 and cached_response is not None:
+            with self._lock:
+                self.revalidated += 1
+            # callers own the payloads they are given
+            return copy.deepcopy(cached_response.payload)
+        utils.django_raise_for_status(response)
+        payload = utils.decode_response(response)
+        self.put(key, response, copy.deepcopy(payload))
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+            self._bytes = 0
+            self.revalidated = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "revalidated": self.revalidated,
+            "size": len(self),
+            "max_size": self.max_size,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _pop(self, key: ValidatorKey):
+        cached_response = self._responses.pop(key, None)
+        if cached_response is not None:
+            self._bytes -= cached_response.size
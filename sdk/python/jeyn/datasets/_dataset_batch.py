@@ -51,10 +51,24 @@ class BatchArtefact(backend.artefacts.Artefact):
             relationship_jsons=artefact_json["parents"], relationship_type="batch_formula"
         )
         formula_artefact = datasets.DatasetFormulaArtefact.get_from_id(formula_id)
+        return cls._from_artefact_data(artefact_json["artefact_data"], formula_artefact=formula_artefact)
+
+    @classmethod
+    async def afrom_artefact_json(cls, artefact_json: typing_utils.JSON) -> "BatchArtefact":
+        formula_id = cls.extract_artefact_from_singleton_relationship(
+            relationship_jsons=artefact_json["parents"], relationship_type="batch_formula"
+        )
+        formula_artefact = await datasets.DatasetFormulaArtefact.aget_from_id(formula_id)
+        return cls._from_artefact_data(artefact_json["artefact_data"], formula_artefact=formula_artefact)
+
+    @classmethod
+    def _from_artefact_data(
+            cls, artefact_data: typing_utils.JSON, formula_artefact: "datasets.DatasetFormulaArtefact"
+    ) -> "BatchArtefact":
         return cls(
             formula_artefact=formula_artefact,
-            batch_epoch=artefact_json["artefact_data"]["batch_epoch"],
-            batch_kwargs=artefact_json["artefact_data"]["batch_kwargs"],
+            batch_epoch=artefact_data["batch_epoch"],
+            batch_kwargs=artefact_data["batch_kwargs"],
         )
 
 
@@ -31,6 +31,7 @@ class DatasetFormulaArtefact(backend.artefacts.Artefact):
                 }
             }
         }
+        indexed_paths = ["formula_name", "version"]
 
     def __init__(
             self,
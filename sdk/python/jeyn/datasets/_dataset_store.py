@@ -1,8 +1,8 @@
 import operator
-from typing import Optional, Type, List, Union
+from typing import Optional, Type, List, Union, Iterator, AsyncIterator, Dict, Any
 
-import backend.artefacts
-from jeyn import datasets, errors, Version
+from jeyn import datasets, errors, backend, Version
+import typing_utils
 
 
 class DatasetStore:
@@ -18,9 +18,15 @@ class DatasetStore:
             version: Optional[Union[str, Version]] = None
     ):
         version = Version.from_version_string(version) if isinstance(version,str) else version
-        formula_artefacts = datasets.DatasetFormulaArtefact.get(
-            formula_name=name, version=version.to_json() if version is not None else None
-        )
+        if version is None:
+            # the store selects the latest version, only that formula is loaded
+            formula_artefact = datasets.DatasetFormulaArtefact.get_latest(
+                Version.ordering_fields("version", descending=True), formula_name=name
+            )
+            if formula_artefact is None:
+                return None
+            return formula_cls.from_artefact(formula_artefact)
+        formula_artefacts = datasets.DatasetFormulaArtefact.get(formula_name=name, version=version.to_json())
         if len(formula_artefacts) == 0:
             return None
         if len(formula_artefacts) > 1:
@@ -29,39 +35,138 @@ class DatasetStore:
             )
         return formula_cls.from_artefact(formula_artefacts[0])
 
-
-    def _get_formula_batch_relation_jsons(self, formula):
+    @staticmethod
+    def _check_formula_is_saved(formula: datasets.DatasetFormula):
         if not formula.artefact.is_saved:
             raise errors.LoadingError(
                 f"cannot load {formula.formula_name}'s batches since it does not seem saved yet."
             )
-        formula_child_relations = backend.artefacts.Relationship.get_artefact_children_json(formula.artefact)
+
+    def _get_formula_batch_relation_jsons(self, formula):
+        self._check_formula_is_saved(formula)
+        return backend.artefacts.Relationship.get_artefact_children_json(
+            formula.artefact, relationship_type="batch_formula"
+        )
+
+    async def _aget_formula_batch_relation_jsons(self, formula):
+        self._check_formula_is_saved(formula)
+        return await backend.artefacts.Relationship.aget_artefact_children_json(
+            formula.artefact, relationship_type="batch_formula"
+        )
+
+    def get_formula_batches(self, formula: datasets.DatasetFormula) -> List[datasets.DatasetBatch]:
+        batch_artefacts = datasets.BatchArtefact.get_many(
+            [batch["child"] for batch in self._get_formula_batch_relation_jsons(formula)]
+        )
         return [
-            relation for relation in formula_child_relations
-            if relation["relationship_type"] == "batch_formula"
+            formula.batch_type.from_artefact(formula=formula, artefact=batch_artefact)
+            for batch_artefact in batch_artefacts
         ]
 
-    def get_formula_batches(self, formula: datasets.DatasetFormula) -> List[datasets.DatasetBatch]:
+    async def aget_formula_batches(self, formula: datasets.DatasetFormula) -> List[datasets.DatasetBatch]:
+        """asyncio counterpart of `get_formula_batches`"""
+        batch_artefacts = await datasets.BatchArtefact.aget_many(
+            [batch["child"] for batch in await self._aget_formula_batch_relation_jsons(formula)]
+        )
         return [
-            formula.batch_type.from_artefact(formula=formula, artefact=datasets.BatchArtefact.get_from_id(batch["child"]))
-            for batch in self._get_formula_batch_relation_jsons(formula)
+            formula.batch_type.from_artefact(formula=formula, artefact=batch_artefact)
+            for batch_artefact in batch_artefacts
         ]
 
-    def get_latest_formula_batch(self, formula: datasets.DatasetFormula) -> datasets.DatasetBatch:
-        batches = self.get_formula_batches(formula)
-        if len(batches) == 0:
+    def get_latest_formula_batch(self, formula: datasets.DatasetFormula) -> Optional[datasets.DatasetBatch]:
+        self._check_formula_is_saved(formula)
+        batch_artefact = datasets.BatchArtefact.get_latest(
+            ["-artefact_data.batch_epoch"], child_of=formula.artefact, relationship_type="batch_formula"
+        )
+        if batch_artefact is None:
+            return None
+        return formula.batch_type.from_artefact(formula=formula, artefact=batch_artefact)
+
+    async def aget_latest_formula_batch(self, formula: datasets.DatasetFormula) -> Optional[datasets.DatasetBatch]:
+        """asyncio counterpart of `get_latest_formula_batch`"""
+        self._check_formula_is_saved(formula)
+        batch_artefact = await datasets.BatchArtefact.aget_latest(
+            ["-artefact_data.batch_epoch"], child_of=formula.artefact, relationship_type="batch_formula"
+        )
+        if batch_artefact is None:
             return None
+        return formula.batch_type.from_artefact(formula=formula, artefact=batch_artefact)
+
+    def subscribe_formula_batches(
+            self, formula: datasets.DatasetFormula, after: Optional[int] = None
+    ) -> Iterator[datasets.DatasetBatch]:
+        """
+        endless iterator over the batches of the formula as they are saved, the store's change feed is long-polled
+        instead of the latest batch being polled. It starts with the batches saved once the iteration starts, or after
+        the change sequence number `after`.
+
+        >>> for batch in dataset_store.subscribe_formula_batches(formula):
+        ...     train(batch)
+        """
+        self._check_formula_is_saved(formula)
+        for change in backend.client.get_client().iter_changes(self._get_batch_changes_filters(formula), after=after):
+            batch_artefact = datasets.BatchArtefact.get_from_id(change["artefact"])
+            yield formula.batch_type.from_artefact(formula=formula, artefact=batch_artefact)
+
+    async def asubscribe_formula_batches(
+            self, formula: datasets.DatasetFormula, after: Optional[int] = None
+    ) -> AsyncIterator[datasets.DatasetBatch]:
+        """asyncio counterpart of `subscribe_formula_batches`"""
+        self._check_formula_is_saved(formula)
+        async for change in backend.client.get_async_client().iter_changes(
+                self._get_batch_changes_filters(formula), after=after
+        ):
+            batch_artefact = await datasets.BatchArtefact.aget_from_id(change["artefact"])
+            yield formula.batch_type.from_artefact(formula=formula, artefact=batch_artefact)
+
+    @staticmethod
+    def _get_batch_changes_filters(formula: datasets.DatasetFormula) -> Dict[str, Any]:
+        return {"kind": "relationship", "relationship_type": "batch_formula", "parent": formula.artefact.artefact_id}
 
-        latest_batch = max(batches, key=operator.attrgetter("batch_epoch"))
-        return latest_batch
+    @staticmethod
+    def get_batch_descendants_json(
+            batch: datasets.DatasetBatch,
+            relationship_types: Optional[List[str]] = None,
+            max_depth: Optional[int] = None
+    ) -> List[typing_utils.JSON]:
+        """
+        jsons of every artefact downstream of the batch (the checkpoints trained on it and what derives from them),
+        computed by the store in a single lineage query.
+        """
+        if not batch.artefact.is_saved:
+            raise errors.LoadingError("cannot load the descendants of a batch that is not saved yet")
+        return list(backend.client.get_client().iter_lineage(
+            batch.artefact.artefact_id, "descendants", relationship_types=relationship_types, max_depth=max_depth
+        ))
+
+    @staticmethod
+    async def aget_batch_descendants_json(
+            batch: datasets.DatasetBatch,
+            relationship_types: Optional[List[str]] = None,
+            max_depth: Optional[int] = None
+    ) -> List[typing_utils.JSON]:
+        """asyncio counterpart of `get_batch_descendants_json`"""
+        return await backend.client.get_async_client().run(
+            DatasetStore.get_batch_descendants_json, batch, relationship_types, max_depth
+        )
 
     def save_batch(self, batch: datasets.DatasetBatch):
         batch_artefact = batch.artefact
         batch_artefact.save()
 
+    async def asave_batch(self, batch: datasets.DatasetBatch):
+        """asyncio counterpart of `save_batch`"""
+        await batch.artefact.asave()
+
     @classmethod
     def get_batch_from_id(cls, batch_id: int) -> "datasets.batches.GenericBatch":
         batch_artefact = datasets.BatchArtefact.get_from_id(batch_id)
         return datasets.batches.GenericBatch.from_artefact(formula=None, artefact=batch_artefact)
 
+    @classmethod
+    async def aget_batch_from_id(cls, batch_id: int) -> "datasets.batches.GenericBatch":
+        """asyncio counterpart of `get_batch_from_id`"""
+        batch_artefact = await datasets.BatchArtefact.aget_from_id(batch_id)
+        return datasets.batches.GenericBatch.from_artefact(formula=None, artefact=batch_artefact)
+
 
@@ -21,6 +21,7 @@ class UseCaseArtefact(backend.artefacts.Artefact):
                 }
             }
         }
+        indexed_paths = ["use_case_name"]
 
     def __init__(self, use_case_name: str, use_case_description):
         self.use_case_name = use_case_name
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import uuid
 from typing import Any, Optional, List, Type
@@ -47,6 +48,7 @@ class CheckpointArtefact(backend.artefacts.Artefact):
                 "input_catalog"
             ]
         }
+        indexed_paths = ["uuid", "version"]
 
     def __init__(
             self,
@@ -80,15 +82,38 @@ class CheckpointArtefact(backend.artefacts.Artefact):
 
     @classmethod
     def from_artefact_json(cls, artefact_json: typing_utils.JSON) -> "CheckpointArtefact":
-        return cls(
-            unique_id=uuid.UUID(artefact_json["artefact_data"]["uuid"]),
-            version=Version.from_version_string(artefact_json["artefact_data"]["version"]),
-            model_path=artefact_json["artefact_data"]["model_bytes_path"],
-            parent=None,
+        return cls._from_artefact_data(
+            artefact_json["artefact_data"],
             use_case=cls._reload_use_case_from_relationship_json(artefact_json["parents"]),
             training_batch=cls._reload_dataset_batch_from_relationship_json(artefact_json["parents"]),
-            output_catalog=catalogs.DataCatalog.from_json(artefact_json["artefact_data"]["output_catalog"]),
-            input_catalog=catalogs.DataCatalog.from_json(artefact_json["artefact_data"]["input_catalog"])
+        )
+
+    @classmethod
+    async def afrom_artefact_json(cls, artefact_json: typing_utils.JSON) -> "CheckpointArtefact":
+        use_case_id = cls.extract_artefact_from_singleton_relationship(artefact_json["parents"], "checkpoint_use_case")
+        batch_id = cls.extract_artefact_from_singleton_relationship(artefact_json["parents"], "checkpoint_dataset_batch")
+        use_case, training_batch = await asyncio.gather(
+            models.ModelStore.aget_use_case_from_id(use_case_id=use_case_id),
+            datasets.DatasetStore.aget_batch_from_id(batch_id)
+        )
+        return cls._from_artefact_data(artefact_json["artefact_data"], use_case=use_case, training_batch=training_batch)
+
+    @classmethod
+    def _from_artefact_data(
+            cls,
+            artefact_data: typing_utils.JSON,
+            use_case: "models.MlUseCase",
+            training_batch: "datasets.DatasetBatch"
+    ) -> "CheckpointArtefact":
+        return cls(
+            unique_id=uuid.UUID(artefact_data["uuid"]),
+            version=Version.from_version_string(artefact_data["version"]),
+            model_path=artefact_data["model_bytes_path"],
+            parent=None,
+            use_case=use_case,
+            training_batch=training_batch,
+            output_catalog=catalogs.DataCatalog.from_json(artefact_data["output_catalog"]),
+            input_catalog=catalogs.DataCatalog.from_json(artefact_data["input_catalog"])
         )
 
     @classmethod
@@ -1,8 +1,11 @@
-import operator
-from typing import Any, Dict, Type, Optional, List
+import asyncio
+import itertools
+from typing import Any, Dict, Type, Optional, List, Iterator, AsyncIterator
 
-import backend.artefacts
-from jeyn import models, errors
+from jeyn import models, errors, backend
+
+# relationships from a formula to its batches and from the batches to the checkpoints trained on them
+FORMULA_CHECKPOINT_RELATIONSHIP_TYPES = ["batch_formula", "checkpoint_dataset_batch"]
 
 
 class ModelStore:
@@ -55,11 +58,7 @@ class ModelStore:
             use_case_artefact.save()
 
     def save_checkpoint(self, checkpoint: "models.ModelCheckpoint") -> "models.ModelCheckpoint":
-        if checkpoint.model is None:
-            raise errors.SaveError(
-                "cannot save model checkpoint, no model object was provided. You can set it with "
-                "`checkpoint.model = my_model"
-            )
+        self._check_checkpoint_model(checkpoint)
         try:
             self._save_model_object(checkpoint)
         except Exception as error:
@@ -67,6 +66,24 @@ class ModelStore:
         checkpoint.artefact.save()
         return checkpoint
 
+    async def asave_checkpoint(self, checkpoint: "models.ModelCheckpoint") -> "models.ModelCheckpoint":
+        """asyncio counterpart of `save_checkpoint`, the model object is serialized and written in a thread pool"""
+        self._check_checkpoint_model(checkpoint)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._save_model_object, checkpoint)
+        except Exception as error:
+            raise errors.SaveError("error when saving model object data") from error
+        await checkpoint.artefact.asave()
+        return checkpoint
+
+    @staticmethod
+    def _check_checkpoint_model(checkpoint: "models.ModelCheckpoint"):
+        if checkpoint.model is None:
+            raise errors.SaveError(
+                "cannot save model checkpoint, no model object was provided. You can set it with "
+                "`checkpoint.model = my_model"
+            )
+
     def _save_model_object(self, checkpoint: "models.ModelCheckpoint"):
         serializer = self.get_serializer(checkpoint.model)
         if serializer is None:
@@ -76,7 +93,25 @@ class ModelStore:
         checkpoint.save_model_object(serializer=serializer)
 
     def get_use_case(self, name: str) -> "models.MlUseCase":
-        use_case_artefact_list: List["models.UseCaseArtefact"] = models.UseCaseArtefact.get(use_case_name=name)
+        # two artefacts are enough to know the name is not unique
+        use_case_artefact_list = list(itertools.islice(
+            models.UseCaseArtefact.iterate(page_size=2, use_case_name=name), 2
+        ))
+        return self._use_case_from_artefact_list(use_case_artefact_list, name=name)
+
+    async def aget_use_case(self, name: str) -> "models.MlUseCase":
+        """asyncio counterpart of `get_use_case`"""
+        use_case_artefact_list = []
+        async for use_case_artefact in models.UseCaseArtefact.aiterate(page_size=2, use_case_name=name):
+            use_case_artefact_list.append(use_case_artefact)
+            if len(use_case_artefact_list) == 2:
+                break
+        return self._use_case_from_artefact_list(use_case_artefact_list, name=name)
+
+    @staticmethod
+    def _use_case_from_artefact_list(
+            use_case_artefact_list: List["models.UseCaseArtefact"], name: str
+    ) -> "models.MlUseCase":
         if len(use_case_artefact_list) == 0:
             raise errors.LoadingError(f"did not found any use case matching the name {name}")
         if len(use_case_artefact_list) > 1:
@@ -88,19 +123,93 @@ class ModelStore:
         use_case_artefact = models.UseCaseArtefact.get_from_id(artefact_id=use_case_id)
         return models.MlUseCase.from_artefact(use_case_artefact)
 
+    @classmethod
+    async def aget_use_case_from_id(cls, use_case_id):
+        """asyncio counterpart of `get_use_case_from_id`"""
+        use_case_artefact = await models.UseCaseArtefact.aget_from_id(artefact_id=use_case_id)
+        return models.MlUseCase.from_artefact(use_case_artefact)
+
     @staticmethod
     def get_latest_use_case_checkpoint(use_case: "models.MlUseCase") -> Optional["models.ModelCheckpoint"]:
+        ModelStore._check_use_case_is_saved(use_case)
+        checkpoint_artefact = models.CheckpointArtefact.get_latest(
+            order_by=["-parents.creation_time"], child_of=use_case.artefact, relationship_type="checkpoint_use_case"
+        )
+        if checkpoint_artefact is None:
+            return None
+        return models.ModelCheckpoint.from_artefact(checkpoint_artefact)
+
+    @staticmethod
+    async def aget_latest_use_case_checkpoint(use_case: "models.MlUseCase") -> Optional["models.ModelCheckpoint"]:
+        """asyncio counterpart of `get_latest_use_case_checkpoint`"""
+        ModelStore._check_use_case_is_saved(use_case)
+        checkpoint_artefact = await models.CheckpointArtefact.aget_latest(
+            order_by=["-parents.creation_time"], child_of=use_case.artefact, relationship_type="checkpoint_use_case"
+        )
+        if checkpoint_artefact is None:
+            return None
+        return models.ModelCheckpoint.from_artefact(checkpoint_artefact)
+
+    @staticmethod
+    def subscribe_use_case_checkpoints(
+            use_case: "models.MlUseCase", after: Optional[int] = None
+    ) -> Iterator["models.ModelCheckpoint"]:
+        """
+        endless iterator over the checkpoints of the use case as they are saved, the store's change feed is long-polled
+        instead of the latest checkpoint being polled. It starts with the checkpoints saved once the iteration starts,
+        or after the change sequence number `after`.
+
+        >>> for checkpoint in model_store.subscribe_use_case_checkpoints(use_case):
+        ...     deploy(checkpoint)
+        """
+        ModelStore._check_use_case_is_saved(use_case)
+        for change in backend.client.get_client().iter_changes(
+                ModelStore._get_checkpoint_changes_filters(use_case), after=after
+        ):
+            yield models.ModelCheckpoint.from_artefact(models.CheckpointArtefact.get_from_id(change["artefact"]))
+
+    @staticmethod
+    async def asubscribe_use_case_checkpoints(
+            use_case: "models.MlUseCase", after: Optional[int] = None
+    ) -> AsyncIterator["models.ModelCheckpoint"]:
+        """asyncio counterpart of `subscribe_use_case_checkpoints`"""
+        ModelStore._check_use_case_is_saved(use_case)
+        async for change in backend.client.get_async_client().iter_changes(
+                ModelStore._get_checkpoint_changes_filters(use_case), after=after
+        ):
+            checkpoint_artefact = await models.CheckpointArtefact.aget_from_id(change["artefact"])
+            yield models.ModelCheckpoint.from_artefact(checkpoint_artefact)
+
+    @staticmethod
+    def _get_checkpoint_changes_filters(use_case: "models.MlUseCase") -> Dict[str, Any]:
+        return {
+            "kind": "relationship", "relationship_type": "checkpoint_use_case", "parent": use_case.artefact.artefact_id
+        }
+
+    @staticmethod
+    def get_formula_checkpoints(formula: "datasets.DatasetFormula") -> List["models.ModelCheckpoint"]:
+        """checkpoints trained on any batch of the formula, found by the store in a single lineage query"""
+        return [
+            models.ModelCheckpoint.from_artefact(checkpoint_artefact)
+            for checkpoint_artefact in models.CheckpointArtefact.get_descendants_of(
+                formula.artefact, relationship_types=FORMULA_CHECKPOINT_RELATIONSHIP_TYPES, max_depth=2
+            )
+        ]
+
+    @staticmethod
+    async def aget_formula_checkpoints(formula: "datasets.DatasetFormula") -> List["models.ModelCheckpoint"]:
+        """asyncio counterpart of `get_formula_checkpoints`"""
+        return [
+            models.ModelCheckpoint.from_artefact(checkpoint_artefact)
+            for checkpoint_artefact in await models.CheckpointArtefact.aget_descendants_of(
+                formula.artefact, relationship_types=FORMULA_CHECKPOINT_RELATIONSHIP_TYPES, max_depth=2
+            )
+        ]
+
+    @staticmethod
+    def _check_use_case_is_saved(use_case: "models.MlUseCase"):
         if not use_case.artefact.is_saved:
             raise errors.LoadingError(f"cannot load {use_case}'s checkpoints as it is not saved in the backend yet")
-        use_case_child_relations = backend.artefacts.Relationship.get_artefact_children_json(use_case.artefact)
-        all_checkpoint_relations = [
-            relation for relation in use_case_child_relations
-            if relation["relationship_type"] == "checkpoint_use_case"
-        ]
-        if len(all_checkpoint_relations) == 0:
-            return None
-        latest_checkpoint = max(all_checkpoint_relations, key=operator.itemgetter("creation_time"))
-        return models.ModelCheckpoint.from_artefact(models.CheckpointArtefact.get_from_id(latest_checkpoint["child"]))
 
     @staticmethod
     def load_model_from_checkpoint(
@@ -0,0 +1,170 @@
+import asyncio
+import json
+from urllib import parse
+
+import pytest
+
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import client, artefacts, errors
+
+
+class ParentArtefact(artefacts.Artefact):
+    class Meta:
+        artefact_type_name = "parent_artefact"
+        schema = {"type": "object"}
+
+    def __init__(self, name):
+        self.name = name
+
+    @classmethod
+    def from_artefact_json(cls, artefact_json):
+        return cls(name=artefact_json["artefact_data"]["name"])
+
+    def artefact_json(self):
+        return {"name": self.name}
+
+    def get_relationships(self):
+        return []
+
+
+class ChildArtefact(artefacts.Artefact):
+    class Meta:
+        artefact_type_name = "child_artefact"
+        schema = {"type": "object"}
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+
+    @classmethod
+    def from_artefact_json(cls, artefact_json):
+        parent_id = cls.extract_artefact_from_singleton_relationship(artefact_json["parents"], "child_of")
+        return cls(name=artefact_json["artefact_data"]["name"], parent=ParentArtefact.get_from_id(parent_id))
+
+    def artefact_json(self):
+        return {"name": self.name}
+
+    def get_relationships(self):
+        return [artefacts.Relationship(relationship_type="child_of", parent=self.parent, child=self)]
+
+
+EXPANDED_CHILD_JSON = {
+    "id": 2,
+    "artefact_data": {"name": "child"},
+    "children": [],
+    "parents": [{"id": 1, "parent": 1, "relationship_type": "child_of", "creation_time": "2022-01-01T00:00:00Z"}],
+    "ancestors": [
+        {"id": 1, "artefact_data": {"name": "parent"}, "children": [], "parents": []}
+    ]
+}
+
+
+def test_lineage_is_loaded_in_one_request():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=EXPANDED_CHILD_JSON)
+    try:
+        client.set_client(client_with_adapter(adapter))
+        child = ChildArtefact.get_from_id(2)
+        assert child.parent.name == "parent"
+        assert child.parent.artefact_id == 1
+        assert len(adapter.sent) == 1
+        request, _ = adapter.sent[0]
+        assert request.url == "http://store:8000/api/artefact/2/?expand=parents&depth=8"
+    finally:
+        client.set_client(previous_client)
+
+
+def test_lineage_is_loaded_in_one_request_async():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=EXPANDED_CHILD_JSON)
+    try:
+        client.set_client(client_with_adapter(adapter))
+        child = asyncio.run(ChildArtefact.aget_from_id(2))
+        assert child.parent.name == "parent"
+        assert len(adapter.sent) == 1
+    finally:
+        client.set_client(previous_client)
+
+
+def _paginated_parents(request):
+    cursor = dict(parse.parse_qsl(parse.urlparse(request.url).query)).get("cursor")
+    if cursor is None:
+        return {
+            "next": "http://store:8000/api/artefact/query/?cursor=second&page_size=2",
+            "results": [
+                {"id": 1, "artefact_data": {"name": "first"}, "children": [], "parents": []},
+                {"id": 2, "artefact_data": {"name": "second"}, "children": [], "parents": []},
+            ]
+        }
+    return {
+        "next": None,
+        "results": [{"id": 3, "artefact_data": {"name": "third"}, "children": [], "parents": []}]
+    }
+
+
+def test_query_pages_are_fetched_lazily():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=_paginated_parents)
+    try:
+        client.set_client(client_with_adapter(adapter))
+        artefacts.artefact_cache.clear()
+        iterator = ParentArtefact.iterate(page_size=2, name="any")
+        assert adapter.sent == []
+        assert next(iterator).name == "first"
+        assert len(adapter.sent) == 2  # type registration and first page
+        assert [artefact.name for artefact in iterator] == ["second", "third"]
+        assert len(adapter.sent) == 3
+        request, _ = adapter.sent[-1]
+        query_params = dict(parse.parse_qsl(parse.urlparse(request.url).query))
+        assert query_params["cursor"] == "second"
+        assert query_params["artefact_type"] == "parent_artefact"
+        assert [artefact.name for artefact in ParentArtefact.get(name="any")] == ["first", "second", "third"]
+        assert [artefact.name for artefact in asyncio.run(ParentArtefact.aget(name="any"))] == [
+            "first", "second", "third"
+        ]
+    finally:
+        client.set_client(previous_client)
+
+
+MANY_CHILDREN_JSON = {
+    "results": [
+        {"id": 4, "artefact_data": {"name": "fourth"}, "children": [], "parents": [
+            {"id": 2, "parent": 1, "relationship_type": "child_of", "creation_time": "2022-01-01T00:00:00Z"}
+        ]},
+        {"id": 3, "artefact_data": {"name": "third"}, "children": [], "parents": [
+            {"id": 1, "parent": 1, "relationship_type": "child_of", "creation_time": "2022-01-01T00:00:00Z"}
+        ]},
+    ],
+    "missing": [5],
+    "ancestors": [{"id": 1, "artefact_data": {"name": "parent"}, "children": [], "parents": []}]
+}
+
+
+def test_many_artefacts_are_loaded_in_one_request():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=MANY_CHILDREN_JSON)
+    try:
+        client.set_client(client_with_adapter(adapter))
+        children = ChildArtefact.get_many([4, 5, 3], skip_missing=True)
+        assert [child.name for child in children] == ["fourth", "third"]
+        assert children[0].parent is children[1].parent
+        assert len(adapter.sent) == 1
+        request, _ = adapter.sent[0]
+        assert request.url == "http://store:8000/api/artefact/many/?expand=parents&depth=8"
+        assert json.loads(request.body) == {"ids": [4, 5, 3]}
+        # loaded artefacts are not fetched again
+        assert [child.name for child in asyncio.run(ChildArtefact.aget_many([3, 4]))] == ["third", "fourth"]
+        assert len(adapter.sent) == 1
+    finally:
+        client.set_client(previous_client)
+
+
+def test_missing_artefacts_are_reported():
+    previous_client = client.get_client()
+    try:
+        client.set_client(client_with_adapter(RecordingAdapter(body=MANY_CHILDREN_JSON)))
+        artefacts.artefact_cache.clear()
+        with pytest.raises(errors.ArtefactNotFoundError, match="5"):
+            ChildArtefact.get_many([4, 5, 3])
+    finally:
+        client.set_client(previous_client)
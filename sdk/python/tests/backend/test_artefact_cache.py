@@ -0,0 +1,84 @@
+import re
+
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import client, artefacts
+
+
+class CachedArtefact(artefacts.Artefact):
+    class Meta:
+        artefact_type_name = "cached_artefact"
+        schema = {"type": "object"}
+
+    def __init__(self, name):
+        self.name = name
+
+    @classmethod
+    def from_artefact_json(cls, artefact_json):
+        return cls(name=artefact_json["artefact_data"]["name"])
+
+    def artefact_json(self):
+        return {"name": self.name}
+
+    def get_relationships(self):
+        return []
+
+
+def _artefact_detail(request):
+    artefact_id = int(re.search(r"/api/artefact/(\d+)/", request.url).group(1))
+    return {"id": artefact_id, "artefact_data": {"name": f"artefact_{artefact_id}"}, "children": [], "parents": []}
+
+
+def test_artefacts_are_fetched_once():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=_artefact_detail)
+    try:
+        client.set_client(client_with_adapter(adapter))
+        artefacts.artefact_cache.clear()
+        first_artefact = CachedArtefact.get_from_id(1)
+        assert first_artefact.artefact_id == 1
+        assert first_artefact.name == "artefact_1"
+        assert CachedArtefact.get_from_id(1) is first_artefact
+        assert len(adapter.sent) == 1
+        assert artefacts.artefact_cache.hits == 1
+        assert artefacts.artefact_cache.misses == 1
+    finally:
+        client.set_client(previous_client)
+
+
+def test_cache_lru_eviction():
+    cache = artefacts.ArtefactCache(max_size=2)
+    cached_artefacts = []
+    for artefact_id in range(3):
+        artefact = CachedArtefact(name=str(artefact_id))
+        artefact._artefact_id = artefact_id
+        cached_artefacts.append(artefact)
+    cache.put(cached_artefacts[0])
+    cache.put(cached_artefacts[1])
+    # reading the first artefact makes the second one the least recently used
+    assert cache.get(0) is cached_artefacts[0]
+    cache.put(cached_artefacts[2])
+    assert len(cache) == 2
+    assert cache.get(1) is None
+    assert cache.get(0) is cached_artefacts[0]
+    assert cache.stats() == {"hits": 2, "misses": 1, "size": 2, "max_size": 2}
+
+
+def test_unsaved_artefacts_are_not_cached():
+    cache = artefacts.ArtefactCache()
+    cache.put(CachedArtefact(name="unsaved"))
+    assert len(cache) == 0
+
+
+def test_cache_is_emptied_when_client_changes():
+    previous_client = client.get_client()
+    cache = artefacts.ArtefactCache()
+    artefact = CachedArtefact(name="saved")
+    artefact._artefact_id = 4
+    try:
+        client.set_client(client_with_adapter(RecordingAdapter()))
+        cache.put(artefact)
+        assert 4 in cache
+        client.set_client(client_with_adapter(RecordingAdapter()))
+        assert 4 not in cache
+    finally:
+        client.set_client(previous_client)
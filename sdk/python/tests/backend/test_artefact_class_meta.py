@@ -0,0 +1,51 @@
+import json
+
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import client, artefacts
+
+
+def _echo_types(request):
+    return json.loads(request.body)
+
+
+def test_types_are_registered_lazily_in_one_request():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=_echo_types)
+    try:
+        client.set_client(client_with_adapter(adapter))
+
+        class LazyArtefact(artefacts.Artefact):
+            class Meta:
+                artefact_type_name = "lazy_artefact"
+                schema = {"type": "object"}
+
+        # defining the artefact class does not hit the backend
+        assert adapter.sent == []
+        assert not LazyArtefact._meta.is_registered
+
+        LazyArtefact._meta.ensure_registered()
+        LazyArtefact._meta.ensure_registered()
+        assert len(adapter.sent) == 1
+        request, _ = adapter.sent[0]
+        assert request.url == "http://store:8000/api/artefact-type/ensure/"
+        registered_type_names = [artefact_type["type_name"] for artefact_type in json.loads(request.body)]
+        # all the pending types were registered at once
+        assert {"lazy_artefact", "dataset_batch", "model_checkpoint"} <= set(registered_type_names)
+        assert all(meta.is_registered for meta in artefacts.ArtefactClassMeta._all_metas)
+    finally:
+        client.set_client(previous_client)
+
+
+def test_types_are_registered_again_with_a_new_client():
+    previous_client = client.get_client()
+    try:
+        first_adapter = RecordingAdapter(body=_echo_types)
+        client.set_client(client_with_adapter(first_adapter))
+        artefacts.ArtefactClassMeta.register_pending_types()
+        second_adapter = RecordingAdapter(body=_echo_types)
+        client.set_client(client_with_adapter(second_adapter))
+        artefacts.ArtefactClassMeta.register_pending_types()
+        assert len(first_adapter.sent) == 1
+        assert len(second_adapter.sent) == 1
+    finally:
+        client.set_client(previous_client)
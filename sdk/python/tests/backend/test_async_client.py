@@ -0,0 +1,93 @@
+import asyncio
+import re
+import threading
+
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import client, artefacts
+
+
+class AsyncArtefact(artefacts.Artefact):
+    class Meta:
+        artefact_type_name = "async_artefact"
+        schema = {"type": "object"}
+
+    def __init__(self, name):
+        self.name = name
+
+    @classmethod
+    def from_artefact_json(cls, artefact_json):
+        return cls(name=artefact_json["artefact_data"]["name"])
+
+    def artefact_json(self):
+        return {"name": self.name}
+
+    def get_relationships(self):
+        return []
+
+
+def _artefact_detail(request):
+    artefact_id = int(re.search(r"/api/artefact/(\d+)/", request.url).group(1))
+    return {"id": artefact_id, "artefact_data": {"name": f"artefact_{artefact_id}"}, "children": [], "parents": []}
+
+
+def test_aget_from_id():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=_artefact_detail)
+    try:
+        client.set_client(client_with_adapter(adapter))
+        artefacts.artefact_cache.clear()
+        artefact = asyncio.run(AsyncArtefact.aget_from_id(3))
+        assert artefact.artefact_id == 3
+        assert artefact.name == "artefact_3"
+        # the artefact is now in the identity map and is shared with the sync api
+        assert AsyncArtefact.get_from_id(3) is artefact
+        assert len(adapter.sent) == 1
+    finally:
+        client.set_client(previous_client)
+
+
+def test_concurrent_fetches_of_an_artefact_share_one_request():
+    previous_client = client.get_client()
+    adapter = RecordingAdapter(body=_artefact_detail)
+
+    async def fetch_concurrently():
+        async_client = client.get_async_client()
+        return await asyncio.gather(*(async_client.get_artefact(5) for _ in range(10)))
+
+    try:
+        client.set_client(client_with_adapter(adapter))
+        artefact_jsons = asyncio.run(fetch_concurrently())
+        assert all(artefact_json["id"] == 5 for artefact_json in artefact_jsons)
+        assert len(adapter.sent) == 1
+    finally:
+        client.set_client(previous_client)
+
+
+def test_change_feed_polls_do_not_hold_back_other_calls():
+    previous_client = client.get_client()
+    changes_happened = threading.Event()
+
+    def body(request):
+        if "/api/changes/" in request.url:
+            # a long-polled request, waiting for a change
+            changes_happened.wait(timeout=5)
+            return {"changes": [], "last_sequence": 1}
+        return _artefact_detail(request)
+
+    async def poll_and_fetch():
+        async_client = client.AsyncBackendClient(max_workers=1, max_poll_workers=2)
+        polls = [asyncio.ensure_future(async_client.get_changes({}, after=0, timeout=30)) for _ in range(2)]
+        try:
+            artefact_json = await asyncio.wait_for(async_client.get_artefact(7), timeout=2)
+            assert not any(poll.done() for poll in polls)
+        finally:
+            changes_happened.set()
+            await asyncio.gather(*polls)
+            async_client.close()
+        return artefact_json
+
+    try:
+        client.set_client(client_with_adapter(RecordingAdapter(body=body)))
+        assert asyncio.run(poll_and_fetch())["id"] == 7
+    finally:
+        client.set_client(previous_client)
@@ -0,0 +1,197 @@
+import json
+
+import requests
+from requests import adapters
+
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import client
+
+
+def test_default_session_is_pooled():
+    backend_client = client.BackendClient(pool_connections=2, pool_maxsize=7)
+    adapter = backend_client.session.get_adapter("http://127.0.0.1:8000")
+    assert isinstance(adapter, adapters.HTTPAdapter)
+    assert adapter._pool_maxsize == 7
+    assert adapter._pool_connections == 2
+    assert backend_client.session.headers["Connection"] == "keep-alive"
+
+
+def test_requests_use_store_route_and_timeout():
+    adapter = RecordingAdapter(body={"id": 3, "children": []})
+    backend_client = client_with_adapter(adapter, timeout=(1, 2))
+    assert backend_client.get_artefact(3) == {"id": 3, "children": []}
+    request, kwargs = adapter.sent[0]
+    assert request.url == "http://store:8000/api/artefact/3/"
+    assert kwargs["timeout"] == (1, 2)
+
+
+def test_missing_artefact_type_is_none():
+    backend_client = client_with_adapter(RecordingAdapter(status_code=404))
+    assert backend_client.get_artefact_type("unknown") is None
+
+
+def test_client_is_swappable():
+    previous_client = client.get_client()
+    fake_client = client_with_adapter(RecordingAdapter())
+    try:
+        client.set_client(fake_client)
+        assert client.get_client() is fake_client
+    finally:
+        client.set_client(previous_client)
+    assert client.get_client() is previous_client
+
+
+def test_configure_replaces_client():
+    previous_client = client.get_client()
+    try:
+        configured_client = client.configure(store_route="http://other:9000", timeout=4)
+        assert client.get_client() is configured_client
+        assert configured_client.store_route == "http://other:9000"
+        assert configured_client.timeout == 4
+    finally:
+        client.set_client(previous_client)
+
+
+def test_projection_params():
+    adapter = RecordingAdapter(body={"children": []})
+    backend_client = client_with_adapter(adapter)
+    backend_client.get_artefact(3, fields=["id", "artefact_data.version"], omit=["parents"])
+    request, _ = adapter.sent[0]
+    assert request.url == "http://store:8000/api/artefact/3/?fields=id%2Cartefact_data.version&omit=parents"
+
+
+def test_msgpack_responses_are_negotiated():
+    adapter = RecordingAdapter(body={"id": 3, "children": []}, content_type="application/msgpack")
+    backend_client = client_with_adapter(adapter)
+    assert backend_client.get_artefact(3) == {"id": 3, "children": []}
+    request, _ = adapter.sent[0]
+    assert request.headers["Accept"].startswith("application/msgpack")
+    assert "gzip" in request.headers["Accept-Encoding"]
+
+
+def test_ordered_query_params():
+    adapter = RecordingAdapter(body=[{"id": 3}])
+    backend_client = client_with_adapter(adapter)
+    assert backend_client.query_artefacts(
+        {}, "model_checkpoint", order_by=["-parents.creation_time", "id"], limit=1, fields=["id"]
+    ) == [{"id": 3}]
+    request, _ = adapter.sent[0]
+    assert "artefact_type=model_checkpoint&" in request.url
+    assert "order_by=-parents.creation_time%2Cid&limit=1&fields=id" in request.url
+
+
+def test_relationship_filters_are_query_params():
+    adapter = RecordingAdapter(body={"results": [{"id": 1}], "next": None})
+    backend_client = client_with_adapter(adapter)
+    assert list(backend_client.iter_query_relationships({"parent": 3, "relationship_type": "batch_formula"})) == [
+        {"id": 1}
+    ]
+    request, _ = adapter.sent[0]
+    assert request.url == (
+        "http://store:8000/api/artefact-relationship/?parent=3&relationship_type=batch_formula&page_size=100"
+    )
+
+
+def test_lineage_params():
+    adapter = RecordingAdapter(body={"results": [{"id": 4}], "next": None})
+    backend_client = client_with_adapter(adapter)
+    assert list(backend_client.iter_lineage(
+        3, "descendants", relationship_types=["batch_formula"], artefact_types=["model_checkpoint"], max_depth=2
+    )) == [{"id": 4}]
+    request, _ = adapter.sent[0]
+    assert request.url == (
+        "http://store:8000/api/artefact/3/descendants/?page_size=100&relationship_types=batch_formula"
+        "&artefact_types=model_checkpoint&depth=2"
+    )
+
+
+def test_query_batch_request():
+    adapter = RecordingAdapter(body={"results": {"formula": [{"id": 3}]}})
+    backend_client = client_with_adapter(adapter)
+    queries = {"formula": {"artefact_type": "dataset_formula", "filters": {"artefact_data__formula_name": "foo"}}}
+    assert backend_client.query_artefacts_batch(queries) == {"results": {"formula": [{"id": 3}]}}
+    request, _ = adapter.sent[0]
+    assert request.url == "http://store:8000/api/artefact/query/batch/"
+    assert json.loads(request.body) == {"queries": queries}
+
+
+def test_many_artefacts_are_loaded_in_chunks():
+    def many_body(request):
+        artefact_ids = json.loads(request.body)["ids"]
+        return {
+            "results": [{"id": artefact_id} for artefact_id in artefact_ids if artefact_id % 2],
+            "missing": [artefact_id for artefact_id in artefact_ids if not artefact_id % 2],
+            "ancestors": [{"id": 0}, {"id": -artefact_ids[0]}],
+        }
+
+    adapter = RecordingAdapter(body=many_body)
+    backend_client = client_with_adapter(adapter)
+    artefact_ids = list(range(1, 2502))
+    many_json = backend_client.get_artefacts(artefact_ids, ancestors_depth=2)
+    assert [len(json.loads(request.body)["ids"]) for request, _ in adapter.sent] == [1000, 1000, 501]
+    assert [artefact_json["id"] for artefact_json in many_json["results"]] == artefact_ids[::2]
+    assert many_json["missing"] == artefact_ids[1::2]
+    assert many_json["ancestors"] == [{"id": 0}, {"id": -1}, {"id": -1001}, {"id": -2001}]
+
+
+class ConditionalAdapter(RecordingAdapter):
+    """answers with a tagged response, or with a 304 when the request carries its tag"""
+
+    def send(self, request, **kwargs):
+        if request.headers.get("If-None-Match") == '"v1"':
+            self.sent.append((request, kwargs))
+            response = requests.Response()
+            response.status_code = 304
+            response._content = b""
+            response.request = request
+            return response
+        response = super().send(request, **kwargs)
+        response.headers["ETag"] = '"v1"'
+        return response
+
+
+def test_responses_are_revalidated():
+    adapter = ConditionalAdapter(body={"id": 3, "children": []})
+    backend_client = client_with_adapter(adapter)
+    assert backend_client.get_artefact(3) == {"id": 3, "children": []}
+    assert backend_client.get_artefact(3) == {"id": 3, "children": []}
+    assert backend_client.get_artefact(3, fields=["id"]) == {"id": 3, "children": []}
+    assert [request.headers.get("If-None-Match") for request, _ in adapter.sent] == [None, '"v1"', None]
+    assert backend_client.validators.stats() == {
+        "revalidated": 1, "size": 2, "max_size": 4096, "bytes": 50, "max_bytes": 64 * 1024 * 1024
+    }
+
+
+def test_revalidated_payloads_are_bounded_in_bytes():
+    adapter = ConditionalAdapter(body=lambda request: {"id": int(request.url.split("/")[-2]), "children": []})
+    backend_client = client_with_adapter(adapter, validator_cache_bytes=60)
+    first_json = backend_client.get_artefact(3)
+    first_json["children"].append(1)
+    assert backend_client.get_artefact(3) == {"id": 3, "children": []}
+    backend_client.get_artefact(4)
+    backend_client.get_artefact(5)
+    # a response body is 25 bytes, only the two most recent responses fit
+    assert backend_client.validators.stats()["size"] == 2
+    assert backend_client.validators.stats()["bytes"] == 50
+    assert backend_client.validators.get(backend_client.validators.key("/api/artefact/3/", {})) is None
+
+
+def test_revalidation_can_be_disabled():
+    adapter = ConditionalAdapter(body={"id": 3, "children": []})
+    backend_client = client_with_adapter(adapter, validator_cache_size=0)
+    backend_client.get_artefact(3)
+    backend_client.get_artefact(3)
+    assert [request.headers.get("If-None-Match") for request, _ in adapter.sent] == [None, None]
+
+
+def test_change_feed_request():
+    adapter = RecordingAdapter(body={"changes": [{"sequence": 8, "artefact": 3}], "last_sequence": 8})
+    backend_client = client_with_adapter(adapter, timeout=(1, 2))
+    filters = {"relationship_type": "checkpoint_use_case", "parent": 12}
+    assert backend_client.get_changes(filters, after=5, timeout=30) == ([{"sequence": 8, "artefact": 3}], 8)
+    request, kwargs = adapter.sent[0]
+    assert request.url == (
+        "http://store:8000/api/changes/?relationship_type=checkpoint_use_case&parent=12&after=5&limit=100&timeout=30"
+    )
+    # the read timeout covers the wait for changes
+    assert kwargs["timeout"] == (1, 32)
@@ -0,0 +1,330 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+import jeyn.backend
+
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import client, embedded, errors, artefacts
+
+
+class NamedArtefact(artefacts.Artefact):
+    class Meta:
+        artefact_type_name = "embedded_named_artefact"
+        schema = {"type": "object", "properties": {"name": {"type": "string"}}, "required": ["name"]}
+
+    def __init__(self, name, version=0, parent=None):
+        self.name = name
+        self.version = version
+        self.parent = parent
+
+    @classmethod
+    def from_artefact_json(cls, artefact_json):
+        parent_ids = [relationship["parent"] for relationship in artefact_json["parents"]]
+        return cls(
+            name=artefact_json["artefact_data"]["name"],
+            version=artefact_json["artefact_data"]["version"],
+            parent=cls.get_from_id(parent_ids[0]) if parent_ids else None
+        )
+
+    def artefact_json(self):
+        return {"name": self.name, "version": self.version}
+
+    def get_relationships(self):
+        if self.parent is None:
+            return []
+        return [artefacts.Relationship(relationship_type="derived_from", parent=self.parent, child=self)]
+
+
+@pytest.fixture
+def embedded_client(tmp_path):
+    previous_client = client.get_client()
+    embedded_client = client.create_client(store_route=f"sqlite://{tmp_path / 'artefacts.sqlite3'}")
+    client.set_client(embedded_client)
+    yield embedded_client
+    client.set_client(previous_client)
+    embedded_client.close()
+
+
+def test_sqlite_route_selects_embedded_backend(tmp_path):
+    embedded_client = client.create_client(store_route=f"sqlite://{tmp_path / 'artefacts.sqlite3'}")
+    assert isinstance(embedded_client, embedded.EmbeddedBackendClient)
+    assert isinstance(client.create_client(store_route="http://store:8000"), client.BackendClient)
+
+
+def test_lineage_round_trip(embedded_client):
+    child = NamedArtefact("child", parent=NamedArtefact("parent"))
+    NamedArtefact.save_graph([child.parent, child])
+    artefacts.artefact_cache.clear()
+    loaded_child = NamedArtefact.get_from_id(child.artefact_id)
+    assert loaded_child.name == "child"
+    assert loaded_child.parent.name == "parent"
+    assert loaded_child.parent.artefact_id == child.parent.artefact_id
+    parent_json = embedded_client.get_artefact(child.parent.artefact_id, fields=["children"])
+    assert [relationship["child"] for relationship in parent_json["children"]] == [child.artefact_id]
+
+
+def test_query_filters_pages_and_projections(embedded_client):
+    for version in range(5):
+        NamedArtefact("versioned", version=version).save()
+    NamedArtefact("other").save()
+    assert [artefact.version for artefact in NamedArtefact.iterate(page_size=2, name="versioned")] == [0, 1, 2, 3, 4]
+    assert NamedArtefact.first(name="versioned", version=3).version == 3
+    assert list(NamedArtefact.iterate_json(fields=["artefact_data.version"], name="versioned", version__gte=3)) == [
+        {"artefact_data": {"version": 3}}, {"artefact_data": {"version": 4}}
+    ]
+    with pytest.raises(errors.BackendError):
+        list(NamedArtefact.iterate_json(fields=["artefact_data.version", "artefact_data.version.major"]))
+
+
+def test_invalid_graph_is_not_saved(embedded_client):
+    NamedArtefact._meta.ensure_registered()
+    with pytest.raises(errors.ArtefactValidationError):
+        embedded_client.save_graph({
+            "artefacts": [
+                {"ref": "valid", "artefact_type_reference": "embedded_named_artefact", "artefact_data": {"name": "a"}},
+                {"ref": "invalid", "artefact_type_reference": "embedded_named_artefact", "artefact_data": {}},
+            ],
+            "relationships": [{"parent_ref": "valid", "child_ref": "invalid", "relationship_type": "derived_from"}]
+        })
+    assert NamedArtefact.get() == []
+
+
+def store_error_body(request):
+    """what the artefact store answers to requests for missing artefacts (404) or with invalid parameters (400)"""
+    if "fields=" in request.url:
+        return {"fields": "unknown artefact fields unknown"}
+    return {"detail": "Not found."}
+
+
+@pytest.fixture(params=["http", "embedded"])
+def failing_client(request, tmp_path):
+    if request.param == "embedded":
+        embedded_client = client.create_client(store_route=f"sqlite://{tmp_path / 'artefacts.sqlite3'}")
+        yield embedded_client
+        embedded_client.close()
+        return
+
+    class StoreErrorAdapter(RecordingAdapter):
+        def send(self, request, **kwargs):
+            self.status_code = 400 if "fields=" in request.url else 404
+            return super().send(request, **kwargs)
+
+    yield client_with_adapter(StoreErrorAdapter(body=store_error_body))
+
+
+def test_missing_artefact(failing_client):
+    with pytest.raises(errors.ArtefactNotFoundError):
+        failing_client.get_artefact(42)
+    with pytest.raises(errors.ArtefactNotFoundError):
+        failing_client.query_lineage_page(42, "ancestors", page_size=10)
+
+
+def test_invalid_parameters(failing_client):
+    with pytest.raises(errors.BackendError):
+        failing_client.query_artefacts({}, "embedded_named_artefact", fields=["unknown"])
+
+
+def test_many_artefacts(embedded_client):
+    child = NamedArtefact("child", parent=NamedArtefact("parent"))
+    NamedArtefact.save_graph([child.parent, child])
+    many_json = embedded_client.get_artefacts(
+        [child.artefact_id, 42, child.parent.artefact_id], ancestors_depth=1, fields=["id"]
+    )
+    assert many_json == {
+        "results": [{"id": child.artefact_id}, {"id": child.parent.artefact_id}],
+        "missing": [42],
+        "ancestors": [{"id": child.parent.artefact_id}]
+    }
+
+
+def test_embedded_calls_are_recorded(embedded_client):
+    parent = NamedArtefact("parent")
+    parent.save()
+    with jeyn.backend.request_budget(1) as request_stats:
+        NamedArtefact.get_many([parent.artefact_id, 42], skip_missing=True)
+    assert request_stats.count("sqlite get_artefacts") == 1
+
+
+def test_indexed_paths_are_used_by_queries(embedded_client):
+    NamedArtefact("indexed").save()
+    NamedArtefact._meta.indexed_paths = ["name"]
+    try:
+        artefact_type, = embedded_client.ensure_artefact_types([NamedArtefact._meta.to_json()])
+    finally:
+        NamedArtefact._meta.indexed_paths = []
+    assert artefact_type["indexed_paths"] == ["name"]
+    conditions, parameters = embedded._build_conditions({"artefact_data__name": "indexed"}, "embedded_named_artefact")
+    query_plan = embedded_client._execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM artefact WHERE " + " AND ".join(conditions), parameters
+    )
+    assert "USING INDEX artefact_type_path_" in query_plan[0]["detail"]
+    assert [artefact.name for artefact in NamedArtefact.get(name="indexed")] == ["indexed"]
+
+
+def test_latest_artefacts(embedded_client):
+    parent = NamedArtefact("parent")
+    parent.save()
+    children = [NamedArtefact("child", version=version, parent=parent) for version in (2, 10, 1)]
+    NamedArtefact.save_graph(children)
+    NamedArtefact("other", version=20).save()
+    assert NamedArtefact.get_latest(["-artefact_data.version"], name="child") is children[1]
+    assert NamedArtefact.get_latest(["-parents.creation_time", "-id"], child_of=parent) is children[2]
+    lowest_child = NamedArtefact.get_latest(
+        ["artefact_data.version"], child_of=parent, relationship_type="derived_from"
+    )
+    assert lowest_child is children[2]
+    assert NamedArtefact.get_latest(["id"], relationship_type="unknown") is None
+    assert embedded_client.query_artefacts(
+        {}, "embedded_named_artefact", order_by=["-artefact_data.version"], limit=2, fields=["id"]
+    ) == [
+        {"id": artefact.artefact_id} for artefact in NamedArtefact.get(name="other") + [children[1]]
+    ]
+    # without a filter on the relationship the artefacts would be returned once per relationship
+    with pytest.raises(errors.BackendError):
+        embedded_client.query_artefacts({}, "embedded_named_artefact", order_by=["-parents.creation_time"])
+
+
+def test_relationship_filters(embedded_client):
+    parent = NamedArtefact("parent")
+    parent.save()
+    children = [NamedArtefact(f"child_{index}", parent=parent) for index in range(3)]
+    NamedArtefact.save_graph(children)
+    start_time = datetime.datetime.now(datetime.timezone.utc)
+    late_child = NamedArtefact("late_child", parent=children[0])
+    late_child.save()
+    children_jsons = artefacts.Relationship.get_artefact_children_json(parent, relationship_type="derived_from")
+    assert [relationship["child"] for relationship in children_jsons] == [child.artefact_id for child in children]
+    assert artefacts.Relationship.get_artefact_children_json(parent, relationship_type="unknown") == []
+    assert [
+        relationship["child"] for relationship in artefacts.Relationship.iterate_json(created_after=start_time)
+    ] == [late_child.artefact_id]
+    assert len(list(artefacts.Relationship.iterate_json(created_before=start_time, page_size=2))) == 3
+    query_plan = embedded_client._execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM relationship WHERE parent_id = ? AND relationship_type = ? "
+        "AND creation_time >= ?", [parent.artefact_id, "derived_from", embedded._now()]
+    )
+    assert "relationship_parent_type_time" in query_plan[0]["detail"]
+
+
+def test_queries_are_scoped_to_the_artefact_type(embedded_client):
+    embedded_client.ensure_artefact_types([{"type_name": "other_artefact", "schema": {"type": "object"}}])
+    embedded_client.save_artefact({"artefact_type_reference": "other_artefact", "artefact_data": {"name": "shared"}})
+    NamedArtefact("shared").save()
+    assert [artefact.name for artefact in NamedArtefact.get(name="shared")] == ["shared"]
+    assert len(list(embedded_client.iter_query_artefacts({"artefact_data__name": "shared"}, "other_artefact"))) == 1
+
+
+def test_lineage(embedded_client):
+    root = NamedArtefact("root")
+    child = NamedArtefact("child", parent=root)
+    grandchild = NamedArtefact("grandchild", parent=child)
+    NamedArtefact.save_graph([root, child, grandchild])
+    other_root = NamedArtefact("other_root")
+    other_root.save()
+    artefacts.Relationship(relationship_type="reviewed_by", parent=other_root, child=grandchild).save()
+    assert NamedArtefact.get_descendants_of(root) == [child, grandchild]
+    assert NamedArtefact.get_descendants_of(root, max_depth=1) == [child]
+    assert NamedArtefact.get_ancestors_of(grandchild) == [root, child, other_root]
+    assert NamedArtefact.get_ancestors_of(grandchild, relationship_types=["derived_from"]) == [root, child]
+    assert list(embedded_client.iter_lineage(root.artefact_id, "descendants", page_size=1, fields=["id"])) == [
+        {"id": child.artefact_id}, {"id": grandchild.artefact_id}
+    ]
+    assert list(embedded_client.iter_lineage(root.artefact_id, "descendants", artefact_types=["unknown"])) == []
+    with pytest.raises(errors.ArtefactNotFoundError):
+        embedded_client.query_lineage_page(42, "ancestors", page_size=10)
+    with pytest.raises(errors.ArtefactValidationError):
+        embedded_client.query_lineage_page(grandchild.artefact_id, "ancestors", page_size=10, max_depth=0)
+
+
+def test_bulk_save(embedded_client, monkeypatch):
+    monkeypatch.setattr(embedded, "BULK_CHUNK_SIZE", 2)
+    parent = NamedArtefact("parent")
+    parent.save()
+    children = [NamedArtefact(f"child_{index}", version=index, parent=parent) for index in range(5)]
+    NamedArtefact.save_bulk(children)
+    assert all(child.is_saved for child in children)
+    artefacts.artefact_cache.clear()
+    assert [child.name for child in NamedArtefact.get_descendants_of(parent)] == [f"child_{index}" for index in range(5)]
+    with pytest.raises(errors.ArtefactValidationError):
+        embedded_client.save_bulk({"artefacts": [
+            {"artefact_type_reference": "embedded_named_artefact", "artefact_data": {"name": "valid"}},
+            {"artefact_type_reference": "embedded_named_artefact", "artefact_data": {}},
+        ]})
+    with pytest.raises(errors.ArtefactNotFoundError):
+        embedded_client.save_bulk({"relationships": [
+            {"parent": 4242, "child": parent.artefact_id, "relationship_type": "derived_from"}
+        ]})
+    assert len(NamedArtefact.get()) == 6
+
+
+def test_query_batch(embedded_client):
+    parent = NamedArtefact("parent")
+    parent.save()
+    children = [NamedArtefact("child", version=version, parent=parent) for version in (2, 10, 1)]
+    NamedArtefact.save_graph(children)
+    batch = artefacts.QueryBatch()
+    latest_child = batch.get_latest(NamedArtefact, ["-artefact_data.version"], child_of=parent)
+    first_parent = batch.first(NamedArtefact, name="parent")
+    missing = batch.first(NamedArtefact, name="missing")
+    all_children = batch.get(NamedArtefact, name="child")
+    with pytest.raises(errors.BackendError):
+        latest_child.result
+    with jeyn.backend.request_budget(1):
+        batch.execute()
+    assert latest_child.result is children[1]
+    assert first_parent.result is parent
+    assert missing.result is None
+    assert all_children.result == children
+
+
+def test_query_batch_loads_ancestors(embedded_client):
+    root = NamedArtefact("root")
+    child = NamedArtefact("child", parent=root)
+    grandchild = NamedArtefact("grandchild", parent=child)
+    NamedArtefact.save_graph([root, child, grandchild])
+    artefacts.artefact_cache.clear()
+    batch = artefacts.QueryBatch()
+    loaded_grandchild = batch.first(NamedArtefact, name="grandchild")
+    loaded_children = batch.get(NamedArtefact, name="child")
+    # the parents the artefacts are built from come with the batch's response
+    with jeyn.backend.request_budget(1):
+        batch.execute()
+    assert loaded_grandchild.result.parent.parent.name == "root"
+    assert loaded_children.result == [loaded_grandchild.result.parent]
+
+
+def test_change_feed(embedded_client):
+    parent = NamedArtefact("parent")
+    parent.save()
+    changes, start = embedded_client.get_changes({})
+    assert changes == []
+    child = NamedArtefact("child", parent=parent)
+    NamedArtefact.save_graph([child])
+    NamedArtefact.save_bulk([NamedArtefact("bulk_child", parent=parent)])
+    changes, last_sequence = embedded_client.get_changes({"kind": "relationship", "parent": parent.artefact_id}, start)
+    assert [(change["kind"], change["artefact"], change["relationship_type"]) for change in changes] == [
+        ("relationship", child.artefact_id, "derived_from"), ("relationship", changes[1]["artefact"], "derived_from")
+    ]
+    assert changes[0]["artefact_type"] == "embedded_named_artefact"
+    assert last_sequence == changes[1]["sequence"] == start + 4
+    changes, _ = embedded_client.get_changes({"kind": "artefact"}, start, limit=1)
+    assert [change["artefact"] for change in changes] == [child.artefact_id]
+    with pytest.raises(errors.BackendError):
+        embedded_client.get_changes({"kind": "type"})
+
+
+def test_change_feed_is_long_polled(embedded_client):
+    parent = NamedArtefact("parent")
+    parent.save()
+    start_time = time.monotonic()
+    assert embedded_client.get_changes({}, timeout=0.3)[0] == []
+    assert time.monotonic() - start_time >= 0.3
+    child = NamedArtefact("child", parent=parent)
+    saver = threading.Timer(0.2, child.save)
+    saver.start()
+    changes = embedded_client.iter_changes({"kind": "relationship", "parent": parent.artefact_id}, timeout=5)
+    assert next(changes)["artefact"] == child.artefact_id
+    saver.join()
@@ -0,0 +1,32 @@
+import pytest
+
+import jeyn.backend
+from fake_backend import RecordingAdapter, client_with_adapter
+from jeyn.backend import errors
+
+
+def test_requests_are_recorded_per_endpoint():
+    backend_client = client_with_adapter(RecordingAdapter(body={"id": 3, "children": []}))
+    with jeyn.backend.stats() as request_stats:
+        backend_client.get_artefact(3)
+        backend_client.get_artefact(4)
+        backend_client.save_graph({"artefacts": []})
+    backend_client.get_artefact(5)
+    assert request_stats.request_count == 3
+    artefact_stats = request_stats.endpoints["GET /api/artefact/{id}/"]
+    assert artefact_stats.count == 2
+    assert artefact_stats.bytes_received == 2 * len(b'{"id": 3, "children": []}')
+    assert sum(artefact_stats.histogram().values()) == 2
+    assert request_stats.endpoints["POST /api/artefact/graph/"].bytes_sent == len(b'{"artefacts": []}')
+    assert "3 requests" in request_stats.summary()
+
+
+def test_request_budget():
+    backend_client = client_with_adapter(RecordingAdapter(body={"id": 3, "children": []}))
+    with jeyn.backend.request_budget(2):
+        backend_client.get_artefact(3)
+        backend_client.get_artefact(4)
+    with pytest.raises(errors.RequestBudgetExceededError, match="GET /api/artefact/{id}/: 2 requests"):
+        with jeyn.backend.request_budget(1, endpoint="GET /api/artefact/{id}/"):
+            backend_client.get_artefact(3)
+            backend_client.get_artefact(4)
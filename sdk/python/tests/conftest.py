@@ -5,3 +5,5 @@ import os
 # have test helpers importable:
 # https://stackoverflow.com/questions/33508060/create-and-import-helper-functions-in-tests-without-creating-packages-in-test-di
 sys.path.append(os.path.join(os.path.dirname(__file__), 'helpers'))
+# jeyn modules import their siblings as top level modules (`import typing_utils`)
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'jeyn'))
@@ -0,0 +1,44 @@
+import json
+
+import msgpack
+import requests
+from requests import adapters
+
+from jeyn.backend import client
+
+
+class RecordingAdapter(adapters.BaseAdapter):
+    """
+    transport adapter answering every request with a canned body (encoded as json or MessagePack depending on
+    `content_type`) and recording what was sent
+    """
+
+    def __init__(self, status_code=200, body=None, content_type="application/json"):
+        super().__init__()
+        self.status_code = status_code
+        self.body = body if body is not None else {}
+        self.content_type = content_type
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append((request, kwargs))
+        body = self.body(request) if callable(self.body) else self.body
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.headers["Content-Type"] = self.content_type
+        if self.content_type == "application/msgpack":
+            response._content = msgpack.packb(body)
+        else:
+            response._content = json.dumps(body).encode("utf-8")
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def client_with_adapter(adapter, **client_kwargs) -> client.BackendClient:
+    backend_client = client.BackendClient(store_route="http://store:8000/", **client_kwargs)
+    backend_client.session.mount("http://", adapter)
+    return backend_client
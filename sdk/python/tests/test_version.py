@@ -90,4 +90,10 @@ def test_version_compatibility(major, minor, patch, second_major, second_minor,
         assert other_version.is_compatible(version)
         return
     assert not version.is_compatible(other_version)
-    assert not other_version.is_compatible(version)
\ No newline at end of file
+    assert not other_version.is_compatible(version)
+
+
+def test_version_ordering_fields():
+    assert Version.ordering_fields("version", descending=True) == [
+        "-artefact_data.version.major", "-artefact_data.version.minor", "-artefact_data.version.patch"
+    ]